@@ -0,0 +1,117 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+from typing import Optional, Dict, Any, Iterable
+
+class ProfileCacheService:
+    """
+    Redis cache of serialized user profiles
+
+    Each user's entry is kept in two parts under tenant-scoped keys: the
+    profile part (user, profile, role and tenant fields) and the account
+    part (account number, balance, verification). Both are read with one
+    GET of the two keys, and a change drops only the part it affects, so a
+    balance update does not evict the profile. Misses are rebuilt with one
+    query joining profile, role, tenant and account.
+
+    Only writes that go through Model.save() or the AuthService mutators
+    invalidate: post_save receivers drop the part a UserProfile or Account
+    save affects, and the mutators drop it explicitly as well.
+    QuerySet.update() sends no signals, so bulk changes must call
+    forget_profiles / forget_accounts with the users they touched.
+    """
+
+    CACHE_ALIAS = 'api'
+    TTL = 300
+
+    @staticmethod
+    def _profile_key(user_id: int) -> str:
+        return f'user_profile:{connection.schema_name}:{user_id}'
+
+    @staticmethod
+    def _account_key(user_id: int) -> str:
+        return f'user_account:{connection.schema_name}:{user_id}'
+
+    @staticmethod
+    def _profile_part(user: User) -> Dict[str, Any]:
+        from .services import AuthService
+        data = AuthService._user_to_dict(user)
+        data['tenant_id'] = user.profile.tenant.id
+        data['tenant_name'] = user.profile.tenant.name
+        return data
+
+    @staticmethod
+    def _account_part(user: User) -> Dict[str, Any]:
+        if not hasattr(user, 'account'):
+            return {}
+        return {
+            'account_number': user.account.account_number,
+            'balance': float(user.account.balance),
+            'is_verified': user.account.is_verified
+        }
+
+    @staticmethod
+    def get(user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's cached profile
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Dict with 'profile' and 'account' parts ('account' is empty for a
+            user without one), or None if the user or profile does not exist
+        """
+        cache = caches[ProfileCacheService.CACHE_ALIAS]
+        profile_key = ProfileCacheService._profile_key(user_id)
+        account_key = ProfileCacheService._account_key(user_id)
+        cached = cache.get_many([profile_key, account_key])
+        if profile_key in cached and account_key in cached:
+            return {'profile': cached[profile_key], 'account': cached[account_key]}
+
+        user = User.objects.select_related(
+            'profile__role', 'profile__tenant', 'account'
+        ).filter(id=user_id).first()
+        if user is None or not hasattr(user, 'profile'):
+            return None
+
+        entry = {
+            'profile': cached[profile_key] if profile_key in cached else ProfileCacheService._profile_part(user),
+            'account': cached[account_key] if account_key in cached else ProfileCacheService._account_part(user)
+        }
+        cache.set_many(
+            {key: entry[part] for key, part in ((profile_key, 'profile'), (account_key, 'account')) if key not in cached},
+            timeout=ProfileCacheService.TTL
+        )
+        return entry
+
+    @staticmethod
+    def _forget(keys):
+        # After commit, so a concurrent read cannot re-cache pre-commit data
+        transaction.on_commit(lambda: caches[ProfileCacheService.CACHE_ALIAS].delete_many(keys))
+
+    @staticmethod
+    def forget_profiles(user_ids: Iterable[int]):
+        """Drop cached profile parts, e.g. after profile, role or activation changes"""
+        ProfileCacheService._forget([ProfileCacheService._profile_key(user_id) for user_id in user_ids])
+
+    @staticmethod
+    def forget_accounts(user_ids: Iterable[int]):
+        """Drop cached account parts, e.g. after balance changes"""
+        ProfileCacheService._forget([ProfileCacheService._account_key(user_id) for user_id in user_ids])
+
+    @staticmethod
+    def forget_profile(user_id: int):
+        ProfileCacheService.forget_profiles([user_id])
+
+    @staticmethod
+    def forget_account(user_id: int):
+        ProfileCacheService.forget_accounts([user_id])
+
+    @staticmethod
+    def forget(user_id: int):
+        """Drop both parts of a user's cached profile"""
+        ProfileCacheService._forget([
+            ProfileCacheService._profile_key(user_id),
+            ProfileCacheService._account_key(user_id)
+        ])
@@ -0,0 +1,57 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+from auth.outbox_services import OutboxService, close_producer
+from auth.utils import get_tenant_schemas
+
+class Command(BaseCommand):
+    help = 'Publish pending user directory events to Kafka and mark them done'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema to relay (all tenants by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OutboxService.DEFAULT_BATCH_SIZE,
+            help='Events claimed and published per transaction',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep polling every N seconds instead of draining once',
+        )
+        parser.add_argument(
+            '--purge-after',
+            type=int,
+            help='Delete events published more than N days ago',
+        )
+
+    def relay_once(self, options):
+        # Events live in the schema of the tenant whose user changed
+        schemas = [options['schema']] if options['schema'] else get_tenant_schemas()
+        for schema in schemas:
+            with schema_context(schema):
+                stats = OutboxService.relay(batch_size=options['batch_size'])
+                purged = OutboxService.purge(timedelta(days=options['purge_after'])) if options['purge_after'] else 0
+            if stats['published'] or stats['failed'] or purged:
+                style = self.style.WARNING if stats['failed'] else self.style.SUCCESS
+                self.stdout.write(
+                    style(f"{schema}: published {stats['published']}, failed {stats['failed']}, purged {purged}")
+                )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.relay_once(options)
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            close_producer()
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from datetime import datetime, timedelta
 from .utils import generate_account_number, generate_verification_token
@@ -139,6 +140,28 @@ class UserProfile(models.Model):
     def is_expert(self):
         return self.role and self.role.name == 'expert'
 
+class OutboxEvent(models.Model):
+    """Event written in the same transaction as the change it describes, published later by the relay"""
+    topic = models.CharField(max_length=100)
+    key = models.CharField(max_length=200)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Outbox Event'
+        verbose_name_plural = 'Outbox Events'
+        indexes = [
+            # Relay scan: unpublished events in insertion order
+            models.Index(fields=['id'], name='auth_outbox_pending_idx', condition=models.Q(published_at__isnull=True)),
+            # Last event of an entity, to skip re-publishing an unchanged entry
+            models.Index(fields=['key', '-id'], name='auth_outbox_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.key}"
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Create user profile when a new user is created"""
@@ -159,10 +182,49 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance, tenant=default_tenant, role=default_role)
         # Create account
         Account.objects.create(user=instance, tenant=default_tenant)
+        # Same transaction as the user insert, so the event cannot outlive a rollback
+        from .outbox_services import OutboxService
+        OutboxService.user_changed(instance, 'user.created')
+
+# User fields that are part of a user's profile and directory entry
+USER_PROFILE_FIELDS = {'username', 'email', 'first_name', 'last_name', 'is_active'}
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
     """Save user profile when user is saved"""
+    # login() only writes last_login; that must not count as a profile change
+    if update_fields is not None and not USER_PROFILE_FIELDS.intersection(update_fields):
+        return
     instance.profile.save()
     if hasattr(instance, 'account'):
         instance.account.save()
+
+@receiver(post_save, sender=UserProfile)
+def publish_profile_update(sender, instance, created, **kwargs):
+    """
+    Emit the updated directory entry and drop cached token claims when it changed;
+    creation is covered by user.created
+    """
+    if not created:
+        from .outbox_services import OutboxService
+        from .token_services import TokenAuthService
+        if OutboxService.user_changed(instance.user, only_if_changed=True) is not None:
+            TokenAuthService.forget_user_claims(instance.user)
+
+@receiver(post_save, sender=UserProfile)
+def forget_cached_profile(sender, instance, **kwargs):
+    """Drop the cached profile part; role changes, deactivation and user saves all land here"""
+    from .cache_services import ProfileCacheService
+    ProfileCacheService.forget_profile(instance.user_id)
+
+@receiver(post_save, sender=Account)
+def forget_cached_account(sender, instance, **kwargs):
+    """Drop the cached account part (balance, verification) and keep the profile part"""
+    from .cache_services import ProfileCacheService
+    ProfileCacheService.forget_account(instance.user_id)
+
+@receiver(post_delete, sender=UserProfile)
+def forget_deleted_profile(sender, instance, **kwargs):
+    """Drop both cached parts of a deleted user"""
+    from .cache_services import ProfileCacheService
+    ProfileCacheService.forget(instance.user_id)
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Account, OutboxEvent, UserProfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRODUCER_CONFIG = {
+    'bootstrap_servers': 'localhost:9092',
+    'acks': 'all',
+    'retries': 3,
+    'max_in_flight_requests_per_connection': 1,
+    'linger_ms': 20,
+}
+
+_producer = None
+_producer_pid = None
+_producer_lock = threading.Lock()
+
+def get_producer():
+    """Process-wide KafkaProducer, recreated after a fork"""
+    global _producer, _producer_pid
+    pid = os.getpid()
+    if _producer is None or _producer_pid != pid:
+        with _producer_lock:
+            if _producer is None or _producer_pid != pid:
+                from kafka import KafkaProducer
+                config = {**DEFAULT_PRODUCER_CONFIG, 'client_id': socket.gethostname()}
+                config.update(getattr(settings, 'KAFKA_PRODUCER_CONFIG', {}))
+                _producer = KafkaProducer(**config)
+                _producer_pid = pid
+    return _producer
+
+def close_producer():
+    """Flush and close the process-wide producer, if one was created"""
+    global _producer, _producer_pid
+    with _producer_lock:
+        if _producer is not None and _producer_pid == os.getpid():
+            _producer.close()
+        _producer = _producer_pid = None
+
+class OutboxService:
+    """
+    Transactional outbox for user directory events
+    
+    Events are inserted, in the tenant's schema, in the transaction that
+    changes the user and published by the relay_outbox command, so registration never waits on
+    the broker and delivery is at-least-once. Each event carries the full
+    directory entry of the user and is keyed by user, so consumers can
+    upsert it as is and a compacted topic still rebuilds the directory.
+    """
+    
+    DEFAULT_BATCH_SIZE = 500
+    FLUSH_TIMEOUT = 30
+    
+    @staticmethod
+    def topic() -> str:
+        return getattr(settings, 'USER_EVENTS_TOPIC', 'auth.users')
+    
+    @staticmethod
+    def enqueue(event_type: str, entity: str, entity_id: Any, tenant: str, data: Dict[str, Any]) -> OutboxEvent:
+        """
+        Write one event in the current transaction
+        
+        Args:
+            event_type: Event name, e.g. 'account.created'
+            entity: Entity kind, part of the partition key
+            entity_id: Entity id, part of the partition key
+            tenant: Tenant name
+            data: JSON-serialisable payload
+            
+        Returns:
+            OutboxEvent object
+        """
+        return OutboxEvent.objects.create(
+            topic=OutboxService.topic(),
+            key=f'{tenant}:{entity}:{entity_id}',
+            event_type=event_type,
+            payload={
+                'event': event_type,
+                'tenant': tenant,
+                'entity': entity,
+                'id': entity_id,
+                'occurred_at': timezone.now(),
+                'data': data,
+            }
+        )
+    
+    @staticmethod
+    def user_snapshot(user: User) -> Dict[str, Any]:
+        """Directory entry of a user: identity, role and account"""
+        profile = UserProfile.objects.filter(user=user).select_related('role').first()
+        account = Account.objects.filter(user=user).first()
+        return {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_active': user.is_active and (profile is None or profile.is_active),
+            'role': profile.role.name if profile and profile.role else None,
+            'phone_number': profile.phone_number if profile else '',
+            'account_id': account.id if account else None,
+            'account_number': account.account_number if account else None,
+        }
+    
+    @staticmethod
+    def user_changed(user: User, event_type: str = 'profile.updated', only_if_changed: bool = False) -> Optional[OutboxEvent]:
+        """
+        Emit the user's current directory entry
+        
+        Args:
+            user: User object
+            event_type: 'user.created' or 'profile.updated'
+            only_if_changed: Skip the event when the entry equals the last one
+                emitted for the user, e.g. for saves that touched no published field
+            
+        Returns:
+            OutboxEvent object, or None if skipped
+        """
+        # The tenant is the schema, shared with the pharmacy service
+        tenant = connection.schema_name
+        snapshot = OutboxService.user_snapshot(user)
+        if only_if_changed:
+            last = (
+                OutboxEvent.objects.filter(key=f'{tenant}:user:{user.id}')
+                .order_by('-id').values_list('payload', flat=True).first()
+            )
+            if last is not None and last.get('data') == snapshot:
+                return None
+        return OutboxService.enqueue(event_type, 'user', user.id, tenant, snapshot)
+    
+    @staticmethod
+    def relay_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Publish the oldest pending events
+        
+        Rows are claimed with FOR UPDATE SKIP LOCKED so concurrent relays
+        never send the same batch. Only the delivered prefix is marked
+        published, so a failed event is retried before later ones.
+        
+        Returns:
+            Dict with published and failed counts
+        """
+        with transaction.atomic():
+            events: List[OutboxEvent] = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                return {'published': 0, 'failed': 0}
+            
+            producer = get_producer()
+            futures = []
+            for event in events:
+                try:
+                    futures.append(producer.send(
+                        event.topic,
+                        key=event.key.encode('utf-8'),
+                        value=json.dumps(event.payload, cls=DjangoJSONEncoder).encode('utf-8'),
+                        headers=[
+                            ('event_type', event.event_type.encode('utf-8')),
+                            ('tenant', event.payload['tenant'].encode('utf-8')),
+                        ]
+                    ))
+                except Exception:
+                    logger.warning('Outbox send failed for event %s', event.id, exc_info=True)
+                    break
+            try:
+                producer.flush(timeout=OutboxService.FLUSH_TIMEOUT)
+            except Exception:
+                logger.warning('Outbox flush timed out; undelivered events stay pending', exc_info=True)
+            
+            delivered = []
+            for event, future in zip(events, futures):
+                if not future.is_done or future.failed():
+                    break
+                delivered.append(event.id)
+            if delivered:
+                OutboxEvent.objects.filter(id__in=delivered).update(published_at=timezone.now())
+        return {'published': len(delivered), 'failed': len(events) - len(delivered)}
+    
+    @staticmethod
+    def relay(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """Relay batches of the current schema until its outbox is drained or a batch fails"""
+        totals = {'published': 0, 'failed': 0, 'batches': 0}
+        while True:
+            stats = OutboxService.relay_batch(batch_size)
+            if not stats['published'] and not stats['failed']:
+                break
+            totals['batches'] += 1
+            totals['published'] += stats['published']
+            totals['failed'] += stats['failed']
+            if stats['failed'] or stats['published'] < batch_size:
+                break
+        return totals
+    
+    @staticmethod
+    def purge(older_than: timedelta) -> int:
+        """Delete events published before `older_than` ago; returns the count"""
+        deleted, _ = OutboxEvent.objects.filter(published_at__lt=timezone.now() - older_than).delete()
+        return deleted
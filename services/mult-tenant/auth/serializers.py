@@ -122,3 +122,13 @@ class ChangeRoleSerializer(serializers.Serializer):
     new_role = serializers.ChoiceField(
         choices=[('user', 'User'), ('expert', 'Expert'), ('admin', 'Admin')]
     )
+
+class UserBatchLookupSerializer(serializers.Serializer):
+    """Serializer for looking up several users by ID (admin/expert only)"""
+    MAX_IDS = 500
+
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_IDS
+    )
@@ -2,11 +2,17 @@ from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.db import transaction
 from .models import UserProfile, Role
-from typing import Optional, Dict, Any
+from .cache_services import ProfileCacheService
+from typing import Optional, Dict, Any, List, Tuple
 
 class AuthService:
     """Authentication service for user management"""
     
+    USER_FIELDS = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_admin',
+        'is_expert', 'phone_number', 'address', 'bio', 'is_active', 'created_at'
+    )
+    
     @staticmethod
     def register_user(
         username: str,
@@ -154,6 +160,7 @@ class AuthService:
                 
                 user.profile.role = role
                 user.profile.save()
+                ProfileCacheService.forget_profile(user.id)
                 
                 return {
                     'success': True,
@@ -176,10 +183,30 @@ class AuthService:
                 'error': str(e)
             }
     
+    @staticmethod
+    def _user_to_dict(user: User) -> Dict[str, Any]:
+        """Lookup payload of a user fetched with its profile and role"""
+        profile = user.profile
+        return {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': profile.role.name if profile.role else 'user',
+            'is_admin': bool(profile.is_admin),
+            'is_expert': bool(profile.is_expert),
+            'phone_number': profile.phone_number,
+            'address': profile.address,
+            'bio': profile.bio,
+            'is_active': profile.is_active,
+            'created_at': profile.created_at
+        }
+    
     @staticmethod
     def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
         """
-        Get user information by ID
+        Get user information by ID, served from the profile cache
         
         Args:
             user_id: User ID
@@ -187,25 +214,36 @@ class AuthService:
         Returns:
             Dict containing user data or None if not found
         """
-        try:
-            user = User.objects.get(id=user_id)
-            return {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'role': user.profile.role.name if user.profile.role else 'user',
-                'is_admin': user.profile.is_admin,
-                'is_expert': user.profile.is_expert,
-                'phone_number': user.profile.phone_number,
-                'address': user.profile.address,
-                'bio': user.profile.bio,
-                'is_active': user.profile.is_active,
-                'created_at': user.profile.created_at
-            }
-        except User.DoesNotExist:
+        entry = ProfileCacheService.get(user_id)
+        if entry is None:
             return None
+        return {field: entry['profile'][field] for field in AuthService.USER_FIELDS}
+    
+    @staticmethod
+    def get_users_by_ids(user_ids: List[int]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Get information on several users in one query
+        
+        Args:
+            user_ids: User IDs; duplicates are looked up once
+            
+        Returns:
+            (user data in request order, requested IDs that were not found)
+        """
+        ordered = list(dict.fromkeys(user_ids))
+        users = {
+            user.id: user
+            for user in User.objects.select_related('profile__role').filter(id__in=ordered)
+        }
+        results, missing = [], []
+        for user_id in ordered:
+            user = users.get(user_id)
+            # A user without a profile cannot be described; report it like an unknown ID
+            if user is None or not hasattr(user, 'profile'):
+                missing.append(user_id)
+            else:
+                results.append(AuthService._user_to_dict(user))
+        return results, missing
     
     @staticmethod
     def update_user_profile(user_id: int, **profile_data) -> Dict[str, Any]:
@@ -230,6 +268,7 @@ class AuthService:
                         setattr(profile, field, value)
                 
                 profile.save()
+                ProfileCacheService.forget_profile(user.id)
                 
                 return {
                     'success': True,
@@ -268,6 +307,7 @@ class AuthService:
                 user = User.objects.get(id=user_id)
                 user.profile.is_active = False
                 user.profile.save()
+                ProfileCacheService.forget_profile(user.id)
                 
                 return {
                     'success': True,
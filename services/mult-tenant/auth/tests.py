@@ -1,3 +1,326 @@
-from django.test import TestCase
+from datetime import timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from unittest import mock
+
+from .models import publish_profile_update, save_user_profile
+from .outbox_services import OutboxService
+from .services import AuthService
+from .token_services import TokenAuthService
+from .token_views import TokenIntrospectView
+from .views import UserBatchLookupView
+
+
+class TokenIntrospectViewTests(SimpleTestCase):
+    """token/introspect/ only answers callers presenting the service key"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = TokenIntrospectView.as_view()
+        patcher = mock.patch(
+            'auth.token_views.TokenAuthService.introspect_tokens',
+            return_value={'abc': {'active': True, 'user_id': 1}}
+        )
+        self.introspect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, **headers):
+        request = self.factory.post('/auth/token/introspect/', {'tokens': ['abc']}, format='json', **headers)
+        return self.view(request)
+
+    @override_settings(AUTH_SERVICE_KEY='')
+    def test_refuses_every_call_without_a_configured_key(self):
+        self.assertEqual(self.post().status_code, 403)
+        self.assertEqual(self.post(HTTP_X_SERVICE_KEY='').status_code, 403)
+        self.introspect.assert_not_called()
+
+    @override_settings(AUTH_SERVICE_KEY='s3cret')
+    def test_refuses_a_missing_or_wrong_key(self):
+        self.assertEqual(self.post().status_code, 403)
+        self.assertEqual(self.post(HTTP_X_SERVICE_KEY='wrong').status_code, 403)
+        self.introspect.assert_not_called()
+
+    @override_settings(AUTH_SERVICE_KEY='s3cret')
+    def test_answers_with_the_right_key(self):
+        response = self.post(HTTP_X_SERVICE_KEY='s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'results': {'abc': {'active': True, 'user_id': 1}}})
+        self.introspect.assert_called_once_with(['abc'], None)
+
+
+class ProfileChangeSignalTests(SimpleTestCase):
+    """Logins and saves that change nothing published do not emit events"""
+
+    def test_login_does_not_resave_the_profile(self):
+        user = mock.Mock()
+        save_user_profile(sender=None, instance=user, update_fields=frozenset(['last_login']))
+        user.profile.save.assert_not_called()
+        user.account.save.assert_not_called()
+
+    def test_profile_field_change_resaves_the_profile(self):
+        user = mock.Mock()
+        save_user_profile(sender=None, instance=user, update_fields=frozenset(['email']))
+        user.profile.save.assert_called_once_with()
+        save_user_profile(sender=None, instance=user)
+        self.assertEqual(user.profile.save.call_count, 2)
+
+    @mock.patch('auth.token_services.TokenAuthService.forget_user_claims')
+    @mock.patch('auth.outbox_services.OutboxService.user_changed', return_value=None)
+    def test_unchanged_entry_keeps_cached_claims(self, user_changed, forget_user_claims):
+        profile = mock.Mock()
+        publish_profile_update(sender=None, instance=profile, created=False)
+        user_changed.assert_called_once_with(profile.user, only_if_changed=True)
+        forget_user_claims.assert_not_called()
+
+
+class OutboxUserChangedTests(SimpleTestCase):
+    """user_changed(only_if_changed=True) compares with the last event of the user"""
+
+    SNAPSHOT = {'id': 7, 'username': 'ana', 'email': 'ana@example.com', 'is_active': True}
+
+    def setUp(self):
+        for target, value in (
+            ('auth.outbox_services.connection', mock.Mock(schema_name='tenant1')),
+            ('auth.outbox_services.OutboxService.user_snapshot', mock.Mock(return_value=dict(self.SNAPSHOT))),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('auth.outbox_services.OutboxService.enqueue')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('auth.outbox_services.OutboxEvent.objects')
+        self.events = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def last_payload(self, payload):
+        self.events.filter.return_value.order_by.return_value.values_list.return_value.first.return_value = payload
+
+    def test_skips_an_unchanged_entry(self):
+        self.last_payload({'data': dict(self.SNAPSHOT)})
+        self.assertIsNone(OutboxService.user_changed(mock.Mock(id=7), only_if_changed=True))
+        self.events.filter.assert_called_once_with(key='tenant1:user:7')
+        self.enqueue.assert_not_called()
+
+    def test_emits_a_changed_entry(self):
+        self.last_payload({'data': {**self.SNAPSHOT, 'email': 'old@example.com'}})
+        OutboxService.user_changed(mock.Mock(id=7), only_if_changed=True)
+        self.enqueue.assert_called_once_with('profile.updated', 'user', 7, 'tenant1', self.SNAPSHOT)
+
+
+class RelayOutboxCommandTests(SimpleTestCase):
+    """relay_outbox drains the outbox of every tenant schema"""
+
+    @mock.patch('auth.management.commands.relay_outbox.close_producer')
+    @mock.patch('auth.management.commands.relay_outbox.schema_context')
+    @mock.patch('auth.management.commands.relay_outbox.get_tenant_schemas', return_value=['tenant1', 'tenant2'])
+    @mock.patch('auth.management.commands.relay_outbox.OutboxService.relay', return_value={'published': 1, 'failed': 0, 'batches': 1})
+    def test_relays_each_tenant_schema(self, relay, get_tenant_schemas, schema_context, close_producer):
+        from django.core.management import call_command
+
+        call_command('relay_outbox', stdout=mock.Mock())
+        self.assertEqual([call.args for call in schema_context.call_args_list], [('tenant1',), ('tenant2',)])
+        self.assertEqual(relay.call_count, 2)
+        close_producer.assert_called_once_with()
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'api'},
+})
+class ProfileCacheTests(TenantTestCase):
+    """Profile reads are served from the cache and see every AuthService update"""
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test Tenant'
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user('ana', 'ana@example.com', 'pw', first_name='Ana')
+
+    def test_second_read_is_served_from_the_cache(self):
+        self.assertEqual(AuthService.get_user_by_id(self.user.id)['first_name'], 'Ana')
+        with self.assertNumQueries(0):
+            self.assertEqual(AuthService.get_user_by_id(self.user.id)['username'], 'ana')
+
+    def test_update_user_profile_is_visible_to_the_next_read(self):
+        self.assertEqual(AuthService.get_user_by_id(self.user.id)['phone_number'], '')
+        with self.captureOnCommitCallbacks(execute=True):
+            result = AuthService.update_user_profile(self.user.id, phone_number='555-0100', bio='Pharmacist')
+        self.assertTrue(result['success'])
+        user_data = AuthService.get_user_by_id(self.user.id)
+        self.assertEqual(user_data['phone_number'], '555-0100')
+        self.assertEqual(user_data['bio'], 'Pharmacist')
+
+    def test_role_change_and_deactivation_are_visible_to_the_next_read(self):
+        AuthService.get_user_by_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            AuthService.change_user_role(self.user.id, 'expert')
+        self.assertEqual(AuthService.get_user_by_id(self.user.id)['role'], 'expert')
+        with self.captureOnCommitCallbacks(execute=True):
+            AuthService.deactivate_user(self.user.id)
+        self.assertFalse(AuthService.get_user_by_id(self.user.id)['is_active'])
+
+    def test_login_keeps_the_cached_profile(self):
+        from django.contrib.auth.models import update_last_login
+
+        AuthService.get_user_by_id(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.user)
+        with self.assertNumQueries(0):
+            AuthService.get_user_by_id(self.user.id)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'introspect'},
+})
+class IntrospectTokensTests(SimpleTestCase):
+    """Valid claims are cached per tenant schema; unknown tokens are looked up every time"""
+
+    def setUp(self):
+        patcher = mock.patch('auth.token_services.connection', schema_name='tenant1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('auth.token_services.AccessToken')
+        self.AccessToken = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.AccessToken.objects.filter.return_value.select_related.side_effect = self.rows
+
+    def rows(self, *args):
+        tokens = self.AccessToken.objects.filter.call_args.kwargs['token__in']
+        user = SimpleNamespace(
+            id=5, username='ana', email='ana@example.com', is_active=True,
+            profile=SimpleNamespace(is_active=True, role=SimpleNamespace(name='expert')),
+            account=SimpleNamespace(account_number='ACC-1'),
+        )
+        return [
+            SimpleNamespace(token=token, tenant_id=3, user=user, expires_at=timezone.now() + timedelta(hours=1))
+            for token in tokens if token == 'good'
+        ]
+
+    def test_warm_claims_skip_the_query(self):
+        first = TokenAuthService.introspect_tokens(['good', 'bad'])
+        self.assertEqual(first['good']['role'], 'expert')
+        self.assertEqual(first['good']['tenant'], 'tenant1')
+        self.assertEqual(first['bad'], {'active': False})
+
+        second = TokenAuthService.introspect_tokens(['good', 'bad'])
+        self.assertEqual(second, first)
+        # Only the unknown token went back to the database
+        self.assertEqual(self.AccessToken.objects.filter.call_args.kwargs['token__in'], ['bad'])
+        self.assertEqual(self.AccessToken.objects.filter.call_count, 2)
+
+    def test_cached_claims_are_checked_against_the_tenant(self):
+        TokenAuthService.introspect_tokens(['good'])
+        other_tenant = SimpleNamespace(id=4)
+        self.assertEqual(TokenAuthService.introspect_tokens(['good'], other_tenant)['good'], {'active': False})
+        self.assertEqual(self.AccessToken.objects.filter.call_count, 1)
+
+    def test_claims_expire_with_the_token(self):
+        self.AccessToken.objects.filter.return_value.select_related.side_effect = lambda *args: [
+            SimpleNamespace(**{**vars(row), 'expires_at': timezone.now() + timedelta(seconds=5)})
+            for row in self.rows()
+        ]
+        with mock.patch('auth.token_services.caches') as caches:
+            caches.__getitem__.return_value.get_many.return_value = {}
+            TokenAuthService.introspect_tokens(['good'])
+        cache = caches.__getitem__.return_value
+        self.assertLessEqual(cache.set.call_args.kwargs['timeout'], 5)
+        cache.set_many.assert_not_called()
+
+
+class ValidateTokenTests(SimpleTestCase):
+    """token_required accepts a token only while its user and profile are active"""
+
+    def setUp(self):
+        patcher = mock.patch('auth.token_services.AccessToken')
+        self.AccessToken = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def validate(self, user):
+        token = mock.Mock(user=user)
+        token.is_expired.return_value = False
+        self.AccessToken.objects.select_related.return_value.get.return_value = token
+        return TokenAuthService.validate_token('abc')
+
+    def test_active_user_is_returned(self):
+        user = SimpleNamespace(is_active=True, profile=SimpleNamespace(is_active=True))
+        self.assertIs(self.validate(user), user)
+        # Users without a profile only need to be active themselves
+        user = SimpleNamespace(is_active=True)
+        self.assertIs(self.validate(user), user)
+
+    def test_inactive_user_or_profile_is_refused(self):
+        self.assertIsNone(self.validate(SimpleNamespace(is_active=False, profile=SimpleNamespace(is_active=True))))
+        self.assertIsNone(self.validate(SimpleNamespace(is_active=True, profile=SimpleNamespace(is_active=False))))
+
+
+class UserBatchLookupTests(SimpleTestCase):
+    """users/batch/ answers in request order with one query and lists unknown IDs"""
+
+    def user(self, user_id, profile=True):
+        user = SimpleNamespace(
+            id=user_id, username=f'user{user_id}', email=f'user{user_id}@example.com',
+            first_name='Ana', last_name='Lima',
+        )
+        if profile:
+            user.profile = SimpleNamespace(
+                role=SimpleNamespace(name='expert'), is_admin=False, is_expert=True,
+                phone_number='555-0100', address='', bio='', is_active=True, created_at='2026-01-01',
+            )
+        return user
+
+    @mock.patch('auth.services.User')
+    def test_users_come_back_in_request_order(self, User):
+        # The database returns rows in its own order; 4 has no profile and 9 does not exist
+        User.objects.select_related.return_value.filter.return_value = [
+            self.user(7), self.user(4, profile=False), self.user(2),
+        ]
+        users, missing = AuthService.get_users_by_ids([2, 9, 7, 2, 4, 7])
+        self.assertEqual([user['id'] for user in users], [2, 7])
+        self.assertEqual(missing, [9, 4])
+        # Duplicates are looked up and returned once, in one query
+        User.objects.select_related.return_value.filter.assert_called_once_with(id__in=[2, 9, 7, 4])
+        self.assertEqual(users[0]['username'], 'user2')
+        self.assertEqual(users[0]['role'], 'expert')
+
+    def post(self, viewer, user_ids):
+        request = APIRequestFactory().post('/auth/users/batch/', {'user_ids': user_ids}, format='json')
+        force_authenticate(request, user=viewer)
+        return UserBatchLookupView.as_view()(request)
+
+    def viewer(self, is_admin=False, is_expert=False):
+        return SimpleNamespace(is_authenticated=True, profile=SimpleNamespace(is_admin=is_admin, is_expert=is_expert))
+
+    @mock.patch('auth.views.AuthService.get_users_by_ids')
+    def test_regular_users_are_refused(self, get_users_by_ids):
+        response = self.post(self.viewer(), [1, 2])
+        self.assertEqual(response.status_code, 403)
+        get_users_by_ids.assert_not_called()
+
+    @mock.patch('auth.views.AuthService.get_users_by_ids')
+    def test_experts_see_basic_fields_only(self, get_users_by_ids):
+        get_users_by_ids.return_value = ([AuthService._user_to_dict(self.user(2))], [9])
+        response = self.post(self.viewer(is_expert=True), [2, 9])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['missing'], [9])
+        self.assertEqual(
+            set(response.data['users'][0]),
+            {'id', 'username', 'first_name', 'last_name', 'role', 'date_joined'}
+        )
+
+    @mock.patch('auth.views.AuthService.get_users_by_ids')
+    def test_admins_see_every_field(self, get_users_by_ids):
+        get_users_by_ids.return_value = ([AuthService._user_to_dict(self.user(2))], [])
+        response = self.post(self.viewer(is_admin=True), [2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users'][0]['email'], 'user2@example.com')
+        self.assertEqual(response.data['missing'], [])
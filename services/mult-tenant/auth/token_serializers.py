@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Account, AccessToken, UserProfile, Role
+from .token_services import TokenAuthService
 
 class AccountSerializer(serializers.ModelSerializer):
     """Serializer for Account model"""
@@ -58,6 +59,14 @@ class LogoutSerializer(serializers.Serializer):
     """Serializer for logout"""
     token = serializers.CharField()
 
+class TokenIntrospectSerializer(serializers.Serializer):
+    """Serializer for batch token introspection"""
+    tokens = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=TokenAuthService.MAX_INTROSPECT_TOKENS
+    )
+
 class AccountBalanceSerializer(serializers.Serializer):
     """Serializer for account balance update"""
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
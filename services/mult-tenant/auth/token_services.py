@@ -1,14 +1,21 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
 from .models import AccessToken, Account, Tenant
+from .cache_services import ProfileCacheService
 from .utils import generate_simple_token
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List
 from datetime import datetime, timedelta
+import hashlib
 
 class TokenAuthService:
     """Token-based authentication service"""
     
+    CLAIMS_CACHE_ALIAS = 'api'
+    CLAIMS_TTL = 60
+    MAX_INTROSPECT_TOKENS = 100
 
     
     @staticmethod
@@ -26,7 +33,9 @@ class TokenAuthService:
             AccessToken object
         """
         # Deactivate existing tokens for this user in this tenant
-        AccessToken.objects.filter(user=user, tenant=tenant, is_active=True).update(is_active=False)
+        previous = AccessToken.objects.filter(user=user, tenant=tenant, is_active=True)
+        TokenAuthService.forget_claims(previous.values_list('token', flat=True))
+        previous.update(is_active=False)
         
         # Create new token with simple token generation
         token = AccessToken.objects.create(
@@ -52,14 +61,15 @@ class TokenAuthService:
             tenant: Tenant object (optional, for additional validation)
             
         Returns:
-            User object if token is valid, None otherwise
+            User object if token is valid and its user and profile are
+            active (the rule introspect_tokens applies), None otherwise
         """
         try:
             filters = {'token': token_string, 'is_active': True}
             if tenant:
                 filters['tenant'] = tenant
                 
-            token = AccessToken.objects.get(**filters)
+            token = AccessToken.objects.select_related('user__profile').get(**filters)
             
             # Check if token is expired
             if token.is_expired():
@@ -67,6 +77,8 @@ class TokenAuthService:
                 token.save()
                 return None
             
+            if not TokenAuthService._user_is_active(token.user):
+                return None
             return token.user
             
         except AccessToken.DoesNotExist:
@@ -170,6 +182,7 @@ class TokenAuthService:
             token = AccessToken.objects.get(**filters)
             token.is_active = False
             token.save()
+            TokenAuthService.forget_claims([token.token])
             
             return {
                 'success': True,
@@ -251,6 +264,9 @@ class TokenAuthService:
         """
         Get user information from token
         
+        The token is checked against the cached claims and the user data
+        comes from the profile cache, so a warm read touches only Redis.
+        
         Args:
             token_string: Token string
             tenant: Tenant object (optional, for additional validation)
@@ -258,24 +274,133 @@ class TokenAuthService:
         Returns:
             Dict containing user data or None if token is invalid
         """
-        user = TokenAuthService.validate_token(token_string, tenant)
-        if user:
-            return {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'tenant_id': user.profile.tenant.id if hasattr(user, 'profile') else None,
-                'tenant_name': user.profile.tenant.name if hasattr(user, 'profile') else None,
-                'role': user.profile.role.name if user.profile.role else 'user',
-                'is_admin': user.profile.is_admin,
-                'is_expert': user.profile.is_expert,
-                'account_number': user.account.account_number if hasattr(user, 'account') else None,
-                'balance': float(user.account.balance) if hasattr(user, 'account') else 0.0,
-                'is_verified': user.account.is_verified if hasattr(user, 'account') else False
-            }
-        return None
+        claims = TokenAuthService.introspect_tokens([token_string], tenant)[token_string]
+        if not claims['active']:
+            return None
+        entry = ProfileCacheService.get(claims['user_id'])
+        if entry is None:
+            return None
+        profile, account = entry['profile'], entry['account']
+        return {
+            'id': profile['id'],
+            'username': profile['username'],
+            'email': profile['email'],
+            'first_name': profile['first_name'],
+            'last_name': profile['last_name'],
+            'tenant_id': profile['tenant_id'],
+            'tenant_name': profile['tenant_name'],
+            'role': profile['role'],
+            'is_admin': profile['is_admin'],
+            'is_expert': profile['is_expert'],
+            'account_number': account.get('account_number'),
+            'balance': account.get('balance', 0.0),
+            'is_verified': account.get('is_verified', False)
+        }
+    
+    @staticmethod
+    def _user_is_active(user: User) -> bool:
+        """Tokens only authenticate active users whose profile, if any, is active"""
+        profile = getattr(user, 'profile', None)
+        return user.is_active and (profile is None or profile.is_active)
+    
+    @staticmethod
+    def _claims_key(token_string: str) -> str:
+        digest = hashlib.sha256(token_string.encode('utf-8')).hexdigest()
+        return f'token_claims:{connection.schema_name}:{digest}'
+    
+    @staticmethod
+    def _claims(token: AccessToken) -> Dict[str, Any]:
+        user = token.user
+        profile = getattr(user, 'profile', None)
+        account = getattr(user, 'account', None)
+        return {
+            'active': True,
+            'user_id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'role': profile.role.name if profile and profile.role else 'user',
+            'tenant': connection.schema_name,
+            'tenant_id': token.tenant_id,
+            'account_number': account.account_number if account else None,
+            'expires_at': token.expires_at.isoformat(),
+        }
+    
+    @staticmethod
+    def introspect_tokens(tokens: List[str], tenant: Tenant = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Claims of many tokens in one call
+        
+        Cached claims are read with one GET of all keys; the rest are
+        resolved with a single query joining user, profile, role and
+        account. Valid claims are cached for up to CLAIMS_TTL seconds and
+        never past the token's expiry; invalid tokens are not cached, so a
+        token issued a moment ago is recognised immediately.
+        
+        Args:
+            tokens: Token strings (at most MAX_INTROSPECT_TOKENS)
+            tenant: Tenant object (optional, for additional validation)
+            
+        Returns:
+            Dict of token to claims; unknown, revoked or expired tokens map
+            to {'active': False}
+        """
+        cache = caches[TokenAuthService.CLAIMS_CACHE_ALIAS]
+        keys = {token: TokenAuthService._claims_key(token) for token in dict.fromkeys(tokens)}
+        cached = cache.get_many(list(keys.values()))
+        
+        results = {}
+        misses = []
+        for token, key in keys.items():
+            claims = cached.get(key)
+            if claims is None:
+                misses.append(token)
+            elif tenant and claims['tenant_id'] != tenant.id:
+                results[token] = {'active': False}
+            else:
+                results[token] = claims
+        
+        if misses:
+            now = timezone.now()
+            filters = {'token__in': misses, 'is_active': True, 'expires_at__gt': now}
+            if tenant:
+                filters['tenant'] = tenant
+            rows = AccessToken.objects.filter(**filters).select_related(
+                'user', 'user__profile__role', 'user__account'
+            )
+            found = {}
+            for row in rows:
+                if TokenAuthService._user_is_active(row.user):
+                    found[row.token] = TokenAuthService._claims(row)
+            
+            to_cache = {}
+            for token in misses:
+                claims = found.get(token)
+                results[token] = claims or {'active': False}
+                if claims is None:
+                    continue
+                remaining = int((datetime.fromisoformat(claims['expires_at']) - now).total_seconds())
+                if remaining >= TokenAuthService.CLAIMS_TTL:
+                    to_cache[keys[token]] = claims
+                elif remaining > 0:
+                    cache.set(keys[token], claims, timeout=remaining)
+            if to_cache:
+                cache.set_many(to_cache, timeout=TokenAuthService.CLAIMS_TTL)
+        return results
+    
+    @staticmethod
+    def forget_claims(tokens: Iterable[str]):
+        """Drop cached claims of revoked tokens once the revocation commits"""
+        keys = [TokenAuthService._claims_key(token) for token in tokens]
+        if keys:
+            # After commit, so a concurrent introspection cannot re-cache pre-commit claims
+            transaction.on_commit(lambda: caches[TokenAuthService.CLAIMS_CACHE_ALIAS].delete_many(keys))
+    
+    @staticmethod
+    def forget_user_claims(user: User):
+        """Drop cached claims of all of a user's active tokens, e.g. after a role change"""
+        TokenAuthService.forget_claims(
+            AccessToken.objects.filter(user=user, is_active=True).values_list('token', flat=True)
+        )
     
     @staticmethod
     def cleanup_expired_tokens(tenant: Tenant = None):
@@ -3,17 +3,19 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.db import transaction
 from .models import Account, AccessToken, Tenant
 from .token_serializers import (
     TokenLoginSerializer, TokenResponseSerializer, RefreshTokenSerializer,
-    LogoutSerializer, AccountSerializer, UserAccountSerializer,
+    LogoutSerializer, TokenIntrospectSerializer, AccountSerializer, UserAccountSerializer,
     AccountBalanceSerializer, AccountVerificationSerializer,
     AccountTransactionSerializer, AccountStatementSerializer
 )
 from .token_services import TokenAuthService
 from .services import AuthService
 from functools import wraps
+import hmac
 import json
 
 def token_required(view_func):
@@ -148,6 +150,32 @@ class TokenLogoutView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenIntrospectView(APIView):
+    """
+    Batch token introspection for downstream services
+    
+    POST {"tokens": [...]} -> {"results": {token: claims}}; inactive tokens
+    map to {"active": false}. Callers must send AUTH_SERVICE_KEY in the
+    X-Service-Key header; without a configured key every call is refused.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def post(self, request):
+        service_key = getattr(settings, 'AUTH_SERVICE_KEY', '').encode('utf-8')
+        provided = request.headers.get('X-Service-Key', '').encode('utf-8')
+        # Fail closed: an empty key would otherwise match a missing header
+        if not (hmac.compare_digest(provided, service_key) and service_key):
+            return Response({'error': 'Invalid service key'}, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = TokenIntrospectSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        tenant = getattr(request, 'tenant', None)
+        results = TokenAuthService.introspect_tokens(serializer.validated_data['tokens'], tenant)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
 class TokenRefreshView(APIView):
     """Token refresh endpoint"""
     permission_classes = [permissions.AllowAny]
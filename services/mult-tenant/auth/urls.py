@@ -24,6 +24,7 @@ urlpatterns = [
     
     # General user lookup (admin/expert only)
     path('user/<int:user_id>/', views.get_user_by_id, name='get_user_by_id'),
+    path('users/batch/', views.UserBatchLookupView.as_view(), name='user_batch_lookup'),
     
     # Token-based authentication endpoints
     path('token/login/', token_views.TokenLoginView.as_view(), name='token_login'),
@@ -31,6 +32,7 @@ urlpatterns = [
     path('token/refresh/', token_views.TokenRefreshView.as_view(), name='token_refresh'),
     path('token/profile/', token_views.UserProfileView.as_view(), name='token_profile'),
     path('token/user-info/', token_views.get_user_info, name='token_user_info'),
+    path('token/introspect/', token_views.TokenIntrospectView.as_view(), name='token_introspect'),
     path('token/logout-header/', token_views.logout_with_header, name='token_logout_header'),
     
     # Account management endpoints
@@ -2,6 +2,9 @@ import hashlib
 import time
 import random
 import string
+from typing import List
+
+from django_tenants.utils import get_public_schema_name, get_tenant_model
 
 def generate_simple_token(user_id: int) -> str:
     """
@@ -48,3 +51,16 @@ def generate_verification_token(user_id: int) -> str:
     token_string = f"VERIFY_{user_id}_{timestamp}_{random_str}"
     
     return hashlib.md5(token_string.encode()).hexdigest()[:12].upper()
+
+def get_tenant_schemas() -> List[str]:
+    """
+    Schema names of every tenant, excluding the public schema
+    
+    Returns:
+        Schema names in alphabetical order
+    """
+    return list(
+        get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        .order_by('schema_name')
+        .values_list('schema_name', flat=True)
+    )
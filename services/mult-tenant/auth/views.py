@@ -9,7 +9,7 @@ from .models import UserProfile, Role
 from .serializers import (
     UserSerializer, RegisterUserSerializer, LoginSerializer,
     ChangePasswordSerializer, UpdateProfileSerializer, ChangeRoleSerializer,
-    UserProfileSerializer
+    UserProfileSerializer, UserBatchLookupSerializer
 )
 from .services import AuthService
 from functools import wraps
@@ -266,6 +266,19 @@ class ExpertUserListView(APIView):
         
         return Response(user_data, status=status.HTTP_200_OK)
 
+def _visible_user_data(viewer, user_data):
+    """Limit user data to basic info when the viewer is an expert but not an admin"""
+    if viewer.profile.is_expert and not viewer.profile.is_admin:
+        return {
+            'id': user_data['id'],
+            'username': user_data['username'],
+            'first_name': user_data['first_name'],
+            'last_name': user_data['last_name'],
+            'role': user_data['role'],
+            'date_joined': user_data['created_at']
+        }
+    return user_data
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_user_by_id(request, user_id):
@@ -285,18 +298,28 @@ def get_user_by_id(request, user_id):
     
     user_data = AuthService.get_user_by_id(user_id)
     if user_data:
-        # If expert, limit the data returned
-        if request.user.profile.is_expert and not request.user.profile.is_admin:
-            limited_data = {
-                'id': user_data['id'],
-                'username': user_data['username'],
-                'first_name': user_data['first_name'],
-                'last_name': user_data['last_name'],
-                'role': user_data['role'],
-                'date_joined': user_data['created_at']
-            }
-            return Response(limited_data, status=status.HTTP_200_OK)
-        
-        return Response(user_data, status=status.HTTP_200_OK)
+        return Response(_visible_user_data(request.user, user_data), status=status.HTTP_200_OK)
     
     return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+class UserBatchLookupView(APIView):
+    """Get several users by ID in one call (admin/expert only)"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        profile = getattr(request.user, 'profile', None)
+        if not profile or not (profile.is_admin or profile.is_expert):
+            return Response(
+                {'error': 'Insufficient permissions'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = UserBatchLookupSerializer(data=request.data)
+        if serializer.is_valid():
+            users, missing = AuthService.get_users_by_ids(serializer.validated_data['user_ids'])
+            return Response({
+                'users': [_visible_user_data(request.user, user_data) for user_data in users],
+                'missing': missing
+            }, status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
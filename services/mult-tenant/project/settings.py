@@ -241,4 +241,5 @@ CACHEOPS = {
     'auth.User': {'ops': 'all', 'timeout': 60 * 30},      # 30 minutes
 }
 
-
+# Shared secret downstream services must send to token/introspect/; the endpoint refuses all calls while it is empty
+AUTH_SERVICE_KEY = os.getenv('AUTH_SERVICE_KEY', '')
@@ -1,22 +1,23 @@
-from time import sleep
-from kafka import KafkaProducer
-from json import dumps
-import socket
+from .publisher import publisher
+from .routing import topics_for
+
 
 class ProducerUserCreated:
+    """Deprecated: use pharmacies.publisher.publisher directly"""
+
     def __init__(self, tenant_id) -> None:
-        self.topic_name = f'user_{tenant_id}'
-        conf = {
-            "bootstrap.servers": "localhost:9092",
-            "client.id": socket.gethostname(),
-        }
-        self.producer = KafkaProducer(**conf)
+        self.tenant_id = str(tenant_id)
 
     def publish(self, method, body):
-        print(f"Inside UserService: Sending to Kafka for tenant {self.topic_name}: ")
-        print(body)
-        self.producer.send(
-            topic=self.topic_name,
-            key=b"key.user.created",
-            value=dumps(body).encode('utf-8'),
-        )
+        futures = [
+            publisher.publish(
+                topic,
+                event_type=method or 'user.created',
+                entity='user',
+                entity_id=body.get('id') if isinstance(body, dict) else None,
+                data=body,
+                tenant=self.tenant_id,
+            )
+            for topic in topics_for('user', self.tenant_id)
+        ]
+        return futures[0]
@@ -0,0 +1,131 @@
+import logging
+from typing import Iterable, List, Optional
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django_redis import get_redis_connection
+from django_tenants.utils import schema_context
+from redis.exceptions import RedisError
+
+from .models import Medicine
+from .signals import stock_threshold_crossed
+from .utils import get_tenant_schema
+
+logger = logging.getLogger(__name__)
+
+
+class StockAlertService:
+    """
+    Incremental low-stock tracking
+
+    Only medicines touched by a stock mutation are re-evaluated. The
+    per-tenant Redis set of low medicine ids is both the served
+    "currently low" view and the previous state used to detect
+    threshold crossings, so no periodic scan of Medicine is needed.
+    """
+
+    CACHE_ALIAS = 'inventory'
+
+    @staticmethod
+    def _keys(schema: str):
+        cache = caches[StockAlertService.CACHE_ALIAS]
+        return cache.make_key(f'low_stock:{schema}'), cache.make_key(f'low_stock_ready:{schema}')
+
+    @staticmethod
+    def touch(medicine_ids: Iterable[int]):
+        """
+        Re-evaluate the given medicines once the current transaction commits
+
+        Args:
+            medicine_ids: Ids of medicines whose quantity or reorder level changed
+        """
+        ids = sorted(set(medicine_ids))
+        if not ids:
+            return
+        schema = get_tenant_schema()
+        transaction.on_commit(lambda: StockAlertService.evaluate(ids, schema))
+
+    @staticmethod
+    def evaluate(medicine_ids: List[int], schema: str):
+        """Compare touched medicines against their reorder level and emit crossings"""
+        key, ready_key = StockAlertService._keys(schema)
+        with schema_context(schema):
+            current = {
+                pk: (name, quantity, reorder_level)
+                for pk, name, quantity, reorder_level in Medicine.objects.nocache().filter(id__in=medicine_ids)
+                .values_list('id', 'name', 'quantity', 'reorder_level')
+            }
+        try:
+            redis = get_redis_connection(StockAlertService.CACHE_ALIAS)
+            pipe = redis.pipeline(transaction=False)
+            pipe.exists(ready_key)
+            for pk in medicine_ids:
+                row = current.get(pk)
+                if row is not None and row[1] <= row[2]:
+                    pipe.sadd(key, pk)
+                else:
+                    pipe.srem(key, pk)
+            ready, *changed = pipe.execute()
+        except RedisError:
+            logger.warning('Low-stock set update failed for %s, forcing a rebuild', schema, exc_info=True)
+            StockAlertService._invalidate(ready_key)
+            return
+
+        if not ready:
+            # No trustworthy previous state yet; the next read rebuilds the set
+            return
+        for pk, was_changed in zip(medicine_ids, changed):
+            row = current.get(pk)
+            if not was_changed or row is None:
+                continue
+            name, quantity, reorder_level = row
+            stock_threshold_crossed.send(
+                sender=Medicine,
+                medicine_id=pk,
+                name=name,
+                quantity=quantity,
+                reorder_level=reorder_level,
+                state='low' if quantity <= reorder_level else 'restocked',
+            )
+
+    @staticmethod
+    def _invalidate(ready_key: str):
+        try:
+            get_redis_connection(StockAlertService.CACHE_ALIAS).delete(ready_key)
+        except RedisError:
+            pass
+
+    @staticmethod
+    def rebuild(schema: Optional[str] = None) -> int:
+        """
+        Recompute the low-stock set from the database
+
+        Only needed when Redis lost the set (first use, flush, eviction).
+
+        Returns:
+            Number of medicines currently low
+        """
+        schema = schema or get_tenant_schema()
+        key, ready_key = StockAlertService._keys(schema)
+        low_ids = list(
+            Medicine.objects.nocache().filter(quantity__lte=F('reorder_level')).values_list('id', flat=True)
+        )
+        redis = get_redis_connection(StockAlertService.CACHE_ALIAS)
+        pipe = redis.pipeline()
+        pipe.delete(key)
+        if low_ids:
+            pipe.sadd(key, *low_ids)
+        pipe.set(ready_key, 1)
+        pipe.execute()
+        return len(low_ids)
+
+    @staticmethod
+    def low_stock_ids() -> List[int]:
+        """Ids of the current tenant's low-stock medicines, in O(size of the set)"""
+        schema = get_tenant_schema()
+        key, ready_key = StockAlertService._keys(schema)
+        redis = get_redis_connection(StockAlertService.CACHE_ALIAS)
+        if not redis.exists(ready_key):
+            StockAlertService.rebuild(schema)
+        return sorted(int(pk) for pk in redis.smembers(key))
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PharmaciesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pharmacies'
+
+    def ready(self):
+        from cacheops.signals import cache_read
+
+        from .cache_services import query_cache_metrics
+        # Registers its event handlers with the consumer
+        from . import directory_services  # noqa: F401
+
+        cache_read.connect(query_cache_metrics.on_cache_read, dispatch_uid='pharmacies_query_cache_metrics')
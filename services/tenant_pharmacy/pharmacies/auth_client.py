@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AuthServiceUnavailable(Exception):
+    """Raised when the auth service cannot answer an introspection call"""
+
+
+class _Batch:
+    """Tokens of one tenant waiting on one introspection call"""
+
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.tokens: List[str] = []
+        self.closed = False
+        self.done = threading.Event()
+        self.results: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.error: Optional[BaseException] = None
+
+
+class TokenIntrospectionClient:
+    """
+    Validates auth-service Bearer tokens for the pharmacy service
+
+    Answers come from a short-TTL in-process cache, so a warm token costs
+    a dict lookup. Misses are coalesced: a token already being looked up
+    waits on that call, and misses from concurrent requests arriving
+    within BATCH_WINDOW go out together in one POST to the batch
+    introspection endpoint over a pooled keep-alive session.
+
+    The auth service keeps tokens in each tenant's schema and picks the
+    schema from the Host header, so everything is per tenant: cache
+    entries, in-flight lookups and batches, and each batch is sent with
+    the Host of its tenant (AUTH_TENANT_HOST).
+    """
+
+    BATCH_WINDOW = 0.002
+    MAX_BATCH = 100
+    MAX_ENTRIES = 50000
+    TIMEOUT = (1.0, 3.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._inflight: Dict[str, _Batch] = {}
+        self._open: Dict[str, _Batch] = {}
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+        self._stats = {'hits': 0, 'misses': 0, 'calls': 0, 'errors': 0}
+
+    @staticmethod
+    def _setting(name: str, default: Any) -> Any:
+        return getattr(settings, name, default)
+
+    @property
+    def session(self) -> requests.Session:
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            service_key = self._setting('AUTH_SERVICE_KEY', '')
+            if service_key:
+                session.headers['X-Service-Key'] = service_key
+            self._session, self._pid = session, pid
+        return self._session
+
+    @staticmethod
+    def _key(tenant: str, token: str) -> str:
+        # Cache by digest so raw tokens are not kept in memory
+        return f"{tenant}:{hashlib.blake2b(token.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def _cached(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        claims, expires = entry
+        if expires <= time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, claims
+
+    def _store(self, key: str, claims: Optional[Dict[str, Any]]):
+        if claims is None:
+            ttl = self._setting('AUTH_TOKEN_NEGATIVE_TTL', 5)
+        else:
+            ttl = self._setting('AUTH_TOKEN_CACHE_TTL', 30)
+            expires_at = parse_datetime(claims['expires_at']) if claims.get('expires_at') else None
+            if expires_at is not None:
+                # Never cache a token past its own expiry
+                ttl = min(ttl, max(expires_at.timestamp() - time.time(), 0))
+        self._cache[key] = (claims, time.monotonic() + ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def introspect(self, token: str, tenant: str) -> Optional[Dict[str, Any]]:
+        """
+        Claims of an active token
+
+        Args:
+            token: Bearer token
+            tenant: Schema name of the tenant the token is presented to
+
+        Returns:
+            Dict with user_id, username, tenant, role and expires_at, or None
+            if the token is unknown, revoked or expired
+
+        Raises:
+            AuthServiceUnavailable: If the token is not cached and the auth
+                service cannot be reached
+        """
+        key = self._key(tenant, token)
+        leader = False
+        with self._lock:
+            found, claims = self._cached(key)
+            if found:
+                self._stats['hits'] += 1
+                return claims
+            self._stats['misses'] += 1
+            batch = self._inflight.get(key)
+            if batch is None:
+                batch = self._open.get(tenant)
+                if batch is None or batch.closed or len(batch.tokens) >= self.MAX_BATCH:
+                    batch = self._open[tenant] = _Batch(tenant)
+                    leader = True
+                batch.tokens.append(token)
+                self._inflight[key] = batch
+
+        if leader:
+            # Let concurrent misses join before the call goes out
+            time.sleep(self.BATCH_WINDOW)
+            with self._lock:
+                batch.closed = True
+                if self._open.get(tenant) is batch:
+                    del self._open[tenant]
+            self._run(batch)
+        elif not batch.done.wait(timeout=sum(self.TIMEOUT) + 1):
+            raise AuthServiceUnavailable('Timed out waiting for token introspection')
+
+        if batch.error is not None:
+            raise AuthServiceUnavailable(str(batch.error)) from batch.error
+        return batch.results.get(token)
+
+    def _run(self, batch: _Batch):
+        try:
+            batch.results = self._call(batch.tenant, batch.tokens)
+        except Exception as exc:
+            # Transport errors, 5xx, malformed bodies: every waiter must be released
+            batch.error = exc
+            logger.warning('Token introspection of %d token(s) failed: %r', len(batch.tokens), exc)
+        with self._lock:
+            for token in batch.tokens:
+                key = self._key(batch.tenant, token)
+                if batch.error is None:
+                    self._store(key, batch.results.get(token))
+                if self._inflight.get(key) is batch:
+                    del self._inflight[key]
+            self._stats['calls'] += 1
+            if batch.error is not None:
+                self._stats['errors'] += 1
+        batch.done.set()
+
+    def _call(self, tenant: str, tokens: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        url = self._setting('AUTH_INTROSPECTION_URL', 'http://auth:8000/auth/token/introspect/')
+        host = self._setting('AUTH_TENANT_HOST', '{tenant}.auth').format(tenant=tenant)
+        response = self.session.post(url, json={'tokens': list(tokens)}, headers={'Host': host}, timeout=self.TIMEOUT)
+        response.raise_for_status()
+        results = response.json()['results']
+        return {token: claims if claims and claims.get('active') else None for token, claims in results.items()}
+
+    def invalidate(self, token: str, tenant: str):
+        with self._lock:
+            self._cache.pop(self._key(tenant, token), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+
+token_client = TokenIntrospectionClient()
@@ -0,0 +1,37 @@
+from typing import Any, Dict
+
+from rest_framework.authentication import BaseAuthentication
+
+
+class RemoteUser:
+    """User authenticated by the auth service; not backed by a local row"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims: Dict[str, Any]):
+        self.claims = claims
+        self.id = self.pk = claims.get('user_id')
+        self.username = claims.get('username', '')
+        self.role = claims.get('role')
+        self.tenant = claims.get('tenant')
+
+    @property
+    def is_staff(self) -> bool:
+        return self.role == 'admin'
+
+    def __str__(self):
+        return self.username
+
+
+class BearerTokenAuthentication(BaseAuthentication):
+    """DRF side of BearerTokenMiddleware: exposes the introspected claims as request.user"""
+
+    def authenticate(self, request):
+        claims = getattr(request._request, 'auth_claims', None)
+        if not claims:
+            return None
+        return RemoteUser(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer'
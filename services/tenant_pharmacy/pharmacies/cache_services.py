@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from cacheops import invalidate_dict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .utils import get_tenant_schema
+
+logger = logging.getLogger(__name__)
+
+
+def model_row(obj) -> Dict[str, Any]:
+    """Column values of a model instance by attname, as cacheops matches them"""
+    return {field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields}
+
+
+def invalidate_rows(model, rows: Iterable[Dict[str, Any]]):
+    """
+    Drop the cached queries a raw write to these rows can affect, after commit
+
+    For writes that bypass the ORM and so cacheops. Each dict holds a
+    row's values by attname; pass a row both before and after the write
+    when it was updated. Only the queries those rows match are dropped,
+    where invalidate_model would sweep every cached query of the model.
+    """
+    rows: List[Dict[str, Any]] = list(rows)
+    if rows:
+        transaction.on_commit(lambda: [invalidate_dict(model, row) for row in rows])
+
+
+class QueryCacheMetrics:
+    """
+    Hit/miss counters for the cacheops query cache, per tenant and model
+
+    Reads are counted in process and flushed to a Redis hash per tenant
+    in one pipeline every few seconds, so counting adds no round trip
+    to cached reads while the totals stay shared across workers.
+    """
+
+    CACHE_ALIAS = 'default'
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _key(schema: str) -> str:
+        return caches[QueryCacheMetrics.CACHE_ALIAS].make_key(f'cacheops_stats:{schema}')
+
+    def _interval(self) -> float:
+        if self.flush_interval is None:
+            return getattr(settings, 'CACHEOPS_STATS_FLUSH_INTERVAL', 5)
+        return self.flush_interval
+
+    def on_cache_read(self, sender, func=None, hit=None, **kwargs):
+        """cacheops `cache_read` receiver"""
+        if sender is None:
+            # cached_as/cached_view reads are not tied to one model
+            return
+        field = f"{sender._meta.label_lower}:{'hit' if hit else 'miss'}"
+        with self._lock:
+            self._counts[(get_tenant_schema(), field)] += 1
+            due = time.monotonic() - self._last_flush >= self._interval()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+        try:
+            pipe = get_redis_connection(self.CACHE_ALIAS).pipeline(transaction=False)
+            for (schema, field), count in counts.items():
+                pipe.hincrby(self._key(schema), field, count)
+            pipe.execute()
+        except RedisError:
+            logger.warning('Dropped %d query cache counters', sum(counts.values()), exc_info=True)
+
+    def stats(self, schema: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Hit rate per cached model for a tenant
+
+        Returns:
+            Dict of model label to hits, misses and hit_rate
+        """
+        self.flush()
+        schema = schema or get_tenant_schema()
+        raw = get_redis_connection(self.CACHE_ALIAS).hgetall(self._key(schema))
+        models: Dict[str, Dict[str, Any]] = {}
+        for field, count in raw.items():
+            label, _, outcome = field.decode().rpartition(':')
+            entry = models.setdefault(label, {'hits': 0, 'misses': 0})
+            entry['hits' if outcome == 'hit' else 'misses'] += int(count)
+        for entry in models.values():
+            reads = entry['hits'] + entry['misses']
+            entry['hit_rate'] = round(entry['hits'] / reads, 4) if reads else None
+        return models
+
+    def reset(self, schema: Optional[str] = None):
+        with self._lock:
+            self._counts.clear()
+        get_redis_connection(self.CACHE_ALIAS).delete(self._key(schema or get_tenant_schema()))
+
+
+query_cache_metrics = QueryCacheMetrics()
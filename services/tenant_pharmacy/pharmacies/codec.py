@@ -0,0 +1,171 @@
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+import msgpack
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+# Leading byte of a binary event; JSON events start with '{' instead
+FORMAT_MSGPACK_V1 = 0x01
+
+# Event schema registry: data fields by event type and schema version.
+# Fields are positional on the wire, so a version may only append fields
+# to the previous one; never reorder, rename or remove. A consumer maps
+# the fields it knows and ignores trailing ones from newer versions, and
+# gets None for fields an older producer did not send.
+EVENT_SCHEMAS: Dict[str, Dict[int, Tuple[str, ...]]] = {
+    'medicine.updated': {
+        1: ('id', 'name', 'quantity', 'price', 'reorder_level'),
+    },
+    'medicine.deleted': {
+        1: ('id',),
+    },
+    'sale.recorded': {
+        1: ('id', 'name_medicine', 'quantity', 'date'),
+    },
+    'user.created': {
+        1: ('id', 'username', 'email', 'first_name', 'last_name'),
+        2: ('id', 'username', 'email', 'first_name', 'last_name',
+            'is_active', 'role', 'phone_number', 'account_id', 'account_number'),
+    },
+    'profile.updated': {
+        1: ('id', 'username', 'email', 'first_name', 'last_name',
+            'is_active', 'role', 'phone_number', 'account_id', 'account_number'),
+    },
+    'account.created': {
+        1: ('account_id', 'account_number', 'user_id', 'username', 'email'),
+    },
+}
+
+_json_encoder = DjangoJSONEncoder()
+_epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class EventDecodeError(ValueError):
+    """Raised for a message that is neither a known binary format nor JSON"""
+
+
+def latest_version(event_type: str) -> int:
+    versions = EVENT_SCHEMAS.get(event_type)
+    return max(versions) if versions else 0
+
+
+def _plain(value: Any) -> Any:
+    """Same primitives the JSON encoding produces, so both codecs decode alike"""
+    if isinstance(value, (datetime, date, Decimal)):
+        return _json_encoder.default(value)
+    return value
+
+
+def _millis(value: Any) -> Optional[int]:
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    # Integer arithmetic; float timestamps can round across a millisecond
+    return (value - _epoch) // timedelta(milliseconds=1)
+
+
+def _iso(millis: Optional[int]) -> Optional[str]:
+    if millis is None:
+        return None
+    return _json_encoder.default(_epoch + timedelta(milliseconds=millis))
+
+
+def encode_json(envelope: Dict[str, Any]) -> bytes:
+    return json.dumps(envelope, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def encode_msgpack(envelope: Dict[str, Any]) -> bytes:
+    """
+    Version byte followed by a msgpack array:
+    [event, tenant, entity, id, occurred_at_ms, schema_version, data, extras]
+
+    `data` lists the schema's fields in order; fields missing from the
+    schema travel in `extras`, which is omitted when empty. Event types
+    without a schema use version 0 and send `data` as a map.
+    """
+    event_type = envelope['event']
+    data = envelope.get('data') or {}
+    version = latest_version(event_type)
+    if version:
+        fields = EVENT_SCHEMAS[event_type][version]
+        body = [_plain(data.get(field)) for field in fields]
+        extras = {key: _plain(value) for key, value in data.items() if key not in fields}
+    else:
+        body = {key: _plain(value) for key, value in data.items()}
+        extras = {}
+    record = [
+        event_type,
+        envelope['tenant'],
+        envelope['entity'],
+        envelope['id'],
+        _millis(envelope.get('occurred_at')),
+        version,
+        body,
+    ]
+    if extras:
+        record.append(extras)
+    return bytes([FORMAT_MSGPACK_V1]) + msgpack.packb(record, use_bin_type=True)
+
+
+def _decode_msgpack(payload: bytes) -> Dict[str, Any]:
+    record = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    event_type, tenant, entity, entity_id, occurred_ms, version, body = record[:7]
+    if version and isinstance(body, list):
+        versions = EVENT_SCHEMAS.get(event_type, {})
+        # A newer producer's fields we do not know yet are ignored
+        known = versions.get(min(version, max(versions))) if versions else ()
+        data = {field: body[index] if index < len(body) else None for index, field in enumerate(known)}
+    else:
+        data = dict(body)
+    if len(record) > 7:
+        data.update(record[7])
+    return {
+        'event': event_type,
+        'tenant': tenant,
+        'entity': entity,
+        'id': entity_id,
+        'occurred_at': _iso(occurred_ms),
+        'data': data,
+    }
+
+
+def encode(envelope: Dict[str, Any], codec: Optional[str] = None) -> bytes:
+    """
+    Encode an event envelope with the configured codec
+
+    Args:
+        envelope: Dict with event, tenant, entity, id, occurred_at and data
+        codec: 'msgpack' or 'json' (EVENT_CODEC by default)
+    """
+    codec = codec or getattr(settings, 'EVENT_CODEC', 'msgpack')
+    if codec == 'json':
+        return encode_json(envelope)
+    if codec == 'msgpack':
+        return encode_msgpack(envelope)
+    raise ValueError(f'Unknown event codec {codec!r}')
+
+
+def decode(value: bytes) -> Dict[str, Any]:
+    """
+    Decode a message of either format into the JSON-shaped envelope
+
+    Raises:
+        EventDecodeError: If the value is empty, of an unknown format or corrupt
+    """
+    if not value:
+        raise EventDecodeError('Empty message')
+    try:
+        if value[0] == FORMAT_MSGPACK_V1:
+            return _decode_msgpack(value[1:])
+        if value[:1] == b'{':
+            return json.loads(value)
+    except (ValueError, TypeError, KeyError, IndexError, msgpack.UnpackException) as exc:
+        raise EventDecodeError(str(exc)) from exc
+    raise EventDecodeError(f'Unknown event format byte {value[0]:#04x}')
@@ -0,0 +1,307 @@
+import hashlib
+import logging
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+from django_tenants.utils import schema_context
+from redis.exceptions import RedisError
+
+from .codec import EventDecodeError, decode
+from .routing import record_tenant, subscription_pattern
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONSUMER_CONFIG = {
+    'bootstrap_servers': 'localhost:9092',
+    'auto_offset_reset': 'earliest',
+    # Offsets are committed by the worker once a batch is handled
+    'enable_auto_commit': False,
+    # Pick up newly matching topics without a restart
+    'metadata_max_age_ms': 30000,
+    'max_poll_interval_ms': 300000,
+}
+
+# Streams consumed by default (see routing.subscription_pattern)
+DEFAULT_STREAMS = ['medicine', 'sales', 'user', 'directory']
+
+Handler = Callable[[Dict[str, Any], Any], None]
+
+_handlers: Dict[str, Handler] = {}
+
+
+def handles(*event_types: str):
+    """Register the decorated function as the handler of some event types"""
+    def register(fn: Handler) -> Handler:
+        for event_type in event_types:
+            _handlers[event_type] = fn
+        return fn
+    return register
+
+
+def message_id(record) -> str:
+    """
+    Identity of a message for deduplication
+
+    The outbox relay re-sends a row with identical bytes, so a redelivered
+    event hashes the same whatever offset it was written at. The topic is
+    left out so a copy dual-written to the legacy and the shared topic
+    during migration is handled once.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(record.key or b'')
+    digest.update(b'\0')
+    digest.update(record.value or b'')
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Redis record of message ids a consumer group already handled"""
+
+    CACHE_ALIAS = 'default'
+    DEFAULT_TTL = 7 * 24 * 3600
+
+    def __init__(self, group_id: str, ttl: int = DEFAULT_TTL):
+        self.group_id = group_id
+        self.ttl = ttl
+
+    def _key(self, msg_id: str) -> str:
+        return f'consumer_seen:{self.group_id}:{msg_id}'
+
+    def seen(self, msg_ids: List[str]) -> List[bool]:
+        """Whether each id was handled, in one round trip; unknown on Redis errors counts as unseen"""
+        if not msg_ids:
+            return []
+        try:
+            pipe = get_redis_connection(self.CACHE_ALIAS).pipeline(transaction=False)
+            for msg_id in msg_ids:
+                pipe.exists(self._key(msg_id))
+            return [bool(found) for found in pipe.execute()]
+        except RedisError:
+            logger.warning('Idempotency lookup failed; handling %d messages unchecked', len(msg_ids), exc_info=True)
+            return [False] * len(msg_ids)
+
+    def mark(self, msg_ids: List[str]):
+        if not msg_ids:
+            return
+        try:
+            pipe = get_redis_connection(self.CACHE_ALIAS).pipeline(transaction=False)
+            for msg_id in msg_ids:
+                pipe.set(self._key(msg_id), 1, ex=self.ttl)
+            pipe.execute()
+        except RedisError:
+            logger.warning('Idempotency marks lost for %d messages', len(msg_ids), exc_info=True)
+
+
+class ConsumerWorker:
+    """
+    Batched, concurrent consumer of tenant event topics
+
+    Each poll returns a batch spread over partitions. Partitions are
+    handled in parallel on a thread pool, and the records of one
+    partition in order on one thread, so per-key ordering holds.
+    Offsets are committed once the batch is done, up to the last record
+    each partition handled; a partition that failed is rewound to the
+    failing record and retried on the next poll. Handled message ids go
+    to an idempotency store, so redeliveries after a crash or a relay
+    retry are dropped.
+
+    Shared topics carry every tenant. A worker given `tenants` skips the
+    others' records by their `tenant` header without decoding them; it
+    needs a consumer group of its own, as other tenants' records on its
+    partitions are handled by no other member of its group.
+    """
+
+    DEFAULT_BATCH_SIZE = 500
+    DEFAULT_WORKERS = 8
+    POLL_TIMEOUT_MS = 1000
+    RETRY_BACKOFF = 1.0
+    LAG_INTERVAL = 15
+
+    def __init__(
+        self,
+        group_id: str = 'pharmacies',
+        pattern: Optional[str] = None,
+        handlers: Optional[Dict[str, Handler]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = DEFAULT_WORKERS,
+        store: Optional[IdempotencyStore] = None,
+        tenants: Optional[Iterable[str]] = None,
+    ):
+        self.group_id = group_id
+        self.pattern = pattern or subscription_pattern(DEFAULT_STREAMS)
+        self.tenants = set(tenants) if tenants else None
+        self.handlers = _handlers if handlers is None else handlers
+        self.batch_size = batch_size
+        self.workers = workers
+        self.store = store or IdempotencyStore(group_id)
+        self.consumer = None
+        self._stop = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'handled': 0,
+            'duplicates': 0,
+            'skipped': 0,
+            'filtered': 0,
+            'invalid': 0,
+            'failed': 0,
+            'lag': {},
+            'total_lag': 0,
+        }
+        self._lag_checked = 0.0
+
+    def _config(self) -> Dict[str, Any]:
+        config = {**DEFAULT_CONSUMER_CONFIG, 'client_id': socket.gethostname()}
+        config.update(getattr(settings, 'KAFKA_CONSUMER_CONFIG', {}))
+        config.update(group_id=self.group_id, enable_auto_commit=False, max_poll_records=self.batch_size)
+        return config
+
+    def _count(self, **increments: int):
+        with self._metrics_lock:
+            for field, value in increments.items():
+                self._metrics[field] += value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            return {**self._metrics, 'lag': dict(self._metrics['lag'])}
+
+    def stop(self, *args):
+        """Finish the batch in hand, commit it and exit; safe from a signal handler"""
+        self._stop.set()
+
+    def run(self):
+        from kafka import KafkaConsumer
+
+        self.consumer = KafkaConsumer(**self._config())
+        self.consumer.subscribe(pattern=self.pattern)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+        logger.info('Consumer %s subscribed to %s', self.group_id, self.pattern)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='consumer') as pool:
+            try:
+                while not self._stop.is_set():
+                    batch = self.consumer.poll(timeout_ms=self.POLL_TIMEOUT_MS, max_records=self.batch_size)
+                    if batch:
+                        self.process(batch, pool)
+                    self._measure_lag()
+            finally:
+                self.consumer.close(autocommit=False)
+                logger.info('Consumer %s stopped: %s', self.group_id, self.metrics())
+
+    def process(self, batch: Dict[Any, List[Any]], pool: ThreadPoolExecutor):
+        """Handle one poll's records, then commit what was handled and rewind what failed"""
+        from kafka.errors import CommitFailedError
+        from kafka.structs import OffsetAndMetadata
+
+        results = list(pool.map(lambda item: self._process_partition(*item), batch.items()))
+        offsets = {}
+        failed = False
+        for partition, (handled_to, failed_at) in zip(batch, results):
+            if handled_to is not None:
+                offsets[partition] = OffsetAndMetadata(handled_to + 1, None)
+            if failed_at is not None:
+                self.consumer.seek(partition, failed_at)
+                failed = True
+        if offsets:
+            try:
+                self.consumer.commit(offsets)
+            except CommitFailedError:
+                # Rebalanced mid-batch; the new owner re-reads these and the store drops them
+                logger.warning('Offset commit lost to a rebalance', exc_info=True)
+        self._count(batches=1)
+        if failed:
+            self._stop.wait(self.RETRY_BACKOFF)
+
+    def _process_partition(self, partition, records: List[Any]) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Handle one partition's records in offset order
+
+        Returns:
+            (offset of the last record handled, offset of the record that failed)
+        """
+        last_offset = records[-1].offset
+        if self.tenants is not None:
+            kept = [record for record in records if record_tenant(record) in self.tenants]
+            self._count(filtered=len(records) - len(kept))
+            records = kept
+        ids = [message_id(record) for record in records]
+        seen = self.store.seen(ids)
+        handled_to = failed_at = None
+        handled_ids: List[str] = []
+        try:
+            for record, msg_id, duplicate in zip(records, ids, seen):
+                if duplicate:
+                    self._count(duplicates=1)
+                elif not self._handle(record):
+                    failed_at = record.offset
+                    break
+                else:
+                    handled_ids.append(msg_id)
+                handled_to = record.offset
+        finally:
+            self.store.mark(handled_ids)
+            close_old_connections()
+        if failed_at is None:
+            # Skipped records after the last handled one are done too
+            handled_to = last_offset
+        return handled_to, failed_at
+
+    def _handle(self, record) -> bool:
+        """Dispatch one record; False if it should be retried"""
+        try:
+            event = decode(record.value)
+            event_type = event['event']
+        except (EventDecodeError, KeyError, TypeError):
+            # Retrying cannot fix a malformed message
+            logger.error('Dropping undecodable message %s[%s]@%s', record.topic, record.partition, record.offset)
+            self._count(invalid=1)
+            return True
+
+        handler = self.handlers.get(event_type)
+        if handler is None:
+            self._count(skipped=1)
+            return True
+        try:
+            tenant = event.get('tenant')
+            if tenant:
+                with schema_context(tenant):
+                    handler(event, record)
+            else:
+                handler(event, record)
+        except Exception:
+            logger.exception('Handler for %s failed at %s[%s]@%s', event_type, record.topic, record.partition, record.offset)
+            self._count(failed=1)
+            return False
+        self._count(handled=1)
+        return True
+
+    def _measure_lag(self):
+        """Refresh per-partition lag (log end offset minus position) every LAG_INTERVAL seconds"""
+        now = time.monotonic()
+        if now - self._lag_checked < self.LAG_INTERVAL:
+            return
+        self._lag_checked = now
+        assignment = self.consumer.assignment()
+        if not assignment:
+            return
+        try:
+            end_offsets = self.consumer.end_offsets(list(assignment))
+            lag = {
+                f'{partition.topic}[{partition.partition}]': max(end - self.consumer.position(partition), 0)
+                for partition, end in end_offsets.items()
+            }
+        except Exception:
+            logger.warning('Lag measurement failed', exc_info=True)
+            return
+        with self._metrics_lock:
+            self._metrics['lag'] = lag
+            self._metrics['total_lag'] = sum(lag.values())
+        logger.info('Consumer %s lag %d over %d partitions', self.group_id, sum(lag.values()), len(lag))
@@ -0,0 +1,224 @@
+import logging
+import socket
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django_tenants.utils import get_tenant_model, schema_context
+
+from .codec import EventDecodeError, decode
+from .consumer import handles
+from .models import Directory_user
+from .routing import event_topics
+from .utils import get_tenant_schemas
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_EVENTS = ('user.created', 'profile.updated')
+
+DIRECTORY_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'is_active',
+    'role', 'phone_number', 'account_id', 'account_number',
+)
+
+
+class DirectoryService:
+    """
+    Per-tenant read model of auth-service users and accounts
+
+    The auth service publishes each user's full directory entry on every
+    change, keyed by user. Entries are upserted here, so customer names
+    and account numbers resolve with a local indexed query. An entry
+    only replaces a row written from an older event and only when it
+    differs, which makes redelivery and out-of-order replay harmless.
+    """
+
+    CHUNK_SIZE = 1000
+
+    _tenants: Set[str] = set()
+
+    @classmethod
+    def known_tenant(cls, schema: str) -> bool:
+        """
+        Whether a schema exists here; events of other auth tenants are ignored
+
+        Known schemas are remembered, and an unknown one is checked with a
+        point lookup every time, so the first users of a tenant created a
+        moment ago are applied rather than dropped with their offsets.
+        """
+        if schema in cls._tenants:
+            return True
+        if get_tenant_model().objects.filter(schema_name=schema).exists():
+            cls._tenants.add(schema)
+            return True
+        return False
+
+    @staticmethod
+    def apply(events: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upsert directory events into the current tenant's read model
+
+        Args:
+            events: Decoded user.created / profile.updated envelopes
+
+        Returns:
+            Rows inserted or changed
+        """
+        latest: Dict[int, Tuple[Any, Dict[str, Any]]] = {}
+        for event in events:
+            user_id = event['data']['id']
+            occurred_at = parse_datetime(event['occurred_at'])
+            # ON CONFLICT cannot touch a row twice in one statement
+            if user_id not in latest or occurred_at >= latest[user_id][0]:
+                latest[user_id] = (occurred_at, event['data'])
+
+        table = Directory_user._meta.db_table
+        columns = ('user_id',) + DIRECTORY_FIELDS + ('source_updated_at',)
+        assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns[1:])
+        current = ', '.join(f'{table}.{column}' for column in DIRECTORY_FIELDS)
+        incoming = ', '.join(f'EXCLUDED.{column}' for column in DIRECTORY_FIELDS)
+        rows = iter(latest.values())
+        written = 0
+        with connection.cursor() as cursor:
+            while True:
+                chunk = list(islice(rows, DirectoryService.CHUNK_SIZE))
+                if not chunk:
+                    break
+                params: List[Any] = []
+                for occurred_at, data in chunk:
+                    params.extend(DirectoryService._row(data, occurred_at))
+                placeholders = ', '.join([f"({', '.join(['%s'] * len(columns))})"] * len(chunk))
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders} "
+                    f'ON CONFLICT (user_id) DO UPDATE SET {assignments} '
+                    f'WHERE {table}.source_updated_at <= EXCLUDED.source_updated_at '
+                    # An identical entry (a replay or redelivery) leaves the row untouched
+                    f'AND ({current}) IS DISTINCT FROM ({incoming})',
+                    params
+                )
+                written += cursor.rowcount
+        return written
+
+    @staticmethod
+    def _row(data: Dict[str, Any], occurred_at) -> List[Any]:
+        return [
+            data['id'],
+            data.get('username') or '',
+            data.get('email') or '',
+            data.get('first_name') or '',
+            data.get('last_name') or '',
+            bool(data.get('is_active', True)),
+            data.get('role'),
+            data.get('phone_number') or '',
+            data.get('account_id'),
+            data.get('account_number') or None,
+            occurred_at,
+        ]
+
+    @staticmethod
+    def _consumer():
+        from kafka import KafkaConsumer
+
+        config = {
+            'client_id': f'{socket.gethostname()}-directory-rebuild',
+            'bootstrap_servers': getattr(settings, 'KAFKA_CONSUMER_CONFIG', {}).get('bootstrap_servers', 'localhost:9092'),
+            'group_id': None,
+            'enable_auto_commit': False,
+        }
+        return KafkaConsumer(**config)
+
+    @staticmethod
+    def _read(start: Optional[Dict[Any, int]] = None) -> Tuple[Dict[str, Dict[int, Dict[str, Any]]], Dict[Any, int]]:
+        """
+        Read the directory topic from `start` (or the beginning) up to its current end
+
+        Events are keyed by user, so the last one read for a user is its
+        latest entry and only that one is kept.
+
+        Returns:
+            (latest event per user by tenant, end offset per partition)
+        """
+        from kafka.structs import TopicPartition
+
+        topic = event_topics()['directory']
+        consumer = DirectoryService._consumer()
+        try:
+            partitions = [TopicPartition(topic, p) for p in sorted(consumer.partitions_for_topic(topic) or ())]
+            if not partitions:
+                return {}, {}
+            consumer.assign(partitions)
+            end = consumer.end_offsets(partitions)
+            if start:
+                for partition in partitions:
+                    consumer.seek(partition, start.get(partition, 0))
+            else:
+                consumer.seek_to_beginning(*partitions)
+
+            by_tenant: Dict[str, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+            remaining = {partition for partition in partitions if consumer.position(partition) < end[partition]}
+            while remaining:
+                batch = consumer.poll(timeout_ms=1000, max_records=5000)
+                for partition, records in batch.items():
+                    for record in records:
+                        if record.offset >= end[partition]:
+                            break
+                        try:
+                            event = decode(record.value)
+                        except EventDecodeError:
+                            logger.warning('Skipping undecodable directory event %s@%s', partition, record.offset)
+                            continue
+                        if event.get('event') in DIRECTORY_EVENTS and event.get('tenant'):
+                            by_tenant[event['tenant']][event['data']['id']] = event
+                remaining = {partition for partition in remaining if consumer.position(partition) < end[partition]}
+            return by_tenant, end
+        finally:
+            consumer.close()
+
+    @staticmethod
+    def rebuild(schemas: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Rebuild tenants' read models by replaying the directory topic
+
+        Each tenant's table is replaced in one transaction, so readers see
+        the old rows until the new ones commit. Events the live consumer
+        applied while the topic was replayed are re-read from where the
+        replay ended and applied on top.
+
+        Args:
+            schemas: Tenants to rebuild (all by default)
+
+        Returns:
+            Rows written per tenant
+        """
+        targets = set(schemas or get_tenant_schemas())
+        by_tenant, end = DirectoryService._read()
+        written = {}
+        for schema in sorted(targets):
+            with schema_context(schema), transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {Directory_user._meta.db_table}')
+                written[schema] = DirectoryService.apply(by_tenant.get(schema, {}).values())
+
+        if end:
+            catch_up, _ = DirectoryService._read(start=end)
+            for schema, events in catch_up.items():
+                if schema in targets:
+                    with schema_context(schema), transaction.atomic():
+                        written[schema] += DirectoryService.apply(events.values())
+        logger.info('Rebuilt the user directory of %d tenant(s) from %s', len(written), event_topics()['directory'])
+        return written
+
+    @staticmethod
+    def get(user_id: int) -> Optional[Directory_user]:
+        return Directory_user.objects.filter(user_id=user_id).first()
+
+
+@handles(*DIRECTORY_EVENTS)
+def apply_directory_event(event: Dict[str, Any], record):
+    """ConsumerWorker handler; runs inside the event's tenant schema"""
+    if not DirectoryService.known_tenant(event['tenant']):
+        return
+    DirectoryService.apply([event])
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import math
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Daily_sales, Medicine
+from .utils import get_tenant_schema
+
+
+class DemandForecastService:
+    """Vectorised demand forecasting and reorder points over the daily sales rollup"""
+
+    METHODS = ('sma', 'ewma')
+    DEFAULT_METHOD = 'ewma'
+    DEFAULT_WINDOW = 28
+    DEFAULT_LEAD_TIME = 7
+    DEFAULT_REVIEW_PERIOD = 7
+    DEFAULT_SERVICE_LEVEL = 0.95
+    DEFAULT_ALPHA = 0.3
+    CACHE_ALIAS = 'default'
+    CACHE_TIMEOUT = 60 * 60 * 24  # results are refreshed nightly
+
+    @staticmethod
+    def load_sales_matrix(window: int, as_of: date) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Load stock levels and the last `window` days of sales into arrays
+
+        Args:
+            window: Number of days of history (columns)
+            as_of: Last day of the window (inclusive)
+
+        Returns:
+            (names, stock, sales) where stock has shape (n,) and sales has
+            shape (n, window) with the most recent day in the last column
+        """
+        names: List[str] = []
+        stock_levels: List[int] = []
+        for name, quantity in Medicine.objects.order_by('id').values_list('name', 'quantity').iterator(chunk_size=10000):
+            names.append(name)
+            stock_levels.append(quantity)
+        stock = np.asarray(stock_levels, dtype=np.float64)
+        sales = np.zeros((len(names), window), dtype=np.float64)
+        if not names:
+            return names, stock, sales
+
+        row_of = {name: i for i, name in enumerate(names)}
+        start = as_of - timedelta(days=window - 1)
+        rows, cols, quantities = [], [], []
+        buckets = (
+            Daily_sales.objects.filter(day__gte=start, day__lte=as_of)
+            .values_list('name_medicine', 'day', 'quantity')
+            .iterator(chunk_size=10000)
+        )
+        for name, day, quantity in buckets:
+            row = row_of.get(name)
+            if row is None:
+                continue  # sold under a name that is no longer in the catalog
+            rows.append(row)
+            cols.append((day - start).days)
+            quantities.append(quantity)
+
+        if rows:
+            np.add.at(sales, (np.asarray(rows), np.asarray(cols)), np.asarray(quantities, dtype=np.float64))
+        return names, stock, sales
+
+    @staticmethod
+    def compute(
+        sales: np.ndarray,
+        stock: np.ndarray,
+        method: str = DEFAULT_METHOD,
+        lead_time: float = DEFAULT_LEAD_TIME,
+        review_period: float = DEFAULT_REVIEW_PERIOD,
+        service_level: float = DEFAULT_SERVICE_LEVEL,
+        alpha: float = DEFAULT_ALPHA
+    ) -> Dict[str, np.ndarray]:
+        """
+        Forecast daily demand, safety stock and reorder points for every SKU at once
+
+        Args:
+            sales: (n, window) daily quantities, most recent day last
+            stock: (n,) current stock levels
+            method: 'sma' (simple moving average) or 'ewma' (exponential smoothing)
+            lead_time: Replenishment lead time in days
+            review_period: Days of demand an order should cover beyond the lead time
+            service_level: Target probability of not stocking out during lead time
+            alpha: Smoothing factor for 'ewma'
+
+        Returns:
+            Dict of (n,) arrays: daily_demand, demand_std, safety_stock,
+            reorder_point, order_quantity, days_of_cover, needs_reorder
+        """
+        window = sales.shape[1]
+        if method == 'sma':
+            weights = np.full(window, 1.0 / window)
+        else:
+            # Newest day gets weight alpha, each older day decays by (1 - alpha)
+            weights = alpha * (1.0 - alpha) ** np.arange(window - 1, -1, -1, dtype=np.float64)
+            weights /= weights.sum()
+
+        daily_demand = sales @ weights
+        variance = ((sales - daily_demand[:, None]) ** 2) @ weights
+        demand_std = np.sqrt(variance)
+
+        z = NormalDist().inv_cdf(service_level)
+        safety_stock = z * demand_std * np.sqrt(lead_time)
+        reorder_point = daily_demand * lead_time + safety_stock
+        order_quantity = np.ceil(np.maximum(reorder_point + daily_demand * review_period - stock, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_of_cover = np.where(daily_demand > 0, stock / daily_demand, np.inf)
+
+        return {
+            'daily_demand': daily_demand,
+            'demand_std': demand_std,
+            'safety_stock': safety_stock,
+            'reorder_point': reorder_point,
+            'order_quantity': order_quantity,
+            'days_of_cover': days_of_cover,
+            'needs_reorder': (stock <= reorder_point) & (daily_demand > 0),
+        }
+
+    @staticmethod
+    def forecast(
+        method: str = DEFAULT_METHOD,
+        window: int = DEFAULT_WINDOW,
+        lead_time: float = DEFAULT_LEAD_TIME,
+        review_period: float = DEFAULT_REVIEW_PERIOD,
+        service_level: float = DEFAULT_SERVICE_LEVEL,
+        alpha: float = DEFAULT_ALPHA,
+        as_of: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the forecast for the current tenant
+
+        Returns:
+            Dict with the parameters used, timings and one entry per SKU,
+            ordered by days of cover (most urgent first)
+        """
+        parameters = DemandForecastService.normalize_parameters(
+            method=method,
+            window=window,
+            lead_time=lead_time,
+            review_period=review_period,
+            service_level=service_level,
+            alpha=alpha
+        )
+        method, window = parameters['method'], parameters['window']
+        lead_time, review_period = parameters['lead_time'], parameters['review_period']
+        service_level, alpha = parameters['service_level'], parameters['alpha']
+
+        as_of = as_of or timezone.localdate() - timedelta(days=1)
+        started = time.perf_counter()
+        names, stock, sales = DemandForecastService.load_sales_matrix(window, as_of)
+        loaded = time.perf_counter()
+        result = DemandForecastService.compute(
+            sales, stock,
+            method=method,
+            lead_time=lead_time,
+            review_period=review_period,
+            service_level=service_level,
+            alpha=alpha
+        )
+        computed = time.perf_counter()
+
+        order = np.argsort(result['days_of_cover'], kind='stable')
+        columns = {key: values[order].tolist() for key, values in result.items()}
+        stock_sorted = stock[order].tolist()
+        items = [
+            {
+                'name': names[i],
+                'quantity': int(stock_sorted[pos]),
+                'daily_demand': round(columns['daily_demand'][pos], 3),
+                'demand_std': round(columns['demand_std'][pos], 3),
+                'safety_stock': round(columns['safety_stock'][pos], 2),
+                'reorder_point': round(columns['reorder_point'][pos], 2),
+                'order_quantity': int(columns['order_quantity'][pos]),
+                'days_of_cover': None if columns['days_of_cover'][pos] == float('inf') else round(columns['days_of_cover'][pos], 1),
+                'needs_reorder': columns['needs_reorder'][pos],
+            }
+            for pos, i in enumerate(order.tolist())
+        ]
+
+        return {
+            'as_of': as_of.isoformat(),
+            'parameters': {
+                'method': method,
+                'window': window,
+                'lead_time': lead_time,
+                'review_period': review_period,
+                'service_level': service_level,
+                'alpha': alpha,
+            },
+            'sku_count': len(names),
+            'reorder_count': int(result['needs_reorder'].sum()),
+            'load_seconds': round(loaded - started, 3),
+            'compute_seconds': round(computed - loaded, 3),
+            'generated_at': timezone.now().isoformat(),
+            'items': items,
+        }
+
+    @staticmethod
+    def normalize_parameters(
+        method: str = DEFAULT_METHOD,
+        window: int = DEFAULT_WINDOW,
+        lead_time: float = DEFAULT_LEAD_TIME,
+        review_period: float = DEFAULT_REVIEW_PERIOD,
+        service_level: float = DEFAULT_SERVICE_LEVEL,
+        alpha: float = DEFAULT_ALPHA
+    ) -> Dict[str, Any]:
+        """
+        Validate forecast parameters and coerce them to canonical types
+
+        The cache key hashes these, so 7 and 7.0 must not produce two keys.
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if method not in DemandForecastService.METHODS:
+            raise ValueError(f'method must be one of: {", ".join(DemandForecastService.METHODS)}')
+        if float(window) != int(window) or not 1 <= int(window) <= 366:
+            raise ValueError('window must be a whole number of days between 1 and 366')
+        lead_time, review_period = float(lead_time), float(review_period)
+        service_level, alpha = float(service_level), float(alpha)
+        if not (math.isfinite(lead_time) and lead_time >= 0):
+            raise ValueError('lead_time must be a non-negative number of days')
+        if not (math.isfinite(review_period) and review_period >= 0):
+            raise ValueError('review_period must be a non-negative number of days')
+        if not 0 < service_level < 1:
+            raise ValueError('service_level must be between 0 and 1')
+        if not 0 < alpha <= 1:
+            raise ValueError('alpha must be in (0, 1]')
+        return {
+            'method': method,
+            'window': int(window),
+            'lead_time': lead_time,
+            'review_period': review_period,
+            'service_level': service_level,
+            'alpha': alpha,
+        }
+
+    @staticmethod
+    def cache_key(parameters: Dict[str, Any]) -> str:
+        parameters = DemandForecastService.normalize_parameters(**parameters)
+        digest = hashlib.md5(json.dumps(parameters, sort_keys=True, default=str).encode()).hexdigest()
+        return f"forecast:{get_tenant_schema()}:{digest}"
+
+    @staticmethod
+    def get_cached_or_compute(refresh: bool = False, **parameters) -> Dict[str, Any]:
+        """
+        Serve the forecast for the given parameters from cache, computing it on a miss
+
+        The nightly forecast_reorder command warms the default parameters.
+        """
+        cache = caches[DemandForecastService.CACHE_ALIAS]
+        key = DemandForecastService.cache_key(parameters)
+        if not refresh:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        result = DemandForecastService.forecast(**parameters)
+        cache.set(key, result, timeout=DemandForecastService.CACHE_TIMEOUT)
+        return result
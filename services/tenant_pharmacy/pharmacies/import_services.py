@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import DatabaseError, connection, transaction
+
+from .cache_services import invalidate_rows
+from .models import Medicine, Medicine_lot
+from .price_services import PriceHistoryService
+from .serializer import Medicine_import_serializer
+from .stock_services import StockService
+
+STAGING_TABLE = 'pharmacies_medicine_import_staging'
+SUPPORTED_FORMATS = ('csv', 'ndjson')
+
+
+class MedicineImportService:
+    """Bulk catalog import: stream rows, validate in chunks, COPY and upsert"""
+
+    DEFAULT_CHUNK_SIZE = 5000
+    MAX_REPORTED_ERRORS = 1000
+
+    @staticmethod
+    def detect_format(filename: str = '', explicit: Optional[str] = None) -> Optional[str]:
+        """
+        Resolve the input format from an explicit value or the file extension
+
+        Args:
+            filename: Name of the uploaded or local file
+            explicit: Format requested by the caller (csv, ndjson)
+
+        Returns:
+            Normalised format name or None if it cannot be determined
+        """
+        if explicit:
+            explicit = explicit.lower()
+            return explicit if explicit in SUPPORTED_FORMATS else None
+        lowered = (filename or '').lower()
+        if lowered.endswith('.csv'):
+            return 'csv'
+        if lowered.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        return None
+
+    @staticmethod
+    def iter_rows(stream: Iterable[str], file_format: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Lazily parse a text stream into raw rows
+
+        Args:
+            stream: Text stream (file object or any iterable of lines)
+            file_format: 'csv' (header row required) or 'ndjson'
+
+        Yields:
+            (line_number, row_dict, parse_error) tuples; row_dict is None on parse errors
+        """
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row, None
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, row, None
+
+    @staticmethod
+    def import_stream(
+        stream: Iterable[str],
+        file_format: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Import a catalog stream into Medicine, upserting on the unique name
+
+        Rows are validated chunk by chunk; invalid rows are reported and
+        skipped while the rest of the chunk is loaded. Each chunk is loaded
+        with COPY into a temporary staging table and merged with a single
+        INSERT ... ON CONFLICT statement in its own transaction. A
+        lot-tracked medicine keeps its quantity, which only moves with its
+        lots; its other columns are still updated and its line reported.
+
+        Args:
+            stream: Text stream with the catalog rows
+            file_format: 'csv' or 'ndjson'
+            chunk_size: Number of rows validated and loaded per transaction
+
+        Returns:
+            Dict with counters, per-row errors and throughput
+        """
+        if file_format not in SUPPORTED_FORMATS:
+            return {
+                'success': False,
+                'error': f'Unsupported format, expected one of: {", ".join(SUPPORTED_FORMATS)}'
+            }
+
+        stats = {
+            'processed': 0,
+            'inserted': 0,
+            'updated': 0,
+            'quantity_kept': 0,
+            'failed': 0,
+            'chunks': 0,
+        }
+        errors: List[Dict[str, Any]] = []
+        kept_lines: List[int] = []
+
+        def report(line_number, error):
+            stats['failed'] += 1
+            if len(errors) < MedicineImportService.MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'errors': error})
+
+        started = time.perf_counter()
+        rows = MedicineImportService.iter_rows(stream, file_format)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            stats['chunks'] += 1
+            stats['processed'] += len(chunk)
+
+            # Last occurrence of a name wins, as ON CONFLICT cannot touch a row twice
+            valid: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+            for line_number, row, parse_error in chunk:
+                if parse_error:
+                    report(line_number, parse_error)
+                    continue
+                serializer = Medicine_import_serializer(data=row)
+                if not serializer.is_valid():
+                    report(line_number, serializer.errors)
+                    continue
+                data = serializer.validated_data
+                valid[data['name']] = (line_number, data)
+
+            if not valid:
+                continue
+
+            try:
+                inserted, updated, kept = MedicineImportService._load_chunk(list(valid.values()))
+            except DatabaseError as e:
+                for line_number, _ in valid.values():
+                    report(line_number, f'Database error: {e}')
+                continue
+            stats['inserted'] += inserted
+            stats['updated'] += updated
+            stats['quantity_kept'] += len(kept)
+            kept_lines.extend(kept[:MedicineImportService.MAX_REPORTED_ERRORS - len(kept_lines)])
+
+        elapsed = time.perf_counter() - started
+        return {
+            'success': True,
+            **stats,
+            'errors': errors,
+            'errors_truncated': stats['failed'] > len(errors),
+            'quantity_kept_lines': kept_lines,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(stats['processed'] / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    @staticmethod
+    def _load_chunk(rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[int, int, List[int]]:
+        """
+        COPY validated rows into the staging table and upsert them into Medicine
+
+        Returns:
+            (inserted, updated, lines whose lot-tracked medicine kept its quantity)
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line_number, data in rows:
+            writer.writerow([line_number, data['name'], data['quantity'], data['price']])
+        buffer.seek(0)
+
+        table = Medicine._meta.db_table
+        lot_table = Medicine_lot._meta.db_table
+        price_column = Medicine._meta.get_field('price').column
+        fields = Medicine._meta.concrete_fields
+        attnames = [field.attname for field in fields]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'line integer, name varchar(50), quantity integer, price numeric(12, 2)'
+                ') ON COMMIT DELETE ROWS'
+            )
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (line, name, quantity, price) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            # xmax is 0 only for freshly inserted tuples; the previous CTE reads
+            # the pre-upsert snapshot, so price changes are detected in the same
+            # statement and both versions of each row are at hand for the cache
+            cursor.execute(
+                f'WITH previous AS ('
+                f"  SELECT {', '.join(f'm.{field.column}' for field in fields)} "
+                f'  FROM {table} m JOIN {STAGING_TABLE} s ON s.name = m.name'
+                f'), upserted AS ('
+                f'  INSERT INTO {table} (name, quantity, {price_column}) '
+                f'  SELECT name, quantity, price FROM {STAGING_TABLE} '
+                '  ON CONFLICT (name) DO UPDATE '
+                '  SET quantity = CASE '
+                f'    WHEN EXISTS (SELECT 1 FROM {lot_table} l WHERE l.medicine_id = {table}.id) THEN {table}.quantity '
+                '    ELSE EXCLUDED.quantity END, '
+                f'  {price_column} = EXCLUDED.{price_column} '
+                f"  RETURNING {', '.join(field.column for field in fields)}, (xmax = 0) AS inserted"
+                ') '
+                f'SELECT s.line, u.inserted, u.{price_column} IS DISTINCT FROM p.{price_column}, '
+                f"{', '.join(f'u.{field.column}' for field in fields)}, "
+                f"{', '.join(f'p.{field.column}' for field in fields)} "
+                f'FROM upserted u JOIN {STAGING_TABLE} s ON s.name = u.name LEFT JOIN previous p ON p.name = u.name'
+            )
+            results = []
+            kept: List[int] = []
+            quantities = {data['name']: data['quantity'] for _, data in rows}
+            for line_number, was_inserted, price_changed, *values in cursor.fetchall():
+                row = dict(zip(attnames, values[:len(fields)]))
+                previous = None if was_inserted else dict(zip(attnames, values[len(fields):]))
+                results.append((row, previous, price_changed))
+                if row['quantity'] != quantities[row['name']]:
+                    kept.append(line_number)
+            PriceHistoryService.record(
+                (row['id'], row['price']) for row, _, price_changed in results if price_changed
+            )
+            StockService.stock_changed([row['id'] for row, *_ in results])
+            # The raw upsert bypasses cacheops; drop the cached queries that matched
+            # the rows before or after it, rather than every Medicine query
+            invalidate_rows(Medicine, [row for row, *_ in results] + [
+                previous for _, previous, _ in results if previous is not None
+            ])
+
+        inserted = sum(1 for _, previous, _ in results if previous is None)
+        return inserted, len(results) - inserted, sorted(kept)
@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional
+
+from django.core.cache import caches
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .models import Medicine
+from .utils import get_tenant_schema
+
+logger = logging.getLogger(__name__)
+
+# Store the filled hash only if no write has revoked this reader's lease
+FILL_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Apply a committed quantity delta to a cached entry, revoking in-flight fills
+ADJUST_SCRIPT = """
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], 'quantity', ARGV[1])
+end
+return false
+"""
+
+
+class InventoryCacheService:
+    """
+    Read-through, write-through stock cache per tenant and medicine
+
+    Entries are Redis hashes shaped like Medicine_serializer output.
+    Sales and receipts apply their quantity delta with HINCRBY after
+    commit; deltas commute, so concurrent sales leave the cached count
+    exact whatever order their commits land in. Other writes evict.
+
+    A reader that misses takes a short lease before reading Postgres and
+    only stores its row if no write revoked the lease meanwhile, so a
+    fill that raced a commit cannot cache a pre-commit quantity.
+    """
+
+    CACHE_ALIAS = 'inventory'
+    LEASE_TIMEOUT_MS = 5000
+
+    _fill_script = None
+    _adjust_script = None
+
+    @staticmethod
+    def _redis():
+        return get_redis_connection(InventoryCacheService.CACHE_ALIAS)
+
+    @staticmethod
+    def _keys(schema: str, medicine_id: int):
+        cache = caches[InventoryCacheService.CACHE_ALIAS]
+        return (
+            cache.make_key(f'medicine:{schema}:{medicine_id}'),
+            cache.make_key(f'medicine_lease:{schema}:{medicine_id}'),
+        )
+
+    @staticmethod
+    def _name_key(schema: str, name: str) -> str:
+        return caches[InventoryCacheService.CACHE_ALIAS].make_key(f'medicine_name:{schema}:{name}')
+
+    @staticmethod
+    def _timeout() -> int:
+        return caches[InventoryCacheService.CACHE_ALIAS].default_timeout
+
+    @classmethod
+    def _scripts(cls):
+        if cls._fill_script is None:
+            redis = cls._redis()
+            cls._fill_script = redis.register_script(FILL_SCRIPT)
+            cls._adjust_script = redis.register_script(ADJUST_SCRIPT)
+        return cls._fill_script, cls._adjust_script
+
+    @staticmethod
+    def _to_hash(item: Medicine) -> Dict[str, Any]:
+        return {
+            'id': item.id,
+            'name': item.name,
+            'quantity': item.quantity,
+            'price': '' if item.price is None else str(item.price),
+            'reorder_level': item.reorder_level,
+        }
+
+    @staticmethod
+    def _from_hash(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+        data = {key.decode(): value.decode() for key, value in raw.items()}
+        return {
+            'id': int(data['id']),
+            'name': data['name'],
+            'quantity': int(data['quantity']),
+            'price': data['price'] or None,
+            'reorder_level': int(data['reorder_level']),
+        }
+
+    @staticmethod
+    def get(medicine_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Stock record of a medicine, from Redis when cached
+
+        Returns:
+            Dict shaped like Medicine_serializer data, or None if the medicine does not exist
+        """
+        schema = get_tenant_schema()
+        key, lease_key = InventoryCacheService._keys(schema, medicine_id)
+        try:
+            redis = InventoryCacheService._redis()
+            raw = redis.hgetall(key)
+            if raw:
+                return InventoryCacheService._from_hash(raw)
+            token = uuid.uuid4().hex
+            leased = redis.set(lease_key, token, nx=True, px=InventoryCacheService.LEASE_TIMEOUT_MS)
+        except RedisError:
+            logger.warning('Inventory cache read failed for %s:%s', schema, medicine_id, exc_info=True)
+            leased = False
+
+        item = Medicine.objects.nocache().filter(id=medicine_id).first()
+        if item is None:
+            return None
+        data = InventoryCacheService._to_hash(item)
+        if leased:
+            fields = [part for pair in data.items() for part in pair]
+            try:
+                fill, _ = InventoryCacheService._scripts()
+                if fill(keys=[key, lease_key], args=[token, InventoryCacheService._timeout(), *fields]):
+                    redis.set(InventoryCacheService._name_key(schema, item.name), item.id, ex=InventoryCacheService._timeout())
+            except RedisError:
+                logger.warning('Inventory cache fill failed for %s:%s', schema, medicine_id, exc_info=True)
+        return {**data, 'price': data['price'] or None}
+
+    @staticmethod
+    def get_by_name(name: str) -> Optional[Dict[str, Any]]:
+        """Stock record by medicine name, resolving the name through a cached id"""
+        schema = get_tenant_schema()
+        try:
+            medicine_id = InventoryCacheService._redis().get(InventoryCacheService._name_key(schema, name))
+        except RedisError:
+            medicine_id = None
+        if medicine_id is None:
+            medicine_id = Medicine.objects.nocache().filter(name=name).values_list('id', flat=True).first()
+            if medicine_id is None:
+                return None
+        data = InventoryCacheService.get(int(medicine_id))
+        if data is None or data['name'] != name:
+            # Renamed or deleted since the name was cached
+            InventoryCacheService._evict_now(schema, [], [name])
+            return None
+        return data
+
+    @staticmethod
+    def adjust(deltas: Dict[int, int]):
+        """Apply quantity deltas to cached entries once the current transaction commits"""
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        schema = get_tenant_schema()
+
+        def apply():
+            try:
+                _, adjust = InventoryCacheService._scripts()
+                for medicine_id, delta in deltas.items():
+                    adjust(keys=list(InventoryCacheService._keys(schema, medicine_id)), args=[delta])
+            except RedisError:
+                logger.warning('Inventory cache adjust failed for %s, evicting', schema, exc_info=True)
+                InventoryCacheService._evict_now(schema, deltas)
+
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def evict(medicine_ids: Iterable[int], names: Iterable[str] = ()):
+        """Drop cached entries (and name lookups) once the current transaction commits"""
+        ids, names = sorted(set(medicine_ids)), sorted(set(names))
+        if not ids and not names:
+            return
+        schema = get_tenant_schema()
+        transaction.on_commit(lambda: InventoryCacheService._evict_now(schema, ids, names))
+
+    @staticmethod
+    def _evict_now(schema: str, medicine_ids: Iterable[int], names: Iterable[str] = ()):
+        keys = [key for pk in medicine_ids for key in InventoryCacheService._keys(schema, pk)]
+        keys += [InventoryCacheService._name_key(schema, name) for name in names]
+        if not keys:
+            return
+        try:
+            InventoryCacheService._redis().delete(*keys)
+        except RedisError:
+            logger.error('Inventory cache eviction failed for %s; entries may be stale until TTL', schema, exc_info=True)
+
+
+class CatalogVersionService:
+    """
+    Per-tenant catalog version, bumped after every committed Medicine mutation
+
+    Backs ETags on the medicine endpoints so unchanged polls are answered
+    with 304 from one Redis GET. A missing counter (first use, flush,
+    eviction) restarts from the current time in nanoseconds rather than
+    from 1, so it cannot repeat a version a client already holds.
+    """
+
+    CACHE_ALIAS = 'inventory'
+
+    @staticmethod
+    def _key(schema: str) -> str:
+        return caches[CatalogVersionService.CACHE_ALIAS].make_key(f'catalog_version:{schema}')
+
+    @staticmethod
+    def current(schema: Optional[str] = None) -> Optional[int]:
+        """Current version, or None when Redis is unavailable"""
+        key = CatalogVersionService._key(schema or get_tenant_schema())
+        try:
+            redis = get_redis_connection(CatalogVersionService.CACHE_ALIAS)
+            version = redis.get(key)
+            if version is None:
+                redis.set(key, time.time_ns(), nx=True)
+                version = redis.get(key)
+        except RedisError:
+            logger.warning('Catalog version read failed', exc_info=True)
+            return None
+        return int(version) if version is not None else None
+
+    @staticmethod
+    def bump():
+        """Advance the current tenant's version once the current transaction commits"""
+        schema = get_tenant_schema()
+        transaction.on_commit(lambda: CatalogVersionService._bump_now(schema))
+
+    @staticmethod
+    def _bump_now(schema: str):
+        key = CatalogVersionService._key(schema)
+        try:
+            redis = get_redis_connection(CatalogVersionService.CACHE_ALIAS)
+            pipe = redis.pipeline()
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.incr(key)
+            pipe.execute()
+        except RedisError:
+            logger.error('Catalog version bump failed for %s, dropping the counter', schema, exc_info=True)
+            try:
+                get_redis_connection(CatalogVersionService.CACHE_ALIAS).delete(key)
+            except RedisError:
+                pass
+
+
+def catalog_etag(request, *args, **kwargs) -> Optional[str]:
+    """etag_func for django.views.decorators.http.condition on medicine reads"""
+    version = CatalogVersionService.current()
+    if version is None:
+        return None
+    query = request.META.get('QUERY_STRING', '')
+    target = ':'.join(f'{name}={value}' for name, value in sorted(kwargs.items()))
+    digest = hashlib.blake2b(f'{target}?{query}'.encode(), digest_size=8).hexdigest()
+    return f'{get_tenant_schema()}-{version}-{digest}'
@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Optional
+
+from django.db import connection, transaction
+
+from .models import Invoice_line, Invoice_sequence, Register_Financial
+
+INVOICE_SEQUENCE = 'invoice'
+
+
+class InvoiceService:
+    """Server-side invoice numbering and header/line invoice writes"""
+
+    @staticmethod
+    def allocate(count: int = 1, name: str = INVOICE_SEQUENCE) -> range:
+        """
+        Reserve the next `count` numbers of a per-tenant sequence
+
+        Runs as one upsert on the counter row. The row stays locked until
+        the surrounding transaction ends, so a rolled-back invoice returns
+        its number and numbering is gap-free. Allocate late in the
+        transaction to keep the lock short; pass count > 1 to reserve a
+        block, e.g. for an offline till.
+
+        Args:
+            count: Number of consecutive numbers to reserve
+            name: Sequence name
+
+        Returns:
+            The reserved numbers
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        table = Invoice_sequence._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, last_value) VALUES (%s, %s) '
+                'ON CONFLICT (name) DO UPDATE '
+                f'SET last_value = {table}.last_value + EXCLUDED.last_value '
+                'RETURNING last_value',
+                [name, count]
+            )
+            last_value = cursor.fetchone()[0]
+        return range(last_value - count + 1, last_value + 1)
+
+    @staticmethod
+    def _build_lines(invoice: Register_Financial, lines: List[Dict[str, Any]]) -> List[Invoice_line]:
+        return [
+            Invoice_line(invoice=invoice, line_number=number, **line)
+            for number, line in enumerate(lines, start=1)
+        ]
+
+    @staticmethod
+    def create(account: int, lines: Optional[List[Dict[str, Any]]] = None) -> Register_Financial:
+        """
+        Create an invoice header and its lines in one transaction
+
+        Args:
+            account: Account the invoice is booked to
+            lines: Dicts with name_medicine, quantity and unit_price
+
+        Returns:
+            The saved invoice with its server-allocated number
+        """
+        with transaction.atomic():
+            number = InvoiceService.allocate()[0]
+            invoice = Register_Financial.objects.create(invoice=number, account=account)
+            invoice_lines = InvoiceService._build_lines(invoice, lines or [])
+            Invoice_line.objects.bulk_create(invoice_lines)
+        return invoice
+
+    @staticmethod
+    def replace_lines(invoice: Register_Financial, lines: List[Dict[str, Any]]) -> List[Invoice_line]:
+        """Swap all lines of an existing invoice in one transaction"""
+        with transaction.atomic():
+            Invoice_line.objects.filter(invoice=invoice).delete()
+            invoice_lines = InvoiceService._build_lines(invoice, lines)
+            Invoice_line.objects.bulk_create(invoice_lines)
+        return invoice_lines
@@ -0,0 +1,231 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q, QuerySet, Sum
+from django.utils import timezone
+
+from .models import Medicine_lot
+from .utils import get_tenant_schema
+
+# Heap entries: (expiry_date, lot_id, lot_number, quantity)
+HeapEntry = Tuple[date, int, str, int]
+# Allocations: (lot_id, lot_number, expiry_date, quantity_taken)
+Allocation = Tuple[int, str, date, int]
+# Dispensing order of the allocator, the heaps and the FEFO index alike
+FEFO_ORDER = ('expiry_date', 'id')
+
+
+class FefoHeapCache:
+    """
+    Per-process, heap-ordered view of the stocked lots of hot SKUs
+
+    The database stays the source of truth: allocations lock lot rows.
+    The cached heaps serve FEFO queue reads without a query. Allocations
+    made by this process are applied to them after commit, and a short
+    TTL bounds staleness from other workers. Lots that have expired since
+    a heap was loaded sit at its front and are popped on access.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, List[HeapEntry]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _drop_expired(heap: List[HeapEntry], as_of: date):
+        while heap and heap[0][0] <= as_of:
+            heapq.heappop(heap)
+
+    def get(self, key: Hashable, as_of: date) -> Optional[List[HeapEntry]]:
+        """Cached heap of the lots still sellable on `as_of`, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, heap = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._drop_expired(heap, as_of)
+            self._entries.move_to_end(key)
+            return list(heap)
+
+    def put(self, key: Hashable, heap: List[HeapEntry]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, heap)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def apply_allocations(self, key: Hashable, allocations: List[Allocation], as_of: date):
+        """Pop allocated lots off the front of a cached heap, dropping it if it disagrees"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            expires_at, heap = entry
+            # The allocator skipped lots expired on `as_of`; skip them here too
+            self._drop_expired(heap, as_of)
+            for lot_id, _, _, taken in allocations:
+                if not heap or heap[0][1] != lot_id:
+                    del self._entries[key]
+                    return
+                expiry_date, _, lot_number, quantity = heapq.heappop(heap)
+                if quantity > taken:
+                    heapq.heappush(heap, (expiry_date, lot_id, lot_number, quantity - taken))
+
+
+fefo_heaps = FefoHeapCache()
+
+
+class LotService:
+    """Lot and expiry tracking with first-expiry-first-out allocation"""
+
+    LOCK_BATCH_SIZE = 8
+
+    @staticmethod
+    def _heap_key(medicine_id: int) -> Tuple[str, int]:
+        return get_tenant_schema(), medicine_id
+
+    @staticmethod
+    def sellable(as_of: Optional[date] = None) -> Q:
+        """Lots that still hold stock and have not expired; a lot expires on its expiry date"""
+        return Q(quantity__gt=0, expiry_date__gt=as_of or timezone.localdate())
+
+    @staticmethod
+    def _sellable_lots(medicine_id: int, as_of: date) -> QuerySet:
+        return Medicine_lot.objects.filter(LotService.sellable(as_of), medicine_id=medicine_id).order_by(*FEFO_ORDER)
+
+    @staticmethod
+    def receive(medicine_id: int, lot_number: str, expiry_date: date, quantity: int) -> Medicine_lot:
+        """
+        Book a received quantity into a lot, creating the lot on first receipt
+
+        Must run inside a transaction; the caller updates Medicine.quantity.
+
+        Raises:
+            ValueError: If the lot already exists with a different expiry date
+        """
+        lot, created = Medicine_lot.objects.select_for_update().get_or_create(
+            medicine_id=medicine_id,
+            lot_number=lot_number,
+            defaults={'expiry_date': expiry_date, 'quantity': quantity}
+        )
+        if not created:
+            if lot.expiry_date != expiry_date:
+                raise ValueError(f'Lot {lot_number} already exists with expiry {lot.expiry_date}')
+            lot.quantity += quantity
+            lot.save(update_fields=['quantity'])
+
+        key = LotService._heap_key(medicine_id)
+        transaction.on_commit(lambda: fefo_heaps.invalidate(key))
+        return lot
+
+    @staticmethod
+    def allocate(medicine_id: int, quantity: int, include_expired: bool = False) -> Tuple[List[Allocation], int]:
+        """
+        Take `quantity` units from the first-expiring sellable lots
+
+        Lots are locked a few at a time in FEFO_ORDER through the FEFO
+        index, so a sale only locks the lots it draws from. Must run
+        inside a transaction.
+
+        Args:
+            medicine_id: Medicine whose lots are drawn from
+            quantity: Units to take
+            include_expired: Also draw from stocked lots past their expiry
+                date, which come first; for write-offs and replayed sales
+
+        Returns:
+            (allocations, shortfall) where shortfall is the quantity no
+            sellable lot could cover
+        """
+        allocations: List[Allocation] = []
+        remaining = quantity
+        changed: List[Medicine_lot] = []
+        after: Optional[Tuple[date, int]] = None
+        as_of = timezone.localdate()
+        if include_expired:
+            base = Medicine_lot.objects.filter(medicine_id=medicine_id, quantity__gt=0).order_by(*FEFO_ORDER)
+        else:
+            base = LotService._sellable_lots(medicine_id, as_of)
+
+        while remaining > 0:
+            batch = base
+            if after is not None:
+                batch = batch.filter(
+                    Q(expiry_date__gt=after[0]) | Q(expiry_date=after[0], id__gt=after[1])
+                )
+            lots = list(batch.select_for_update()[:LotService.LOCK_BATCH_SIZE])
+            if not lots:
+                break
+            for lot in lots:
+                taken = min(lot.quantity, remaining)
+                lot.quantity -= taken
+                remaining -= taken
+                changed.append(lot)
+                allocations.append((lot.id, lot.lot_number, lot.expiry_date, taken))
+                if remaining == 0:
+                    break
+            after = (lots[-1].expiry_date, lots[-1].id)
+
+        if changed:
+            Medicine_lot.objects.bulk_update(changed, ['quantity'])
+            key = LotService._heap_key(medicine_id)
+            transaction.on_commit(lambda: fefo_heaps.apply_allocations(key, allocations, as_of))
+        return allocations, remaining
+
+    @staticmethod
+    def has_lots(medicine_id: int) -> bool:
+        """Whether this medicine's stock is tracked by lots at all"""
+        return Medicine_lot.objects.filter(medicine_id=medicine_id).exists()
+
+    @staticmethod
+    def totals(medicine_ids: Iterable[int]) -> Dict[int, int]:
+        """Stock held in lots per medicine, expired lots included; untracked medicines are absent"""
+        return dict(
+            Medicine_lot.objects.filter(medicine_id__in=list(medicine_ids))
+            .values_list('medicine_id')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+        )
+
+    @staticmethod
+    def fefo_queue(medicine_id: int) -> List[HeapEntry]:
+        """Sellable lots in dispensing order, served from the in-memory heap when hot"""
+        key = LotService._heap_key(medicine_id)
+        as_of = timezone.localdate()
+        heap = fefo_heaps.get(key, as_of)
+        if heap is None:
+            # Rows come back in FEFO_ORDER, which is already a valid heap
+            heap = list(
+                LotService._sellable_lots(medicine_id, as_of)
+                .values_list('expiry_date', 'id', 'lot_number', 'quantity')
+            )
+            fefo_heaps.put(key, list(heap))
+        return heapq.nsmallest(len(heap), heap)
+
+    @staticmethod
+    def expiring(days: int, include_expired: bool = False) -> QuerySet:
+        """
+        Stocked lots expiring within `days` days, as a range scan on the expiry index
+
+        Args:
+            days: Look-ahead window from today
+            include_expired: Also return lots whose expiry date has been reached
+        """
+        today = timezone.localdate()
+        lots = Medicine_lot.objects.filter(quantity__gt=0, expiry_date__lte=today + timedelta(days=days))
+        if not include_expired:
+            lots = lots.filter(expiry_date__gt=today)
+        return lots.select_related('medicine').order_by(*FEFO_ORDER)
@@ -0,0 +1,89 @@
+import gzip
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pharmacies import codec
+
+MEDICINES = ['Paracetamol 500mg', 'Amoxicillin 250mg', 'Ibuprofen 400mg', 'Omeprazole 20mg', 'Metformin 850mg']
+
+def sample_events(count: int, seed: int = 7):
+    """Sale, stock and user events shaped like the ones the outbox emits"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    events = []
+    for index in range(count):
+        tenant = f'pharmacy_{rng.randint(1, 2000)}'
+        occurred_at = now - timedelta(seconds=rng.randint(0, 86400))
+        kind = index % 3
+        if kind == 0:
+            events.append({
+                'event': 'sale.recorded', 'tenant': tenant, 'entity': 'register', 'id': 1_000_000 + index,
+                'occurred_at': occurred_at,
+                'data': {
+                    'id': 1_000_000 + index,
+                    'name_medicine': rng.choice(MEDICINES),
+                    'quantity': rng.randint(1, 5),
+                    'date': occurred_at,
+                },
+            })
+        elif kind == 1:
+            medicine_id = rng.randint(1, 5000)
+            events.append({
+                'event': 'medicine.updated', 'tenant': tenant, 'entity': 'medicine', 'id': medicine_id,
+                'occurred_at': occurred_at,
+                'data': {
+                    'id': medicine_id,
+                    'name': rng.choice(MEDICINES),
+                    'quantity': rng.randint(0, 900),
+                    'price': Decimal(rng.randint(100, 99999)) / 100,
+                    'reorder_level': 10,
+                },
+            })
+        else:
+            user_id = rng.randint(1, 100000)
+            events.append({
+                'event': 'user.created', 'tenant': tenant, 'entity': 'user', 'id': user_id,
+                'occurred_at': occurred_at,
+                'data': {
+                    'id': user_id,
+                    'username': f'user{user_id}',
+                    'email': f'user{user_id}@pharmacy.example',
+                    'first_name': 'Amina',
+                    'last_name': 'Haddad',
+                },
+            })
+    return events
+
+class Command(BaseCommand):
+    help = 'Compare encode/decode throughput and message size of the event codecs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=30000, help='Events per run')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per codec; the best is reported')
+
+    def handle(self, *args, **options):
+        events = sample_events(options['events'])
+        self.stdout.write(f"{len(events)} events, best of {options['repeat']} runs")
+        self.stdout.write(f"{'codec':<8} {'encode/s':>12} {'decode/s':>12} {'avg bytes':>10} {'gzip batch':>11}")
+        for name in ('json', 'msgpack'):
+            encode_time = decode_time = float('inf')
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                encoded = [codec.encode(event, name) for event in events]
+                encode_time = min(encode_time, time.perf_counter() - started)
+                started = time.perf_counter()
+                for value in encoded:
+                    codec.decode(value)
+                decode_time = min(decode_time, time.perf_counter() - started)
+            size = sum(len(value) for value in encoded)
+            # What the producer ships: records compressed per batch
+            compressed = len(gzip.compress(b''.join(encoded)))
+            self.stdout.write(
+                f"{name:<8} {len(events) / encode_time:>12,.0f} {len(events) / decode_time:>12,.0f} "
+                f"{size / len(events):>10.1f} {compressed / len(events):>11.1f}"
+            )
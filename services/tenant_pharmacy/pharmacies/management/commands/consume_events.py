@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from pharmacies.consumer import ConsumerWorker
+
+class Command(BaseCommand):
+    help = 'Consume every tenant event topic in batches until SIGTERM/SIGINT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=str, default='pharmacies', help='Consumer group id')
+        parser.add_argument(
+            '--pattern',
+            type=str,
+            help='Regex of topics to subscribe to (the routed medicine and sales topics by default)',
+        )
+        parser.add_argument(
+            '--tenant',
+            action='append',
+            dest='tenants',
+            help='Only handle events of this tenant schema; repeatable. Use a dedicated --group',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ConsumerWorker.DEFAULT_BATCH_SIZE,
+            help='Maximum records handled per poll',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=ConsumerWorker.DEFAULT_WORKERS,
+            help='Partitions handled in parallel',
+        )
+
+    def handle(self, *args, **options):
+        worker = ConsumerWorker(
+            group_id=options['group'],
+            pattern=options['pattern'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            tenants=options['tenants'],
+        )
+        worker.run()
+        metrics = worker.metrics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stopped after {metrics['batches']} batches: {metrics['handled']} handled, "
+                f"{metrics['duplicates']} duplicates, {metrics['failed']} failures, lag {metrics['total_lag']}"
+            )
+        )
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django_tenants.utils import schema_context
+
+from pharmacies.models import Medicine
+from pharmacies.utils import get_tenant_schemas, parse_price
+
+LEGACY_COLUMN = 'price'
+
+
+def has_legacy_column() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM information_schema.columns '
+            'WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s',
+            [Medicine._meta.db_table, LEGACY_COLUMN]
+        )
+        return cursor.fetchone() is not None
+
+
+def backfill_rollout_prices(batch_size: int) -> int:
+    """Parse prices old code wrote to the legacy column that the dual-write trigger could not cast"""
+    table = Medicine._meta.db_table
+    price_column = Medicine._meta.get_field('price').column
+    parsed_total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, {LEGACY_COLUMN} FROM {table} '
+                f'WHERE id > %s AND {price_column} IS NULL AND {LEGACY_COLUMN} IS NOT NULL '
+                'ORDER BY id LIMIT %s FOR UPDATE',
+                [last_id, batch_size]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return parsed_total
+            parsed = [(pk, parse_price(raw)) for pk, raw in rows]
+            parsed = [(pk, amount) for pk, amount in parsed if amount is not None]
+            if parsed:
+                placeholders = ', '.join(['(%s::bigint, %s::numeric)'] * len(parsed))
+                cursor.execute(
+                    f'UPDATE {table} m SET {price_column} = v.amount '
+                    f'FROM (VALUES {placeholders}) AS v(id, amount) '
+                    f'WHERE m.id = v.id AND m.{price_column} IS NULL',
+                    [value for row in parsed for value in row]
+                )
+                parsed_total += len(parsed)
+        last_id = rows[-1][0]
+
+
+def drop_legacy_column():
+    table = Medicine._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS pharmacies_medicine_sync_legacy_price ON {table}')
+        cursor.execute('DROP FUNCTION IF EXISTS pharmacies_medicine_sync_legacy_price()')
+        cursor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS {LEGACY_COLUMN}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Contract step of the text-to-decimal price change (migration 0007): parse prices '
+        'left in the legacy text column, then drop it. Run only once no code from before '
+        '0007 is deployed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema to contract (all tenants by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Medicines parsed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        schemas = [options['schema']] if options['schema'] else get_tenant_schemas()
+        for schema in schemas:
+            with schema_context(schema):
+                if not has_legacy_column():
+                    self.stdout.write(f'{schema}: legacy price column already dropped')
+                    continue
+                parsed = backfill_rollout_prices(options['batch_size'])
+                drop_legacy_column()
+            self.stdout.write(self.style.SUCCESS(f'{schema}: parsed {parsed} legacy price(s), dropped the column'))
@@ -0,0 +1,59 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pharmacies.routing import DEFAULT_EVENT_TOPICS, event_topics, topic_mode
+
+# Full-snapshot streams keyed by entity: compaction keeps the latest entry per key forever
+TOPIC_CONFIGS = {
+    'directory': {'cleanup.policy': 'compact'},
+}
+
+class Command(BaseCommand):
+    help = 'Create the shared event topics and report or delete legacy per-tenant topics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions',
+            type=int,
+            default=getattr(settings, 'EVENT_TOPIC_PARTITIONS', 24),
+            help='Partitions of each shared topic',
+        )
+        parser.add_argument('--replication-factor', type=int, default=1)
+        parser.add_argument(
+            '--delete-legacy',
+            action='store_true',
+            help='Delete per-tenant topics; only allowed once EVENT_TOPIC_MODE is shared',
+        )
+
+    def handle(self, *args, **options):
+        from kafka.admin import KafkaAdminClient, NewTopic
+
+        config = getattr(settings, 'KAFKA_PRODUCER_CONFIG', {})
+        admin = KafkaAdminClient(bootstrap_servers=config.get('bootstrap_servers', 'localhost:9092'))
+        try:
+            existing = set(admin.list_topics())
+            missing = [
+                NewTopic(
+                    name=topic,
+                    num_partitions=options['partitions'],
+                    replication_factor=options['replication_factor'],
+                    topic_configs=TOPIC_CONFIGS.get(stream, {}),
+                )
+                for stream, topic in event_topics().items() if topic not in existing
+            ]
+            if missing:
+                admin.create_topics(missing)
+            self.stdout.write(self.style.SUCCESS(f'Created {len(missing)} shared topic(s)'))
+
+            legacy_pattern = re.compile(f"^(?:{'|'.join(DEFAULT_EVENT_TOPICS)})_.+$")
+            legacy = sorted(topic for topic in existing if legacy_pattern.match(topic))
+            self.stdout.write(f'{len(legacy)} legacy per-tenant topic(s)')
+            if options['delete_legacy'] and legacy:
+                if topic_mode() != 'shared':
+                    raise CommandError('Set EVENT_TOPIC_MODE=shared and let consumers drain before deleting')
+                admin.delete_topics(legacy)
+                self.stdout.write(self.style.SUCCESS(f'Deleted {len(legacy)} legacy topic(s)'))
+        finally:
+            admin.close()
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from pharmacies.forecast_services import DemandForecastService
+from pharmacies.utils import get_tenant_schemas
+
+class Command(BaseCommand):
+    help = 'Nightly demand forecast and reorder points; warms the forecast endpoint cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema to forecast (all tenants by default)',
+        )
+        parser.add_argument(
+            '--method',
+            choices=DemandForecastService.METHODS,
+            default=DemandForecastService.DEFAULT_METHOD,
+        )
+        parser.add_argument('--window', type=int, default=DemandForecastService.DEFAULT_WINDOW)
+        parser.add_argument('--lead-time', type=float, default=float(DemandForecastService.DEFAULT_LEAD_TIME))
+        parser.add_argument('--review-period', type=float, default=float(DemandForecastService.DEFAULT_REVIEW_PERIOD))
+        parser.add_argument('--service-level', type=float, default=float(DemandForecastService.DEFAULT_SERVICE_LEVEL))
+        parser.add_argument('--alpha', type=float, default=float(DemandForecastService.DEFAULT_ALPHA))
+
+    def handle(self, *args, **options):
+        parameters = {
+            'method': options['method'],
+            'window': options['window'],
+            'lead_time': options['lead_time'],
+            'review_period': options['review_period'],
+            'service_level': options['service_level'],
+            'alpha': options['alpha'],
+        }
+        schemas = [options['schema']] if options['schema'] else get_tenant_schemas()
+
+        for schema in schemas:
+            with schema_context(schema):
+                result = DemandForecastService.get_cached_or_compute(refresh=True, **parameters)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{schema}: {result['sku_count']} SKUs, {result['reorder_count']} to reorder "
+                    f"(load {result['load_seconds']}s, compute {result['compute_seconds']}s)"
+                )
+            )
@@ -0,0 +1,65 @@
+import contextlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import schema_context
+
+from pharmacies.import_services import MedicineImportService, SUPPORTED_FORMATS
+
+class Command(BaseCommand):
+    help = 'Bulk import a medicine catalog from a CSV or NDJSON file (upsert on name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Path to the catalog file')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=SUPPORTED_FORMATS,
+            help='Input format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=MedicineImportService.DEFAULT_CHUNK_SIZE,
+            help='Rows validated and loaded per transaction',
+        )
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema to import into',
+        )
+
+    def handle(self, *args, **options):
+        file_format = MedicineImportService.detect_format(options['path'], options['file_format'])
+        if file_format is None:
+            raise CommandError('Unable to determine file format, pass --format')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        context = schema_context(options['schema']) if options['schema'] else contextlib.nullcontext()
+        with context, open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            result = MedicineImportService.import_stream(
+                stream,
+                file_format,
+                chunk_size=options['chunk_size']
+            )
+
+        if not result['success']:
+            raise CommandError(result['error'])
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['errors']}"))
+        if result['errors_truncated']:
+            self.stdout.write(self.style.WARNING('Error list truncated'))
+        if result['quantity_kept']:
+            self.stdout.write(self.style.WARNING(
+                f"Kept the quantity of {result['quantity_kept']} lot-tracked medicines, receive their stock into lots "
+                f"(lines {', '.join(map(str, result['quantity_kept_lines']))})"
+            ))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {result['processed']} rows in {result['elapsed_seconds']}s "
+                f"({result['rows_per_second']} rows/s): {result['inserted']} inserted, "
+                f"{result['updated']} updated, {result['failed']} failed"
+            )
+        )
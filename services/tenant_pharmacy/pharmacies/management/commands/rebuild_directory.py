@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pharmacies.directory_services import DirectoryService
+
+class Command(BaseCommand):
+    help = 'Rebuild the local user directory by replaying the auth user topic from the beginning'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            action='append',
+            dest='schemas',
+            help='Tenant schema to rebuild; repeatable (all tenants by default)',
+        )
+
+    def handle(self, *args, **options):
+        written = DirectoryService.rebuild(options['schemas'])
+        for schema, count in sorted(written.items()):
+            self.stdout.write(self.style.SUCCESS(f'{schema}: {count} directory entries'))
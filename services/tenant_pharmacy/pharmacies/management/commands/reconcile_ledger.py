@@ -0,0 +1,52 @@
+import contextlib
+import json
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django_tenants.utils import schema_context
+
+from pharmacies.reconciliation_services import LedgerReconciliationService
+
+class Command(BaseCommand):
+    help = 'Merge-join invoices per account against the auth service ledger and print discrepancies as JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema whose invoices are reconciled',
+        )
+        parser.add_argument(
+            '--tenant-id',
+            type=int,
+            help='Restrict ledger accounts to this auth service tenant id',
+        )
+        parser.add_argument(
+            '--check-balance',
+            action='store_true',
+            help='Also report accounts whose balance differs from their invoiced total',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows fetched per round trip from each server-side cursor',
+        )
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        context = schema_context(options['schema']) if options['schema'] else contextlib.nullcontext()
+        with context:
+            discrepancies = LedgerReconciliationService.discrepancies(
+                tenant_id=options['tenant_id'],
+                check_balance=options['check_balance'],
+                batch_size=options['batch_size']
+            )
+            for discrepancy in discrepancies:
+                counts[discrepancy['kind']] += 1
+                self.stdout.write(json.dumps(discrepancy, cls=DjangoJSONEncoder))
+
+        summary = ', '.join(f'{kind}: {count}' for kind, count in sorted(counts.items())) or 'none'
+        style = self.style.WARNING if counts else self.style.SUCCESS
+        self.stderr.write(style(f'Discrepancies: {summary}'))
@@ -0,0 +1,43 @@
+import contextlib
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from pharmacies.rollup_services import SalesRollupService
+
+class Command(BaseCommand):
+    help = 'Fold new Register_pharmacy entries into the daily sales rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the rollup and rebuild it from the full register',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SalesRollupService.CATCH_UP_BATCH_SIZE,
+            help='Register entries folded per transaction',
+        )
+        parser.add_argument(
+            '--schema',
+            type=str,
+            help='Tenant schema to roll up',
+        )
+
+    def handle(self, *args, **options):
+        context = schema_context(options['schema']) if options['schema'] else contextlib.nullcontext()
+        with context:
+            if options['rebuild']:
+                self.stdout.write('Rebuilding daily sales rollup from scratch')
+                stats = SalesRollupService.rebuild()
+            else:
+                stats = SalesRollupService.catch_up(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Folded {stats['entries']} register entries into {stats['days']} day(s), "
+                f"watermark at id {stats['watermark']}"
+            )
+        )
@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django_tenants.utils import get_tenant_model
 
@@ -8,5 +11,49 @@ class TenantMiddleware(MiddlewareMixin):
         try:
             tenant = TenantModel.objects.get(domain_url=hostname)
             request.tenant = tenant
+            # Bind the connection too, so get_tenant_schema() matches request.tenant
+            connection.set_tenant(tenant)
         except TenantModel.DoesNotExist:
             request.tenant = None
+            # Do not serve an unknown host from the previous request's schema
+            connection.set_schema_to_public()
+
+
+class BearerTokenMiddleware:
+    """
+    Authenticates requests with auth-service Bearer tokens
+
+    Valid claims are attached as `request.auth_claims`; the DRF
+    BearerTokenAuthentication class turns them into request.user. A token
+    is only accepted for the pharmacy its tenant claim names, so this
+    must run after TenantMiddleware has set request.tenant.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .auth_client import AuthServiceUnavailable, token_client
+
+        request.auth_claims = None
+        if any(request.path.startswith(prefix) for prefix in getattr(settings, 'AUTH_EXEMPT_PATHS', ())):
+            return self.get_response(request)
+
+        scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            return JsonResponse({'error': 'Bearer token required'}, status=401)
+        schema_name = getattr(getattr(request, 'tenant', None), 'schema_name', None)
+        if schema_name is None:
+            return JsonResponse({'error': 'Token is not valid for this pharmacy'}, status=403)
+        try:
+            # Introspected against this tenant's schema in the auth service
+            claims = token_client.introspect(token.strip(), schema_name)
+        except AuthServiceUnavailable:
+            return JsonResponse({'error': 'Authentication service unavailable'}, status=503)
+        if claims is None:
+            return JsonResponse({'error': 'Invalid or expired token'}, status=401)
+        if claims.get('tenant') and claims['tenant'] != schema_name:
+            return JsonResponse({'error': 'Token is not valid for this pharmacy'}, status=403)
+
+        request.auth_claims = claims
+        return self.get_response(request)
@@ -0,0 +1,22 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pharmacies', '0002_register_financial_register_pharmacy'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='register_pharmacy',
+            index=models.Index(fields=['date', 'id'], name='reg_pharmacy_date_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='register_pharmacy',
+            index=models.Index(fields=['name_medicine', 'date'], name='reg_pharmacy_name_date_idx'),
+        ),
+    ]
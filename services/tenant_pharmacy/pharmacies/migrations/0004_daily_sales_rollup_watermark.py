@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0003_register_pharmacy_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Daily_sales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('name_medicine', models.CharField(max_length=50)),
+                ('quantity', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name_medicine', 'day'], name='daily_sales_name_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'name_medicine'), name='daily_sales_day_name_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Rollup_watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
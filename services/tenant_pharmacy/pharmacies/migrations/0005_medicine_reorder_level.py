@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0004_daily_sales_rollup_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='reorder_level',
+            field=models.IntegerField(db_default=0, default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0005_medicine_reorder_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Medicine_lot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_number', models.CharField(max_length=50)),
+                ('expiry_date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='pharmacies.medicine')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(condition=models.Q(('quantity__gt', 0)), fields=['medicine', 'expiry_date'], name='medicine_lot_fefo_idx'),
+                    models.Index(condition=models.Q(('quantity__gt', 0)), fields=['expiry_date'], name='medicine_lot_expiry_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('medicine', 'lot_number'), name='medicine_lot_number_uniq'),
+                    models.CheckConstraint(check=models.Q(('quantity__gte', 0)), name='medicine_lot_quantity_gte_0'),
+                ],
+            },
+        ),
+    ]
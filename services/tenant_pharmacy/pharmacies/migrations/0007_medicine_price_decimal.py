@@ -0,0 +1,185 @@
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import migrations, models, transaction
+
+MEDICINE_TABLE = 'pharmacies_medicine'
+BATCH_SIZE = 2000
+PRICE_QUANTUM = Decimal('0.01')
+PRICE_MAX = Decimal('9999999999.99')
+
+# Keeps the legacy text column in step while code from before this change
+# still runs: decimal writes are copied to the text column, and text
+# writes from old code are cast to the decimal one. Text the cast cannot
+# read is left NULL for the drop_legacy_price command to parse.
+CREATE_DUAL_WRITE = f"""
+CREATE OR REPLACE FUNCTION pharmacies_medicine_sync_legacy_price() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.price_amount IS NOT NULL
+            OR TG_OP = 'UPDATE' AND NEW.price_amount IS DISTINCT FROM OLD.price_amount THEN
+        NEW.price := NEW.price_amount::text;
+    ELSIF TG_OP = 'INSERT' AND NEW.price IS NOT NULL
+            OR TG_OP = 'UPDATE' AND NEW.price IS DISTINCT FROM OLD.price THEN
+        BEGIN
+            NEW.price_amount := round(btrim(NEW.price)::numeric, 2);
+        EXCEPTION WHEN others THEN
+            NEW.price_amount := NULL;
+        END;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pharmacies_medicine_sync_legacy_price ON {MEDICINE_TABLE};
+CREATE TRIGGER pharmacies_medicine_sync_legacy_price
+    BEFORE INSERT OR UPDATE ON {MEDICINE_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION pharmacies_medicine_sync_legacy_price();
+"""
+
+DROP_DUAL_WRITE = f"""
+DROP TRIGGER IF EXISTS pharmacies_medicine_sync_legacy_price ON {MEDICINE_TABLE};
+DROP FUNCTION IF EXISTS pharmacies_medicine_sync_legacy_price();
+"""
+
+
+def parse_price(raw):
+    # Frozen copy of pharmacies.utils.parse_price at the time of this migration
+    if raw is None:
+        return None
+    text = re.sub(r'[^0-9,.\-]', '', str(raw).strip())
+    if ',' in text and '.' in text:
+        thousands = ',' if text.rfind('.') > text.rfind(',') else '.'
+        text = text.replace(thousands, '').replace(',', '.')
+    elif ',' in text:
+        head, _, tail = text.rpartition(',')
+        if text.count(',') == 1 and len(tail) in (1, 2):
+            text = f'{head}.{tail}'
+        else:
+            text = text.replace(',', '')
+    try:
+        value = Decimal(text).quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+    if value.is_nan() or value < 0 or value > PRICE_MAX:
+        return None
+    return value
+
+
+def backfill_price_amount(apps, schema_editor):
+    """
+    Parse legacy price strings in short, separately committed batches
+
+    Only rows without a decimal price are read, so a re-run after a
+    failure resumes instead of starting over. Rows are locked while a
+    batch is parsed so a concurrent legacy write is not overwritten.
+    """
+    Medicine = apps.get_model('pharmacies', 'Medicine')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(
+                Medicine.objects.using(db_alias)
+                .select_for_update()
+                .filter(id__gt=last_id, price_amount__isnull=True)
+                .order_by('id')
+                .only('id', 'price')[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            for item in batch:
+                item.price_amount = parse_price(item.price)
+            Medicine.objects.using(db_alias).bulk_update(batch, ['price_amount'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    """
+    Expand step of the text-to-decimal price change
+
+    Adds the decimal column next to the legacy text one and backfills it;
+    the model's `price` maps to the new column from here on. The legacy
+    column stays, made nullable and kept in step by a trigger, so code
+    from before this change keeps reading and writing current prices
+    while a rollout is in progress. Once no such code is left, the
+    drop_legacy_price command removes the trigger and the column; no
+    migration does, so `migrate` never contracts early. Every step is
+    safe to re-run after a failure.
+    """
+
+    # Lets the backfill commit per batch and the indexes build concurrently
+    atomic = False
+
+    dependencies = [
+        ('pharmacies', '0006_medicine_lot'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'ALTER TABLE {MEDICINE_TABLE} ADD COLUMN IF NOT EXISTS price_amount numeric(12, 2) NULL',
+                    f'ALTER TABLE {MEDICINE_TABLE} DROP COLUMN IF EXISTS price_amount',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='medicine',
+                    name='price_amount',
+                    field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+                ),
+            ],
+        ),
+        # New code inserts rows without the legacy column
+        migrations.RunSQL(
+            f'ALTER TABLE {MEDICINE_TABLE} ALTER COLUMN price DROP NOT NULL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(CREATE_DUAL_WRITE, DROP_DUAL_WRITE),
+        migrations.RunPython(backfill_price_amount, migrations.RunPython.noop),
+        # From here `price` is the decimal column; the legacy one is left to drop_legacy_price
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='medicine',
+                    name='price',
+                ),
+                migrations.RenameField(
+                    model_name='medicine',
+                    old_name='price_amount',
+                    new_name='price',
+                ),
+                migrations.AlterField(
+                    model_name='medicine',
+                    name='price',
+                    field=models.DecimalField(blank=True, db_column='price_amount', decimal_places=2, max_digits=12, null=True),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS medicine_price_idx ON {MEDICINE_TABLE} (price_amount)',
+                    'DROP INDEX CONCURRENTLY IF EXISTS medicine_price_idx',
+                ),
+                migrations.RunSQL(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS medicine_stock_value_idx '
+                    f'ON {MEDICINE_TABLE} ((quantity * price_amount) DESC)',
+                    'DROP INDEX CONCURRENTLY IF EXISTS medicine_stock_value_idx',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='medicine',
+                    index=models.Index(fields=['price'], name='medicine_price_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='medicine',
+                    index=models.Index(
+                        (models.F('quantity') * models.F('price')).desc(),
+                        name='medicine_stock_value_idx',
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def seed_price_history(apps, schema_editor):
+    """Current prices apply to all existing history, which predates price tracking"""
+    Medicine = apps.get_model('pharmacies', 'Medicine')
+    Medicine_price = apps.get_model('pharmacies', 'Medicine_price')
+    db_alias = schema_editor.connection.alias
+    since = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    prices = (
+        Medicine.objects.using(db_alias)
+        .filter(price__isnull=False)
+        .values_list('id', 'price')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for medicine_id, price in prices:
+        batch.append(Medicine_price(medicine_id=medicine_id, price=price, effective_from=since))
+        if len(batch) >= BATCH_SIZE:
+            Medicine_price.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    if batch:
+        Medicine_price.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0007_medicine_price_decimal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Medicine_price',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='pharmacies.medicine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['medicine', 'effective_from'], name='medicine_price_effective_idx')],
+            },
+        ),
+        migrations.RunPython(seed_price_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_invoice_sequence(apps, schema_editor):
+    """Continue numbering after the highest client-supplied invoice"""
+    Register_Financial = apps.get_model('pharmacies', 'Register_Financial')
+    Invoice_sequence = apps.get_model('pharmacies', 'Invoice_sequence')
+    db_alias = schema_editor.connection.alias
+    last = Register_Financial.objects.using(db_alias).aggregate(last=Max('invoice'))['last'] or 0
+    Invoice_sequence.objects.using(db_alias).update_or_create(name='invoice', defaults={'last_value': last})
+
+
+class Migration(migrations.Migration):
+
+    # Lets the account index build concurrently
+    atomic = False
+
+    dependencies = [
+        ('pharmacies', '0008_medicine_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice_sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Invoice_line',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_number', models.PositiveIntegerField()),
+                ('name_medicine', models.CharField(max_length=50)),
+                ('quantity', models.IntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='pharmacies.register_financial')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('invoice', 'line_number'), name='invoice_line_number_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_invoice_sequence, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='register_financial',
+            index=models.Index(fields=['account', '-invoice'], name='reg_financial_account_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Stamps rows with the id of the writing transaction. Delta-sync clients
+# resume from the oldest transaction still running when they last read
+# (see SyncService), so rows from transactions that commit out of order
+# are never skipped. No-op updates keep their stamp.
+CREATE_TRIGGERS = """
+CREATE FUNCTION pharmacies_medicine_stamp_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NEW;
+    END IF;
+    NEW.change_seq := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pharmacies_medicine_stamp_change
+    BEFORE INSERT OR UPDATE ON pharmacies_medicine
+    FOR EACH ROW EXECUTE FUNCTION pharmacies_medicine_stamp_change();
+
+CREATE FUNCTION pharmacies_medicine_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO pharmacies_medicine_tombstone (medicine_id, name, change_seq)
+    VALUES (OLD.id, OLD.name, pg_current_xact_id()::text::bigint)
+    ON CONFLICT (medicine_id) DO UPDATE SET name = EXCLUDED.name, change_seq = EXCLUDED.change_seq;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pharmacies_medicine_tombstone
+    AFTER DELETE ON pharmacies_medicine
+    FOR EACH ROW EXECUTE FUNCTION pharmacies_medicine_tombstone();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS pharmacies_medicine_tombstone ON pharmacies_medicine;
+DROP FUNCTION IF EXISTS pharmacies_medicine_tombstone();
+DROP TRIGGER IF EXISTS pharmacies_medicine_stamp_change ON pharmacies_medicine;
+DROP FUNCTION IF EXISTS pharmacies_medicine_stamp_change();
+"""
+
+
+class Migration(migrations.Migration):
+
+    # Lets the sequence index build concurrently
+    atomic = False
+
+    dependencies = [
+        ('pharmacies', '0009_invoice_sequence_lines'),
+    ]
+
+    operations = [
+        # Existing rows keep 0 and reach clients through their first sync (since=0)
+        migrations.AddField(
+            model_name='medicine',
+            name='change_seq',
+            field=models.BigIntegerField(db_default=0, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Medicine_tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medicine_id', models.BigIntegerField(unique=True)),
+                ('name', models.CharField(max_length=50)),
+                ('change_seq', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['change_seq', 'medicine_id'], name='medicine_tombstone_seq_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        AddIndexConcurrently(
+            model_name='medicine',
+            index=models.Index(fields=['change_seq', 'id'], name='medicine_change_seq_idx'),
+        ),
+    ]
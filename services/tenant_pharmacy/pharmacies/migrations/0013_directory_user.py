@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0012_outbox_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Directory_user',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(max_length=150)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('first_name', models.CharField(blank=True, max_length=150)),
+                ('last_name', models.CharField(blank=True, max_length=150)),
+                ('is_active', models.BooleanField(default=True)),
+                ('role', models.CharField(blank=True, max_length=50, null=True)),
+                ('phone_number', models.CharField(blank=True, max_length=15)),
+                ('account_id', models.BigIntegerField(blank=True, null=True)),
+                ('account_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('source_updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['username'], name='directory_user_username_idx'),
+                    models.Index(fields=['email'], name='directory_user_email_idx'),
+                    models.Index(fields=['account_id'], name='directory_user_account_idx'),
+                    models.Index(fields=['account_number'], name='directory_user_acct_no_idx'),
+                ],
+            },
+        ),
+    ]
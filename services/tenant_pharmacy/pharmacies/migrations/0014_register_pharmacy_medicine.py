@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+MEDICINE_TABLE = 'pharmacies_medicine'
+REGISTER_TABLE = 'pharmacies_register_pharmacy'
+BATCH_SIZE = 5000
+
+
+def backfill_register_medicine(apps, schema_editor):
+    """Resolve existing register rows to medicines by name, in separately committed id ranges"""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT max(id) FROM {REGISTER_TABLE}')
+        last_id = cursor.fetchone()[0] or 0
+    for start in range(0, last_id, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {REGISTER_TABLE} r SET medicine_id = m.id FROM {MEDICINE_TABLE} m '
+                'WHERE r.id > %s AND r.id <= %s AND r.medicine_id IS NULL AND m.name = r.name_medicine',
+                [start, start + BATCH_SIZE]
+            )
+
+
+class Migration(migrations.Migration):
+    """
+    Link register rows to Medicine so historical prices are looked up by id
+
+    The column is nullable and filled in batches; rows whose name matches
+    no medicine stay NULL and are reported as unpriced. Safe to re-run.
+    """
+
+    # Lets the backfill commit per batch and the index build concurrently
+    atomic = False
+
+    dependencies = [
+        ('pharmacies', '0013_directory_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='register_pharmacy',
+            name='medicine',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registers', to='pharmacies.medicine'),
+        ),
+        migrations.RunPython(backfill_register_medicine, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS reg_pharmacy_medicine_date_idx '
+                    f'ON {REGISTER_TABLE} (medicine_id, date)',
+                    'DROP INDEX CONCURRENTLY IF EXISTS reg_pharmacy_medicine_date_idx',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='register_pharmacy',
+                    index=models.Index(fields=['medicine', 'date'], name='reg_pharmacy_medicine_date_idx'),
+                ),
+            ],
+        ),
+    ]
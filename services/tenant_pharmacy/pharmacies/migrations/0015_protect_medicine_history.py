@@ -0,0 +1,23 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Deleting a medicine no longer erases its price history or detaches its sales"""
+
+    dependencies = [
+        ('pharmacies', '0014_register_pharmacy_medicine'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicine_price',
+            name='medicine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='prices', to='pharmacies.medicine'),
+        ),
+        migrations.AlterField(
+            model_name='register_pharmacy',
+            name='medicine',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='registers', to='pharmacies.medicine'),
+        ),
+    ]
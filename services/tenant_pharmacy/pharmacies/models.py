@@ -1,31 +1,226 @@
 from django.db import models
 from datetime import*
 from django.db import connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # Create your models here.
        
 class Medicine(models.Model):
     name=models.CharField(max_length=50,unique=True,blank=True)
     quantity=models.IntegerField()
-    price=models.CharField(max_length=50)
+    # Decimal column added next to the legacy text one (see 0007 and drop_legacy_price)
+    price=models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, db_column='price_amount')
+    # Stock at or below this level is reported as low (db_default keeps raw bulk loads valid)
+    reorder_level=models.IntegerField(default=0, db_default=0)
+    # Id of the last transaction that changed the row, set by a trigger (see 0010)
+    change_seq=models.BigIntegerField(default=0, db_default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Delta sync: rows changed since a client's cursor
+            models.Index(fields=['change_seq', 'id'], name='medicine_change_seq_idx'),
+            # Price sorts and price-band range counts
+            models.Index(fields=['price'], name='medicine_price_idx'),
+            # Top-value SKUs: ORDER BY quantity * price DESC
+            models.Index(
+                (models.F('quantity') * models.F('price')).desc(),
+                name='medicine_stock_value_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name   
         
 class Register_Financial(models.Model):
     account=models.IntegerField()
+    # Allocated server-side from Invoice_sequence
     invoice=models.IntegerField(primary_key=True)
+
+    class Meta:
+        indexes = [
+            # Per-account invoice listings, newest invoice first
+            models.Index(fields=['account', '-invoice'], name='reg_financial_account_idx'),
+        ]
+
+
+class Invoice_sequence(models.Model):
+    """Per-tenant gap-free counter; the row lock is held until the invoice commits"""
+    name=models.CharField(max_length=50, unique=True)
+    last_value=models.BigIntegerField(default=0)
+
+
+class Invoice_line(models.Model):
+    invoice=models.ForeignKey(Register_Financial, on_delete=models.CASCADE, related_name='lines')
+    line_number=models.PositiveIntegerField()
+    name_medicine=models.CharField(max_length=50)
+    quantity=models.IntegerField()
+    unit_price=models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['invoice', 'line_number'], name='invoice_line_number_uniq'),
+        ]
     
 class Register_pharmacy(models.Model):
     id=models.BigAutoField(primary_key=True)
     name_medicine=models.CharField(max_length=50)
+    # Resolved from name_medicine on write; stays valid across renames (see 0014)
+    medicine=models.ForeignKey(Medicine, null=True, blank=True, on_delete=models.PROTECT, related_name='registers', db_index=False)
     quantity=models.IntegerField()
     date=models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        indexes = [
+            # Keyset paging and time-range scans over the dispensing history
+            models.Index(fields=['date', 'id'], name='reg_pharmacy_date_id_idx'),
+            # Per-medicine range scans
+            models.Index(fields=['name_medicine', 'date'], name='reg_pharmacy_name_date_idx'),
+            models.Index(fields=['medicine', 'date'], name='reg_pharmacy_medicine_date_idx'),
+        ]
+
     def __str__(self):
         return str(self.name_medicine)
 
-    
 
-    
+class Daily_sales(models.Model):
+    """Per-tenant (day, medicine) rollup of quantities sold from Register_pharmacy"""
+    day=models.DateField()
+    name_medicine=models.CharField(max_length=50)
+    quantity=models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'name_medicine'], name='daily_sales_day_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['name_medicine', 'day'], name='daily_sales_name_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.name_medicine}: {self.quantity}"
 
 
-    
\ No newline at end of file
+class Rollup_watermark(models.Model):
+    """Highest Register_pharmacy id already folded into a rollup"""
+    name=models.CharField(max_length=50, unique=True)
+    last_id=models.BigIntegerField(default=0)
+    updated_at=models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}@{self.last_id}"
+
+
+class Medicine_lot(models.Model):
+    """A received batch of a medicine with its own expiry date"""
+    medicine=models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='lots')
+    lot_number=models.CharField(max_length=50)
+    expiry_date=models.DateField()
+    quantity=models.IntegerField()
+    received_at=models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'lot_number'], name='medicine_lot_number_uniq'),
+            models.CheckConstraint(check=models.Q(quantity__gte=0), name='medicine_lot_quantity_gte_0'),
+        ]
+        indexes = [
+            # FEFO allocation: first-expiring stocked lots of one medicine
+            models.Index(fields=['medicine', 'expiry_date'], name='medicine_lot_fefo_idx', condition=models.Q(quantity__gt=0)),
+            # Expiry sweeps: range scan over stocked lots
+            models.Index(fields=['expiry_date'], name='medicine_lot_expiry_idx', condition=models.Q(quantity__gt=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id}/{self.lot_number} exp {self.expiry_date}"
+
+
+class Medicine_price(models.Model):
+    """Price of a medicine in force from effective_from until the next entry"""
+    # Deleting a medicine must not erase the prices its past sales are valued at
+    medicine=models.ForeignKey(Medicine, on_delete=models.PROTECT, related_name='prices')
+    price=models.DecimalField(max_digits=12, decimal_places=2)
+    effective_from=models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Point-in-time lookups: latest entry at or before a moment
+            models.Index(fields=['medicine', 'effective_from'], name='medicine_price_effective_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id} @ {self.effective_from}: {self.price}"
+
+
+class Medicine_tombstone(models.Model):
+    """Deleted medicines, written by a trigger so delta-sync clients learn about deletes"""
+    medicine_id=models.BigIntegerField(unique=True)
+    name=models.CharField(max_length=50)
+    change_seq=models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['change_seq', 'medicine_id'], name='medicine_tombstone_seq_idx'),
+        ]
+
+
+class Sale_replay(models.Model):
+    """Idempotency log of offline POS sales; a key is applied at most once"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('applied', 'Applied'),
+        ('conflict', 'Conflict'),
+    ]
+
+    idempotency_key=models.CharField(max_length=64, unique=True)
+    device_id=models.CharField(max_length=64, blank=True)
+    status=models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    detail=models.CharField(max_length=100, blank=True)
+    register_id=models.BigIntegerField(null=True, blank=True)
+    created_at=models.DateTimeField(auto_now_add=True)
+
+
+class Outbox_event(models.Model):
+    """Event written in the same transaction as the change it describes, published later by the relay"""
+    topic=models.CharField(max_length=100)
+    key=models.CharField(max_length=200)
+    event_type=models.CharField(max_length=50)
+    payload=models.JSONField(encoder=DjangoJSONEncoder)
+    created_at=models.DateTimeField(auto_now_add=True)
+    published_at=models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Relay scan: unpublished events in insertion order
+            models.Index(fields=['id'], name='outbox_event_pending_idx', condition=models.Q(published_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.key}"
+
+
+class Directory_user(models.Model):
+    """Local copy of an auth-service user and account, kept current from directory events"""
+    user_id=models.BigIntegerField(unique=True)
+    username=models.CharField(max_length=150)
+    email=models.CharField(max_length=254, blank=True)
+    first_name=models.CharField(max_length=150, blank=True)
+    last_name=models.CharField(max_length=150, blank=True)
+    is_active=models.BooleanField(default=True)
+    role=models.CharField(max_length=50, blank=True, null=True)
+    phone_number=models.CharField(max_length=15, blank=True)
+    account_id=models.BigIntegerField(null=True, blank=True)
+    account_number=models.CharField(max_length=20, blank=True, null=True)
+    # occurred_at of the applied event; older events are ignored
+    source_updated_at=models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['username'], name='directory_user_username_idx'),
+            models.Index(fields=['email'], name='directory_user_email_idx'),
+            models.Index(fields=['account_id'], name='directory_user_account_idx'),
+            models.Index(fields=['account_number'], name='directory_user_acct_no_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} ({self.user_id})"
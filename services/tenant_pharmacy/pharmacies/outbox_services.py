@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Medicine, Outbox_event, Register_pharmacy
+from . import codec
+from .publisher import build_event, event_headers, publisher
+from .routing import topics_for
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """
+    Transactional outbox for inventory and sales events
+
+    Events are inserted in the transaction that makes the change, so they
+    commit or roll back with it and requests never wait on the broker.
+    The relay publishes pending rows and marks them done; a crash between
+    the two re-sends the batch with identical bytes, so delivery is
+    at-least-once and consumers drop the repeats.
+    """
+
+    DEFAULT_BATCH_SIZE = 500
+    FLUSH_TIMEOUT = 30
+
+    @staticmethod
+    def _events(stream: str, event_type: str, entity: str, entity_id: Any, data: Dict[str, Any]) -> List[Outbox_event]:
+        """One row per topic the stream is routed to, all carrying the same envelope"""
+        key, envelope, _ = build_event(event_type, entity, entity_id, data)
+        return [
+            Outbox_event(topic=topic, key=key.decode('utf-8'), event_type=event_type, payload=envelope)
+            for topic in topics_for(stream, envelope['tenant'])
+        ]
+
+    @staticmethod
+    def enqueue(stream: str, event_type: str, entity: str, entity_id: Any, data: Dict[str, Any]) -> List[Outbox_event]:
+        """Write one event of a stream in the current transaction"""
+        return Outbox_event.objects.bulk_create(OutboxService._events(stream, event_type, entity, entity_id, data))
+
+    @staticmethod
+    def stock_changed(medicine_ids: Iterable[int]):
+        """
+        Snapshot changed medicines into medicine.updated events
+
+        Ids that no longer exist are emitted as medicine.deleted.
+        """
+        medicine_ids = sorted(set(medicine_ids))
+        if not medicine_ids:
+            return
+        rows = {
+            row['id']: row
+            for row in Medicine.objects.nocache().filter(id__in=medicine_ids)
+            .values('id', 'name', 'quantity', 'price', 'reorder_level')
+        }
+        Outbox_event.objects.bulk_create([
+            event
+            for pk in medicine_ids
+            for event in (
+                OutboxService._events('medicine', 'medicine.updated', 'medicine', pk, rows[pk])
+                if pk in rows else
+                OutboxService._events('medicine', 'medicine.deleted', 'medicine', pk, {'id': pk})
+            )
+        ])
+
+    @staticmethod
+    def sales_recorded(registers: Iterable[Register_pharmacy]):
+        """Emit a sale.recorded event per register entry"""
+        Outbox_event.objects.bulk_create([
+            event
+            for register in registers
+            for event in OutboxService._events('sales', 'sale.recorded', 'register', register.id, {
+                'id': register.id,
+                'name_medicine': register.name_medicine,
+                'quantity': register.quantity,
+                'date': register.date,
+            })
+        ])
+
+    @staticmethod
+    def relay_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Publish the oldest pending events of the current tenant
+
+        Rows are claimed with FOR UPDATE SKIP LOCKED, so several relays can
+        drain one outbox without blocking on or double-sending each other's
+        batches. Only the delivered prefix of a batch is marked published:
+        an event after a failure is retried with it rather than overtaking
+        it, which keeps per-key order within a relay.
+
+        Returns:
+            Dict with published and failed counts
+        """
+        with transaction.atomic():
+            events: List[Outbox_event] = list(
+                Outbox_event.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                return {'published': 0, 'failed': 0}
+
+            futures = [
+                publisher.send(
+                    event.topic,
+                    event.key.encode('utf-8'),
+                    codec.encode(event.payload),
+                    event_headers(event.event_type, event.payload['tenant']),
+                )
+                for event in events
+            ]
+            try:
+                publisher.flush(timeout=OutboxService.FLUSH_TIMEOUT)
+            except Exception:
+                logger.warning('Outbox flush timed out; undelivered events stay pending', exc_info=True)
+
+            delivered: List[int] = []
+            for event, future in zip(events, futures):
+                if not future.is_done or future.failed():
+                    break
+                delivered.append(event.id)
+            if delivered:
+                Outbox_event.objects.filter(id__in=delivered).update(published_at=timezone.now())
+        return {'published': len(delivered), 'failed': len(events) - len(delivered)}
+
+    @staticmethod
+    def relay(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+        """Relay batches until the outbox is drained or a batch fails"""
+        totals = {'published': 0, 'failed': 0, 'batches': 0}
+        while True:
+            stats = OutboxService.relay_batch(batch_size)
+            if not stats['published'] and not stats['failed']:
+                break
+            totals['batches'] += 1
+            totals['published'] += stats['published']
+            totals['failed'] += stats['failed']
+            if stats['failed'] or stats['published'] < batch_size:
+                break
+        return totals
+
+    @staticmethod
+    def purge(older_than: timedelta) -> int:
+        """Delete events published before `older_than` ago; returns the count"""
+        deleted, _ = Outbox_event.objects.filter(
+            published_at__lt=timezone.now() - older_than
+        ).delete()
+        return deleted
@@ -0,0 +1,75 @@
+import base64
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPagination:
+    """
+    Keyset (seek) pagination over an ordering of (field, id)
+
+    Each page continues strictly after the last (field, id) pair returned,
+    so fetching a page is an index range scan whose cost does not depend
+    on how deep into the result set the client is.
+    """
+
+    default_limit = 100
+    max_limit = 1000
+
+    def __init__(self, field: str = 'date', parse_value: Callable[[str], Any] = parse_datetime):
+        self.field = field
+        self.parse_value = parse_value
+
+    def get_limit(self, raw: Optional[str]) -> int:
+        """Clamp the requested page size, raising ValueError on garbage"""
+        if raw in (None, ''):
+            return self.default_limit
+        limit = int(raw)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        return min(limit, self.max_limit)
+
+    def encode_cursor(self, value: Any, pk: int) -> str:
+        raw = value.isoformat() if hasattr(value, 'isoformat') else value
+        payload = json.dumps([raw, pk], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii')
+
+    def decode_cursor(self, cursor: str) -> Tuple[Any, int]:
+        try:
+            raw, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            value = self.parse_value(raw) if isinstance(raw, str) else raw
+            pk = int(pk)
+        except (ValueError, TypeError, json.JSONDecodeError) as e:
+            raise ValueError('Invalid cursor') from e
+        if value is None:
+            raise ValueError('Invalid cursor')
+        return value, pk
+
+    def paginate(self, queryset: QuerySet, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+        """
+        Return one page of the queryset and the cursor for the next page
+
+        Args:
+            queryset: Unordered, already filtered queryset
+            cursor: Opaque cursor from a previous page, or None for the first page
+            limit: Page size
+
+        Returns:
+            (items, next_cursor); next_cursor is None on the last page
+        """
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            # The redundant >= bound keeps the scan on the (field, id) index
+            queryset = queryset.filter(**{f'{self.field}__gte': value}).filter(
+                Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'id__gt': pk})
+            )
+
+        items = list(queryset.order_by(self.field, 'id')[:limit + 1])
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        last = items[-1]
+        return items, self.encode_cursor(getattr(last, self.field), last.pk)
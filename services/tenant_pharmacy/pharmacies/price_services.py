@@ -0,0 +1,108 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, QuerySet, Subquery, Sum
+from django.utils import timezone
+
+from .models import Medicine_price, Register_pharmacy
+
+
+def unit_price_at_sale():
+    """Correlated subquery: price in force for a register row's medicine at its date"""
+    # Probes medicine_price_effective_idx directly, without joining Medicine per row
+    return Subquery(
+        Medicine_price.objects.filter(
+            medicine_id=OuterRef('medicine_id'),
+            effective_from__lte=OuterRef('date'),
+        )
+        .order_by('-effective_from')
+        .values('price')[:1],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class PriceHistoryService:
+    """Effective-dated medicine prices and set-based revaluation of sales"""
+
+    @staticmethod
+    def record(changes: Iterable[Tuple[int, Optional[Decimal]]], effective_from: Optional[datetime] = None) -> int:
+        """
+        Append price history entries for medicines whose price changed
+
+        Call inside the transaction that changes the prices.
+
+        Args:
+            changes: (medicine_id, new_price) pairs; None prices are skipped
+            effective_from: When the prices take effect (now by default)
+
+        Returns:
+            Number of entries written
+        """
+        effective_from = effective_from or timezone.now()
+        entries = [
+            Medicine_price(medicine_id=medicine_id, price=price, effective_from=effective_from)
+            for medicine_id, price in changes
+            if price is not None
+        ]
+        Medicine_price.objects.bulk_create(entries)
+        return len(entries)
+
+    @staticmethod
+    def price_at(medicine_id: int, at: datetime) -> Optional[Medicine_price]:
+        """Price entry in force at a moment, found with one backward index probe"""
+        return (
+            Medicine_price.objects.filter(medicine_id=medicine_id, effective_from__lte=at)
+            .order_by('-effective_from')
+            .first()
+        )
+
+    @staticmethod
+    def history(medicine_id: int) -> QuerySet:
+        return Medicine_price.objects.filter(medicine_id=medicine_id).order_by('-effective_from')
+
+    @staticmethod
+    def revalue(date_from: datetime, date_to: datetime) -> QuerySet:
+        """
+        Register entries in [date_from, date_to) with the unit price in force at each sale
+
+        Evaluates as a single statement: a range scan over the register
+        joined to the price history through a correlated index lookup.
+        """
+        return (
+            Register_pharmacy.objects.filter(date__gte=date_from, date__lt=date_to)
+            .annotate(unit_price=unit_price_at_sale())
+            .annotate(line_total=ExpressionWrapper(
+                F('quantity') * F('unit_price'),
+                output_field=DecimalField(max_digits=22, decimal_places=2),
+            ))
+            .order_by('date', 'id')
+        )
+
+    @staticmethod
+    def revenue(date_from: datetime, date_to: datetime) -> Dict[str, Any]:
+        """
+        Revenue for a period valued at historical prices, in one set-based statement
+
+        Returns:
+            Dict with entries, units, unpriced_units and revenue
+        """
+        totals = PriceHistoryService.revalue(date_from, date_to).order_by().aggregate(
+            entries=Count('id'),
+            units=Sum('quantity'),
+            unpriced_units=Sum('quantity', filter=Q(unit_price__isnull=True)),
+            revenue=Sum('line_total'),
+        )
+        return {
+            'entries': totals['entries'],
+            'units': totals['units'] or 0,
+            'unpriced_units': totals['unpriced_units'] or 0,
+            'revenue': totals['revenue'] or Decimal('0.00'),
+        }
+
+    @staticmethod
+    def revalued_lines(date_from: datetime, date_to: datetime) -> List[Dict[str, Any]]:
+        return list(
+            PriceHistoryService.revalue(date_from, date_to)
+            .values('id', 'name_medicine', 'quantity', 'date', 'unit_price', 'line_total')
+        )
@@ -0,0 +1,283 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import codec
+from .utils import get_tenant_schema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRODUCER_CONFIG = {
+    'bootstrap_servers': 'localhost:9092',
+    'acks': 'all',
+    'retries': 3,
+    # One request in flight keeps retried batches from overtaking later ones
+    'max_in_flight_requests_per_connection': 1,
+    'linger_ms': 20,
+    'batch_size': 64 * 1024,
+    'compression_type': 'gzip',
+}
+
+
+def event_key(tenant: str, entity: str, entity_id: Any) -> bytes:
+    """Partition key: every event of one entity in one tenant lands on one partition, in order"""
+    return f'{tenant}:{entity}:{entity_id}'.encode('utf-8')
+
+
+def event_headers(event_type: str, tenant: str) -> List[Tuple[str, bytes]]:
+    return [('event_type', event_type.encode('utf-8')), ('tenant', tenant.encode('utf-8'))]
+
+
+def build_event(
+    event_type: str,
+    entity: str,
+    entity_id: Any,
+    data: Dict[str, Any],
+    tenant: Optional[str] = None
+) -> Tuple[bytes, Dict[str, Any], List[Tuple[str, bytes]]]:
+    """
+    Key, envelope and headers of an event
+
+    Returns:
+        (key, envelope, headers)
+    """
+    tenant = tenant or get_tenant_schema()
+    envelope = {
+        'event': event_type,
+        'tenant': tenant,
+        'entity': entity,
+        'id': entity_id,
+        'occurred_at': timezone.now(),
+        'data': data,
+    }
+    return event_key(tenant, entity, entity_id), envelope, event_headers(event_type, tenant)
+
+
+class DeliveryFuture:
+    """Already-settled future with the add_callback/add_errback surface of kafka-python's"""
+
+    def __init__(self, metadata: Any = None, exception: Optional[BaseException] = None):
+        self.metadata = metadata
+        self.exception = exception
+
+    def add_callback(self, fn: Callable, *args, **kwargs) -> 'DeliveryFuture':
+        if self.exception is None:
+            fn(*args, self.metadata, **kwargs)
+        return self
+
+    def add_errback(self, fn: Callable, *args, **kwargs) -> 'DeliveryFuture':
+        if self.exception is not None:
+            fn(*args, self.exception, **kwargs)
+        return self
+
+    @property
+    def is_done(self) -> bool:
+        return True
+
+    def succeeded(self) -> bool:
+        return self.exception is None
+
+    def failed(self) -> bool:
+        return self.exception is not None
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        if self.exception is not None:
+            raise self.exception
+        return self.metadata
+
+
+class InMemoryBroker:
+    """
+    Producer stand-in that keeps messages in process
+
+    Messages are hashed onto partitions by key like Kafka's default
+    partitioner, so per-key ordering can be asserted in tests without
+    a broker.
+    """
+
+    def __init__(self, partitions: int = 3):
+        self.partitions = partitions
+        self._topics: Dict[str, List[List[Dict[str, Any]]]] = defaultdict(
+            lambda: [[] for _ in range(self.partitions)]
+        )
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, topic: str, value: bytes = None, key: bytes = None, headers: Optional[List[Tuple[str, bytes]]] = None):
+        partition = (zlib.crc32(key) if key is not None else 0) % self.partitions
+        with self._lock:
+            log = self._topics[topic][partition]
+            offset = len(log)
+            log.append({
+                'topic': topic,
+                'partition': partition,
+                'offset': offset,
+                'key': key,
+                'value': value,
+                'headers': list(headers or []),
+                'timestamp': int(time.time() * 1000),
+            })
+        return DeliveryFuture(metadata={'topic': topic, 'partition': partition, 'offset': offset})
+
+    def messages(self, topic: str, partition: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            logs = self._topics.get(topic, [])
+            if partition is not None:
+                return list(logs[partition]) if logs else []
+            return sorted((m for log in logs for m in log), key=lambda m: (m['timestamp'], m['partition'], m['offset']))
+
+    def clear(self):
+        with self._lock:
+            self._topics.clear()
+
+    def flush(self, timeout: Optional[float] = None):
+        pass
+
+    def close(self, timeout: Optional[float] = None):
+        self.closed = True
+
+
+class EventPublisher:
+    """
+    Process-wide, non-blocking event publisher
+
+    One producer is shared by every request of a worker process and
+    recreated after a fork. publish() only enqueues; the producer
+    batches records in the background (linger_ms/batch_size) and
+    compresses each batch. Delivery outcomes feed the metrics below.
+    """
+
+    def __init__(self):
+        self._producer = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'published': 0, 'delivered': 0, 'failed': 0, 'last_error': None}
+
+    def _backend(self) -> str:
+        return getattr(settings, 'EVENT_PUBLISHER_BACKEND', 'kafka')
+
+    def _config(self) -> Dict[str, Any]:
+        config = {**DEFAULT_PRODUCER_CONFIG, 'client_id': socket.gethostname()}
+        config.update(getattr(settings, 'KAFKA_PRODUCER_CONFIG', {}))
+        return config
+
+    @property
+    def producer(self):
+        pid = os.getpid()
+        if self._producer is None or self._pid != pid:
+            with self._lock:
+                if self._producer is None or self._pid != pid:
+                    if self._backend() == 'memory':
+                        self._producer = InMemoryBroker()
+                    else:
+                        from kafka import KafkaProducer
+                        self._producer = KafkaProducer(**self._config())
+                    self._pid = pid
+        return self._producer
+
+    def use(self, producer):
+        """Swap in a producer, e.g. an InMemoryBroker in tests; returns the previous one"""
+        with self._lock:
+            previous, self._producer, self._pid = self._producer, producer, os.getpid()
+        return previous
+
+    def _count(self, field: str, error: Optional[BaseException] = None):
+        with self._metrics_lock:
+            self._metrics[field] += 1
+            if error is not None:
+                self._metrics['last_error'] = repr(error)
+
+    def _on_delivery(self, metadata):
+        self._count('delivered')
+
+    def _on_error(self, topic: str, key: bytes, exc: BaseException):
+        self._count('failed', exc)
+        logger.error('Event delivery to %s failed for key %s: %r', topic, key, exc)
+
+    def publish(
+        self,
+        topic: str,
+        event_type: str,
+        entity: str,
+        entity_id: Any,
+        data: Dict[str, Any],
+        tenant: Optional[str] = None,
+        on_delivery: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+    ):
+        """
+        Enqueue an event without waiting for the broker
+
+        Args:
+            topic: Destination topic
+            event_type: Event name, e.g. 'medicine.updated'
+            entity: Entity kind, part of the partition key
+            entity_id: Entity id, part of the partition key
+            data: JSON-serialisable payload
+            tenant: Tenant schema (the active one by default)
+            on_delivery: Called with the record metadata once acknowledged
+            on_error: Called with the exception if delivery fails
+
+        Returns:
+            The producer's delivery future
+        """
+        key, envelope, headers = build_event(event_type, entity, entity_id, data, tenant)
+        return self.send(topic, key, codec.encode(envelope), headers, on_delivery, on_error)
+
+    def send(
+        self,
+        topic: str,
+        key: bytes,
+        value: bytes,
+        headers: List[Tuple[str, bytes]],
+        on_delivery: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+    ):
+        """Enqueue an already encoded record, e.g. one replayed from the outbox"""
+        try:
+            future = self.producer.send(topic, value=value, key=key, headers=headers)
+        except Exception as exc:
+            # Buffer full past max_block_ms, broker metadata unavailable, ...
+            self._on_error(topic, key, exc)
+            if on_error is not None:
+                on_error(exc)
+            return DeliveryFuture(exception=exc)
+        self._count('published')
+        future.add_callback(self._on_delivery)
+        future.add_errback(self._on_error, topic, key)
+        if on_delivery is not None:
+            future.add_callback(on_delivery)
+        if on_error is not None:
+            future.add_errback(on_error)
+        return future
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['pending'] = metrics['published'] - metrics['delivered'] - metrics['failed']
+        metrics['backend'] = self._backend()
+        return metrics
+
+    def flush(self, timeout: Optional[float] = None):
+        if self._producer is not None and self._pid == os.getpid():
+            self._producer.flush(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = 5):
+        with self._lock:
+            producer, self._producer = self._producer, None
+        if producer is not None and self._pid == os.getpid():
+            producer.close(timeout=timeout)
+
+
+publisher = EventPublisher()
+atexit.register(publisher.close)
@@ -0,0 +1,137 @@
+import re
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, connections
+
+from .models import Invoice_line, Register_Financial
+
+LEDGER_ALIAS = 'ledger'
+TABLE_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$')
+
+# (account, invoice_count, invoiced_total)
+InvoicedRow = Tuple[int, int, Decimal]
+# (account, balance)
+LedgerRow = Tuple[int, Decimal]
+
+
+def stream_rows(alias: str, sql: str, params: Any = None, batch_size: int = 5000) -> Iterator[tuple]:
+    """
+    Run a query through a server-side cursor and yield its rows
+
+    Only `batch_size` rows are held client-side at a time.
+    """
+    conn = connections[alias]
+    with conn.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+def merge_join(
+    left: Iterator[tuple],
+    right: Iterator[tuple],
+    key: Callable[[tuple], Any] = lambda row: row[0]
+) -> Iterator[Tuple[Optional[tuple], Optional[tuple]]]:
+    """
+    Full outer merge join of two iterators sorted ascending on a unique key
+
+    Yields:
+        (left_row, right_row) pairs; the missing side is None
+    """
+    left_row = next(left, None)
+    right_row = next(right, None)
+    while left_row is not None or right_row is not None:
+        if right_row is None or (left_row is not None and key(left_row) < key(right_row)):
+            yield left_row, None
+            left_row = next(left, None)
+        elif left_row is None or key(right_row) < key(left_row):
+            yield None, right_row
+            right_row = next(right, None)
+        else:
+            yield left_row, right_row
+            left_row = next(left, None)
+            right_row = next(right, None)
+
+
+class LedgerReconciliationService:
+    """Compare pharmacy invoices per account with the auth service's Account ledger"""
+
+    @staticmethod
+    def _account_table() -> str:
+        table = getattr(settings, 'LEDGER_ACCOUNT_TABLE', 'auth_account')
+        if not TABLE_NAME_RE.match(table):
+            raise ValueError(f'Invalid LEDGER_ACCOUNT_TABLE: {table}')
+        quote = connections[LEDGER_ALIAS].ops.quote_name
+        return '.'.join(quote(part) for part in table.split('.'))
+
+    @staticmethod
+    def invoiced_accounts(batch_size: int = 5000) -> Iterator[InvoicedRow]:
+        """
+        Invoice count and invoiced total per account of the current tenant, by account
+
+        Walks the (account, -invoice) index so rows stream out already
+        grouped, without a sort over the whole register.
+        """
+        invoices = Register_Financial._meta.db_table
+        lines = Invoice_line._meta.db_table
+        sql = (
+            f'SELECT f.account, COUNT(*), COALESCE(SUM(t.total), 0) '
+            f'FROM {invoices} f '
+            f'LEFT JOIN LATERAL ('
+            f'  SELECT SUM(l.quantity * l.unit_price) AS total FROM {lines} l WHERE l.invoice_id = f.invoice'
+            f') t ON true '
+            f'GROUP BY f.account ORDER BY f.account'
+        )
+        return stream_rows(connection.alias, sql, batch_size=batch_size)
+
+    @staticmethod
+    def ledger_accounts(tenant_id: Optional[int] = None, batch_size: int = 5000) -> Iterator[LedgerRow]:
+        """Account ids and balances from the auth service, by id"""
+        sql = f'SELECT id, balance FROM {LedgerReconciliationService._account_table()}'
+        params = []
+        if tenant_id is not None:
+            sql += ' WHERE tenant_id = %s'
+            params.append(tenant_id)
+        sql += ' ORDER BY id'
+        return stream_rows(LEDGER_ALIAS, sql, params, batch_size=batch_size)
+
+    @staticmethod
+    def discrepancies(
+        tenant_id: Optional[int] = None,
+        check_balance: bool = False,
+        batch_size: int = 5000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream discrepancies between both sides in constant memory
+
+        Yields:
+            Dicts with a `kind` of 'missing_account' (invoices booked to an
+            account the ledger does not know) or, with check_balance,
+            'balance_mismatch' (invoiced total differs from the balance)
+        """
+        invoiced = LedgerReconciliationService.invoiced_accounts(batch_size)
+        ledger = LedgerReconciliationService.ledger_accounts(tenant_id, batch_size)
+        for left, right in merge_join(invoiced, ledger):
+            if left is None:
+                continue
+            account, invoice_count, invoiced_total = left
+            if right is None:
+                yield {
+                    'kind': 'missing_account',
+                    'account': account,
+                    'invoices': invoice_count,
+                    'invoiced_total': invoiced_total,
+                }
+            elif check_balance and invoiced_total != right[1]:
+                yield {
+                    'kind': 'balance_mismatch',
+                    'account': account,
+                    'invoices': invoice_count,
+                    'invoiced_total': invoiced_total,
+                    'balance': right[1],
+                }
@@ -0,0 +1,210 @@
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .cache_services import invalidate_rows, model_row
+from .lot_services import LotService
+from .models import Medicine, Register_pharmacy, Sale_replay
+from .outbox_services import OutboxService
+from .rollup_services import SalesRollupService
+from .stock_services import StockService
+
+
+class OfflineSaleService:
+    """Idempotent bulk replay of sales queued by offline POS terminals"""
+
+    DEFAULT_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def replay(sales: List[Dict[str, Any]], device_id: str = '', chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        Apply a client-generated sales log, skipping lines already applied
+
+        Lines are replayed in sale order, one transaction per chunk. Each
+        chunk claims its idempotency keys, decrements stock with one
+        statement and inserts its register entries with one bulk insert.
+        A line that would take a medicine below zero, or a lot-tracked
+        medicine beyond the stock its lots hold, is rejected as a conflict
+        and leaves stock untouched; later lines still apply. Applied lines
+        draw on lots in first-expiry-first-out order, expired lots
+        included, as those may still have been sellable when the sale
+        was made.
+        Conflicts are recorded against their key like applied lines, so a
+        retried upload reports them as duplicates instead of applying
+        them once stock returns; resubmit under a new key to force them.
+
+        Args:
+            sales: Validated lines with key, name, quantity and sold_at
+            device_id: Terminal the log comes from
+            chunk_size: Lines applied per transaction
+
+        Returns:
+            Dict with counters and duplicate and conflict reports
+        """
+        report = {'applied': 0, 'duplicates': [], 'conflicts': [], 'chunks': 0}
+
+        # First occurrence of a key wins within the log itself
+        unique: Dict[str, Dict[str, Any]] = {}
+        for sale in sales:
+            if sale['key'] in unique:
+                report['duplicates'].append({'key': sale['key'], 'status': 'repeated_in_batch'})
+            else:
+                unique[sale['key']] = sale
+        ordered = iter(sorted(unique.values(), key=lambda sale: (sale['sold_at'], sale['key'])))
+
+        while True:
+            chunk = list(islice(ordered, chunk_size))
+            if not chunk:
+                break
+            report['chunks'] += 1
+            OfflineSaleService._apply_chunk(chunk, device_id, report)
+        return report
+
+    @staticmethod
+    def _claim(keys: List[str], device_id: str) -> set:
+        """Insert pending replay rows; returns the keys this call now owns"""
+        table = Sale_replay._meta.db_table
+        placeholders = ', '.join(["(%s, %s, 'pending', '', now())"] * len(keys))
+        params: List[Any] = []
+        for key in keys:
+            params.extend([key, device_id])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (idempotency_key, device_id, status, detail, created_at) '
+                f'VALUES {placeholders} ON CONFLICT (idempotency_key) DO NOTHING '
+                'RETURNING idempotency_key',
+                params
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _apply_chunk(chunk: List[Dict[str, Any]], device_id: str, report: Dict[str, Any]):
+        with transaction.atomic():
+            keys = [sale['key'] for sale in chunk]
+            # Blocks on keys another upload is applying until it commits
+            claimed = OfflineSaleService._claim(keys, device_id)
+            if len(claimed) < len(keys):
+                previous = dict(
+                    Sale_replay.objects.filter(idempotency_key__in=set(keys) - claimed)
+                    .values_list('idempotency_key', 'status')
+                )
+                report['duplicates'].extend(
+                    {'key': key, 'status': previous.get(key)} for key in keys if key not in claimed
+                )
+            lines = [sale for sale in chunk if sale['key'] in claimed]
+            if not lines:
+                return
+
+            # Lock touched medicines in id order so concurrent uploads cannot deadlock
+            before = list(
+                Medicine.objects.nocache().select_for_update()
+                .filter(name__in={sale['name'] for sale in lines})
+                .order_by('id')
+                .values(*(field.attname for field in Medicine._meta.concrete_fields))
+            )
+            # Lot-tracked medicines can sell no more than their lots hold; the
+            # medicine row locks keep other sales and receipts off those lots
+            lot_totals = LotService.totals(row['id'] for row in before)
+            stock = {
+                row['name']: [row['id'], min(row['quantity'], lot_totals.get(row['id'], row['quantity']))]
+                for row in before
+            }
+
+            applied: List[Dict[str, Any]] = []
+            outcomes: Dict[str, Tuple[str, str, Optional[int]]] = {}
+            for sale in lines:
+                entry = stock.get(sale['name'])
+                if entry is None:
+                    outcomes[sale['key']] = ('conflict', 'unknown_medicine', None)
+                    report['conflicts'].append({**OfflineSaleService._describe(sale), 'reason': 'unknown_medicine'})
+                elif entry[1] < sale['quantity']:
+                    outcomes[sale['key']] = ('conflict', 'insufficient_stock', None)
+                    report['conflicts'].append({
+                        **OfflineSaleService._describe(sale),
+                        'reason': 'insufficient_stock',
+                        'available': entry[1],
+                    })
+                else:
+                    entry[1] -= sale['quantity']
+                    applied.append(sale)
+
+            deltas: Dict[int, int] = defaultdict(int)
+            for sale in applied:
+                deltas[stock[sale['name']][0]] -= sale['quantity']
+            after = OfflineSaleService._decrement(deltas)
+
+            for medicine_id, delta in deltas.items():
+                if medicine_id in lot_totals:
+                    LotService.allocate(medicine_id, -delta, include_expired=True)
+
+            registers = Register_pharmacy.objects.bulk_create([
+                Register_pharmacy(
+                    name_medicine=sale['name'],
+                    medicine_id=stock[sale['name']][0],
+                    quantity=sale['quantity'],
+                    date=sale['sold_at'],
+                )
+                for sale in applied
+            ])
+            rollup: Dict[Tuple[Any, str], int] = defaultdict(int)
+            for register in registers:
+                rollup[(SalesRollupService.sale_day(register.date), register.name_medicine)] += register.quantity
+            SalesRollupService.add_quantities(dict(rollup))
+            OutboxService.sales_recorded(registers)
+
+            for sale, register in zip(applied, registers):
+                outcomes[sale['key']] = ('applied', '', register.id)
+            OfflineSaleService._record_outcomes(outcomes)
+
+            StockService.stock_changed(list(deltas), deltas=dict(deltas))
+            # The raw stock update and the bulk register insert bypass cacheops
+            invalidate_rows(Medicine, [row for row in before if row['id'] in deltas] + after)
+            invalidate_rows(Register_pharmacy, [model_row(register) for register in registers])
+        report['applied'] += len(applied)
+
+    @staticmethod
+    def _describe(sale: Dict[str, Any]) -> Dict[str, Any]:
+        return {'key': sale['key'], 'name': sale['name'], 'quantity': sale['quantity'], 'sold_at': sale['sold_at']}
+
+    @staticmethod
+    def _decrement(deltas: Dict[int, int]) -> List[Dict[str, Any]]:
+        """
+        Apply per-medicine stock deltas with a single UPDATE ... FROM (VALUES ...)
+
+        Returns:
+            The updated rows, by attname
+        """
+        if not deltas:
+            return []
+        table = Medicine._meta.db_table
+        fields = Medicine._meta.concrete_fields
+        placeholders = ', '.join(['(%s, %s)'] * len(deltas))
+        params: List[Any] = []
+        for medicine_id, delta in sorted(deltas.items()):
+            params.extend([medicine_id, delta])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS m SET quantity = m.quantity + v.delta '
+                f'FROM (VALUES {placeholders}) AS v (id, delta) WHERE m.id = v.id '
+                f"RETURNING {', '.join(f'm.{field.column}' for field in fields)}",
+                params
+            )
+            return [dict(zip((field.attname for field in fields), row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _record_outcomes(outcomes: Dict[str, Tuple[str, str, Optional[int]]]):
+        """Settle claimed keys with their outcome in one statement"""
+        table = Sale_replay._meta.db_table
+        placeholders = ', '.join(['(%s, %s, %s, %s::bigint)'] * len(outcomes))
+        params: List[Any] = []
+        for key, (status, detail, register_id) in outcomes.items():
+            params.extend([key, status, detail, register_id])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS r SET status = v.status, detail = v.detail, register_id = v.register_id '
+                f'FROM (VALUES {placeholders}) AS v (key, status, detail, register_id) '
+                'WHERE r.idempotency_key = v.key',
+                params
+            )
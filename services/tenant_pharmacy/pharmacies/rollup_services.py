@@ -0,0 +1,228 @@
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Daily_sales, Register_pharmacy, Rollup_watermark
+from .utils import get_tenant_schema
+
+PERIOD_TRUNCATIONS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+class SalesRollupService:
+    """Incremental (day, medicine) sales rollups kept alongside Register_pharmacy"""
+
+    WATERMARK = 'daily_sales'
+    CATCH_UP_BATCH_SIZE = 50000
+
+    @staticmethod
+    def sale_day(moment: datetime) -> date:
+        """Bucket a register timestamp into the day it counts towards"""
+        if timezone.is_aware(moment):
+            return timezone.localdate(moment)
+        return moment.date()
+
+    @staticmethod
+    def day_bounds(day: date) -> Tuple[datetime, datetime]:
+        """Half-open [start, end) datetime range covering a day"""
+        start = datetime.combine(day, time.min)
+        end = start + timedelta(days=1)
+        if settings.USE_TZ:
+            start, end = timezone.make_aware(start), timezone.make_aware(end)
+        return start, end
+
+    @staticmethod
+    def record_register(register: Register_pharmacy):
+        """
+        Fold a freshly inserted register entry into its rollup bucket
+
+        Must run inside the transaction that inserted the entry so the
+        rollup commits or rolls back together with it.
+        """
+        SalesRollupService.add_quantities({
+            (SalesRollupService.sale_day(register.date), register.name_medicine): register.quantity
+        })
+
+    @staticmethod
+    def add_quantities(deltas: Dict[Tuple[date, str], int]):
+        """
+        Add quantity deltas to (day, medicine) buckets with one upsert
+
+        Args:
+            deltas: Mapping of (day, name_medicine) to the quantity to add
+        """
+        if not deltas:
+            return
+        # Stable ordering so concurrent batches lock buckets in the same order
+        rows = sorted(deltas.items())
+        # Shared: inline writers of a day run concurrently, but wait for a rebuild of it
+        SalesRollupService.lock_days({day for day, _ in deltas}, shared=True)
+        table = Daily_sales._meta.db_table
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(rows))
+        params: List[Any] = []
+        for (day, name_medicine), quantity in rows:
+            params.extend([day, name_medicine, quantity])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (day, name_medicine, quantity) VALUES {placeholders} '
+                'ON CONFLICT (day, name_medicine) DO UPDATE '
+                f'SET quantity = {table}.quantity + EXCLUDED.quantity',
+                params
+            )
+
+    @staticmethod
+    def lock_days(days: Iterable[date], shared: bool = False):
+        """
+        Take transaction-scoped advisory locks on the rollup days of the current tenant
+
+        A rebuild of a day holds its lock exclusively and inline upserts
+        hold it shared, so they exclude each other per day only: writers of
+        other days, and inline writers of the same day, never wait.
+
+        Args:
+            days: Days to lock; taken in date order so lockers cannot deadlock
+            shared: Take shared instead of exclusive locks
+        """
+        function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+        # Advisory locks are database-wide, so the key carries the tenant schema
+        namespace = f'{Daily_sales._meta.db_table}:{get_tenant_schema()}'
+        with connection.cursor() as cursor:
+            for day in sorted(set(days)):
+                cursor.execute(f'SELECT {function}(hashtext(%s), %s)', [namespace, day.toordinal()])
+
+    @staticmethod
+    def recompute_days(days: Iterable[date], names: Optional[Iterable[str]] = None) -> int:
+        """
+        Rebuild rollup buckets for the given days from the raw register
+
+        Replacing buckets (rather than adding to them) makes this safe to
+        run over days that inline updates have already counted.
+
+        Args:
+            days: Days to rebuild
+            names: Restrict the rebuild to these medicines (all if None)
+
+        Returns:
+            Number of buckets written
+        """
+        days = sorted(set(days))
+        if not days:
+            return 0
+        names = set(names) if names is not None else None
+
+        ranges = []
+        for day in days:
+            start, end = SalesRollupService.day_bounds(day)
+            ranges.append(Q(date__gte=start, date__lt=end))
+        source = Register_pharmacy.objects.nocache().filter(reduce(or_, ranges))
+        buckets = Daily_sales.objects.filter(day__in=days)
+        if names is not None:
+            source = source.filter(name_medicine__in=names)
+            buckets = buckets.filter(name_medicine__in=names)
+
+        with transaction.atomic():
+            # Blocks inline upserts into these days until this rebuild commits,
+            # so an entry is either in the aggregate below or added on top of it
+            # afterwards; other days are not held up
+            SalesRollupService.lock_days(days)
+            buckets.delete()
+            totals = (
+                source.annotate(day=TruncDate('date'))
+                .values('day', 'name_medicine')
+                .annotate(total=Sum('quantity'))
+            )
+            created = Daily_sales.objects.bulk_create([
+                Daily_sales(day=row['day'], name_medicine=row['name_medicine'], quantity=row['total'])
+                for row in totals
+            ])
+        return len(created)
+
+    @staticmethod
+    def catch_up(batch_size: int = CATCH_UP_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Fold register entries above the watermark into the rollup
+
+        Only the days touched by new entries are rebuilt, so a run costs
+        in proportion to what changed since the previous run.
+
+        Returns:
+            Dict with the number of entries scanned, days rebuilt and the new watermark
+        """
+        stats = {'entries': 0, 'days': 0, 'watermark': 0}
+        while True:
+            with transaction.atomic():
+                watermark, _ = Rollup_watermark.objects.select_for_update().get_or_create(
+                    name=SalesRollupService.WATERMARK
+                )
+                entries = list(
+                    Register_pharmacy.objects.nocache().filter(id__gt=watermark.last_id)
+                    .order_by('id')
+                    .values_list('id', 'date')[:batch_size]
+                )
+                if entries:
+                    days = {SalesRollupService.sale_day(moment) for _, moment in entries}
+                    SalesRollupService.recompute_days(days)
+                    watermark.last_id = entries[-1][0]
+                    watermark.save(update_fields=['last_id', 'updated_at'])
+                    stats['entries'] += len(entries)
+                    stats['days'] += len(days)
+                stats['watermark'] = watermark.last_id
+            if len(entries) < batch_size:
+                return stats
+
+    @staticmethod
+    def rebuild() -> Dict[str, int]:
+        """Drop every bucket and rebuild the rollup from the full register"""
+        with transaction.atomic():
+            Daily_sales.objects.all().delete()
+            Rollup_watermark.objects.filter(name=SalesRollupService.WATERMARK).update(last_id=0)
+        return SalesRollupService.catch_up()
+
+    @staticmethod
+    def totals(
+        period: str,
+        day_from: Optional[date] = None,
+        day_to: Optional[date] = None,
+        name_medicine: Optional[str] = None,
+        by_medicine: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Serve daily, weekly or monthly totals from the rollup table
+
+        Args:
+            period: 'day', 'week' or 'month'
+            day_from: First day included
+            day_to: Last day included
+            name_medicine: Restrict to one medicine
+            by_medicine: Group by medicine as well as by period
+
+        Returns:
+            List of {'period', ['name_medicine'], 'quantity'} dicts ordered by period
+        """
+        rows = Daily_sales.objects.all()
+        if day_from:
+            rows = rows.filter(day__gte=day_from)
+        if day_to:
+            rows = rows.filter(day__lte=day_to)
+        if name_medicine:
+            rows = rows.filter(name_medicine=name_medicine)
+
+        truncation = PERIOD_TRUNCATIONS[period]
+        rows = rows.annotate(period=truncation('day') if truncation else F('day'))
+        group_by = ['period', 'name_medicine'] if by_medicine else ['period']
+        return list(
+            rows.values(*group_by)
+            .annotate(quantity=Sum('quantity'))
+            .order_by(*group_by)
+        )
@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .utils import get_tenant_schema
+
+# Event streams and the shared, partitioned topic each one is multiplexed onto
+DEFAULT_EVENT_TOPICS = {
+    'medicine': 'pharmacy.medicine',
+    'sales': 'pharmacy.sales',
+    'user': 'pharmacy.user',
+    # Published by the auth service, consumed into the user directory
+    'directory': 'auth.users',
+}
+
+# shared: shared topics only; dual: shared and legacy per-tenant topics
+# while consumers move over; legacy: per-tenant topics only
+TOPIC_MODES = ('shared', 'dual', 'legacy')
+
+
+def event_topics() -> Dict[str, str]:
+    return {**DEFAULT_EVENT_TOPICS, **getattr(settings, 'EVENT_TOPICS', {})}
+
+
+def topic_mode() -> str:
+    mode = getattr(settings, 'EVENT_TOPIC_MODE', 'shared')
+    if mode not in TOPIC_MODES:
+        raise ValueError(f'EVENT_TOPIC_MODE must be one of {TOPIC_MODES}, not {mode!r}')
+    return mode
+
+
+def legacy_topic(stream: str, tenant: str) -> str:
+    """Pre-multiplexing per-tenant topic name, e.g. medicine_<schema>"""
+    return f'{stream}_{tenant}'
+
+
+def topics_for(stream: str, tenant: Optional[str] = None) -> List[str]:
+    """
+    Topics an event of a stream is published to
+
+    The tenant travels in the record key and the `tenant` header, so the
+    number of topics and partitions stays fixed as tenants are added.
+
+    Args:
+        stream: 'medicine', 'sales' or 'user'
+        tenant: Tenant schema (the active one by default)
+    """
+    mode = topic_mode()
+    topics = []
+    if mode != 'legacy':
+        topics.append(event_topics()[stream])
+    if mode != 'shared':
+        topics.append(legacy_topic(stream, tenant or get_tenant_schema()))
+    return topics
+
+
+def subscription_pattern(streams: Optional[List[str]] = None) -> str:
+    """
+    Regex of the topics a consumer of some streams subscribes to
+
+    In dual mode it matches both namings, so a consumer can be deployed
+    before producers switch and keeps reading the legacy topics until they
+    drain. Consumers dedupe, so events seen on both are handled once.
+    """
+    streams = streams or list(DEFAULT_EVENT_TOPICS)
+    mode = topic_mode()
+    alternatives = []
+    if mode != 'legacy':
+        topics = event_topics()
+        alternatives.extend(re.escape(topics[stream]) for stream in streams)
+    if mode != 'shared':
+        alternatives.append(f"(?:{'|'.join(map(re.escape, streams))})_.+")
+    return f"^(?:{'|'.join(alternatives)})$"
+
+
+def record_tenant(record) -> Optional[str]:
+    """Tenant of a record from its header, without decoding the value"""
+    for name, value in record.headers or ():
+        if name == 'tenant':
+            return value.decode('utf-8')
+    return None
@@ -1,16 +1,88 @@
 from rest_framework import serializers
 from .models import *
+from django.db import transaction
+from .invoice_services import InvoiceService
+from .utils import parse_price
 class Medicine_serializer(serializers.ModelSerializer):
     class Meta:
         model=Medicine
-        fields='__all__' 
+        exclude=('change_seq',)
+
+class Invoice_line_serializer(serializers.ModelSerializer):
+    class Meta:
+        model=Invoice_line
+        fields=('line_number','name_medicine','quantity','unit_price')
+        read_only_fields=('line_number',)
+        extra_kwargs={'quantity': {'min_value': 1}, 'unit_price': {'min_value': 0}}
 
 class Register_serializer(serializers.ModelSerializer):
+    """Invoice header with its lines; the invoice number is allocated server-side"""
+    lines=Invoice_line_serializer(many=True, required=False)
+
     class Meta:
         model=Register_Financial
-        fields='__all__'    
+        fields=('invoice','account','lines')
+        read_only_fields=('invoice',)
+
+    def create(self, validated_data):
+        return InvoiceService.create(validated_data['account'], validated_data.get('lines'))
+
+    def update(self, instance, validated_data):
+        lines = validated_data.pop('lines', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if lines is not None:
+                InvoiceService.replace_lines(instance, lines)
+        return instance
 
 class Register_pharmacy_serializer(serializers.ModelSerializer):
     class Meta:
         model=Register_pharmacy
         fields=('name_medicine','quantity','date')        
+
+    def validate(self, attrs):
+        if 'name_medicine' in attrs:
+            attrs['medicine_id'] = (
+                Medicine.objects.filter(name=attrs['name_medicine']).values_list('id', flat=True).first()
+            )
+        return attrs
+
+class Medicine_import_serializer(serializers.Serializer):
+    """Row-level validation for bulk catalog imports (no per-row DB lookups)"""
+    name=serializers.CharField(max_length=50)
+    quantity=serializers.IntegerField(min_value=0)
+    price=serializers.CharField(max_length=50)
+
+    def validate_price(self, value):
+        price = parse_price(value)
+        if price is None:
+            raise serializers.ValidationError('Not a valid price.')
+        return price
+
+class Medicine_lot_serializer(serializers.ModelSerializer):
+    class Meta:
+        model=Medicine_lot
+        fields=('id','medicine','lot_number','expiry_date','quantity','received_at')
+        read_only_fields=('id','medicine','received_at')
+        extra_kwargs={'quantity': {'min_value': 1}}
+
+class Medicine_price_serializer(serializers.ModelSerializer):
+    class Meta:
+        model=Medicine_price
+        fields=('id','medicine','price','effective_from')
+
+class Offline_sale_serializer(serializers.Serializer):
+    """One line of an offline POS sales log"""
+    key=serializers.CharField(max_length=64)
+    name=serializers.CharField(max_length=50)
+    quantity=serializers.IntegerField(min_value=1)
+    sold_at=serializers.DateTimeField()
+
+class Offline_sales_batch_serializer(serializers.Serializer):
+    device_id=serializers.CharField(max_length=64, required=False, allow_blank=True, default='')
+    sales=Offline_sale_serializer(many=True, allow_empty=False)
+
+class Directory_user_serializer(serializers.ModelSerializer):
+    class Meta:
+        model=Directory_user
+        exclude=('id',)
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after commit when a medicine's stock crosses its reorder level.
+# Receives: medicine_id, name, quantity, reorder_level,
+# state ('low' when it drops to the level, 'restocked' when it rises above it)
+stock_threshold_crossed = Signal()
@@ -0,0 +1,118 @@
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F
+
+from .alert_services import StockAlertService
+from .inventory_services import CatalogVersionService, InventoryCacheService
+from .lot_services import LotService
+from .models import Medicine, Medicine_lot
+from .outbox_services import OutboxService
+
+
+class InsufficientStock(Exception):
+    """Raised when a sale would take a medicine's quantity below zero"""
+
+
+class LotTrackedQuantity(Exception):
+    """Raised when a lot-tracked medicine's quantity would change without its lots"""
+
+
+class StockService:
+    """Single entry point for stock mutations so side effects stay consistent"""
+
+    @staticmethod
+    def sell(name: str, quantity: int = 1) -> Medicine:
+        """
+        Decrease a medicine's stock with a conditional update
+
+        Args:
+            name: Medicine name
+            quantity: Units sold
+
+        Returns:
+            The medicine with its new quantity; `item.allocations` lists the
+            lots the units were drawn from in first-expiry-first-out order
+
+        Raises:
+            Medicine.DoesNotExist: If no medicine has this name
+            InsufficientStock: If fewer than `quantity` units are in stock,
+                or the medicine is lot-tracked and its unexpired lots fall short
+        """
+        with transaction.atomic():
+            updated = Medicine.objects.filter(name=name, quantity__gte=quantity).update(
+                quantity=F('quantity') - quantity
+            )
+            if not updated:
+                if not Medicine.objects.filter(name=name).exists():
+                    raise Medicine.DoesNotExist(name)
+                raise InsufficientStock(name)
+            item = Medicine.objects.nocache().get(name=name)
+            allocations, shortfall = LotService.allocate(item.id, quantity)
+            # Medicines that never had lots keep selling from the untracked aggregate
+            if shortfall and (allocations or LotService.has_lots(item.id)):
+                raise InsufficientStock(name)
+            StockService.stock_changed([item.id], deltas={item.id: -quantity})
+        item.allocations = allocations
+        return item
+
+    @staticmethod
+    def receive(medicine_id: int, lot_number: str, expiry_date: date, quantity: int) -> Medicine_lot:
+        """
+        Receive stock into a lot and add it to the medicine's aggregate quantity
+
+        Raises:
+            Medicine.DoesNotExist: If the medicine does not exist
+            ValueError: If the lot exists with a different expiry date
+        """
+        with transaction.atomic():
+            updated = Medicine.objects.filter(id=medicine_id).update(quantity=F('quantity') + quantity)
+            if not updated:
+                raise Medicine.DoesNotExist(medicine_id)
+            lot = LotService.receive(medicine_id, lot_number, expiry_date, quantity)
+            StockService.stock_changed([medicine_id], deltas={medicine_id: quantity})
+        return lot
+
+    @staticmethod
+    def adjust(medicine_id: int, delta: int):
+        """
+        Book a manual quantity change against the medicine's lots
+
+        A lot-tracked medicine's quantity only moves with its lots: a
+        decrease is written off its first-expiring stocked lots, expired
+        ones included, and an increase has to be received into a lot.
+        Medicines that never had lots pass unchanged. Must run inside the
+        transaction that changes Medicine.quantity.
+
+        Raises:
+            LotTrackedQuantity: If the change cannot be booked against the lots
+        """
+        if delta > 0 and LotService.has_lots(medicine_id):
+            raise LotTrackedQuantity('Stock of a lot-tracked medicine is added by receiving it into a lot.')
+        if delta < 0:
+            allocations, shortfall = LotService.allocate(medicine_id, -delta, include_expired=True)
+            if shortfall and (allocations or LotService.has_lots(medicine_id)):
+                raise LotTrackedQuantity(f'Lots of this medicine hold {-delta - shortfall} of the {-delta} units to write off.')
+
+    @staticmethod
+    def stock_changed(medicine_ids: Iterable[int], deltas: Optional[Dict[int, int]] = None):
+        """
+        Hook for every path that changes quantity or reorder level
+
+        Call it inside the mutating transaction: the outbox events it
+        writes must commit or roll back with the change.
+
+        Args:
+            medicine_ids: Ids of the medicines that changed
+            deltas: Quantity change per medicine when that is the only change,
+                applied to cached stock in place; other changes evict it
+        """
+        medicine_ids = list(medicine_ids)
+        StockAlertService.touch(medicine_ids)
+        CatalogVersionService.bump()
+        OutboxService.stock_changed(medicine_ids)
+        if deltas is not None:
+            InventoryCacheService.adjust(deltas)
+        else:
+            InventoryCacheService.evict(medicine_ids)
@@ -0,0 +1,89 @@
+from typing import Any, Dict
+
+from django.db import connection
+
+from .models import Medicine, Medicine_tombstone
+
+
+class SyncService:
+    """
+    Delta sync of the medicine catalog for POS clients
+
+    Rows and tombstones carry the id of the transaction that last wrote
+    them (change_seq). A client passes back the cursor it was given and
+    receives only what changed since, read through the (change_seq, id)
+    indexes, so sync cost follows the number of changes rather than the
+    catalog size.
+
+    Transaction ids are assigned at first write but become visible at
+    commit, possibly out of order. Only rows older than the oldest
+    transaction still in progress (the snapshot horizon) are served, as
+    everything below it is already committed and cannot be skipped by a
+    cursor moving past it; newer rows follow once the horizon passes them.
+    """
+
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+
+    @staticmethod
+    def changes(since: int = 0, after: int = 0, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        Medicines inserted, updated or deleted since a cursor
+
+        Args:
+            since: change_seq of the cursor (0 for a full sync)
+            after: Medicine id within `since` to resume after, when paging
+            limit: Maximum changes returned
+
+        Returns:
+            Dict with changed rows, deleted ids and names, has_more and
+            the next_since/next_after cursor to send back
+        """
+        medicines = Medicine._meta.db_table
+        price_column = Medicine._meta.get_field('price').column
+        tombstones = Medicine_tombstone._meta.db_table
+        with connection.cursor() as cursor:
+            # Read the horizon before the rows so everything below it is visible to them
+            cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+            horizon = cursor.fetchone()[0]
+            cursor.execute(
+                f'(SELECT id, name, quantity, {price_column}, reorder_level, change_seq, false AS deleted '
+                f' FROM {medicines} WHERE (change_seq, id) > (%s, %s) AND change_seq < %s '
+                f' ORDER BY change_seq, id LIMIT %s) '
+                f'UNION ALL '
+                f'(SELECT medicine_id, name, NULL, NULL, NULL, change_seq, true '
+                f' FROM {tombstones} WHERE (change_seq, medicine_id) > (%s, %s) AND change_seq < %s '
+                f' ORDER BY change_seq, medicine_id LIMIT %s) '
+                f'ORDER BY change_seq, id LIMIT %s',
+                [since, after, horizon, limit + 1, since, after, horizon, limit + 1, limit + 1]
+            )
+            rows = cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changed, deleted = [], []
+        for pk, name, quantity, price, reorder_level, change_seq, is_deleted in rows:
+            if is_deleted:
+                deleted.append({'id': pk, 'name': name, 'change_seq': change_seq})
+            else:
+                changed.append({
+                    'id': pk,
+                    'name': name,
+                    'quantity': quantity,
+                    'price': price,
+                    'reorder_level': reorder_level,
+                    'change_seq': change_seq,
+                })
+
+        if has_more:
+            next_since, next_after = rows[-1][5], rows[-1][0]
+        else:
+            # Caught up to the horizon; the next rows to commit are at or above it
+            next_since, next_after = max(horizon, since), 0
+        return {
+            'changes': changed,
+            'deleted': deleted,
+            'has_more': has_more,
+            'next_since': next_since,
+            'next_after': next_after,
+        }
@@ -1,3 +1,811 @@
-from django.test import TestCase
+import io
+import threading
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import PROTECT, ProtectedError, Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.views.decorators.http import condition
+
+from rest_framework.test import APIRequestFactory
+
+from .auth_client import AuthServiceUnavailable, TokenIntrospectionClient
+from .cache_services import invalidate_rows
+from .codec import encode
+from .consumer import ConsumerWorker, IdempotencyStore
+from .directory_services import DirectoryService
+from .forecast_services import DemandForecastService
+from .import_services import MedicineImportService
+from .inventory_services import catalog_etag
+from .lot_services import FefoHeapCache, LotService
+from .middleware import BearerTokenMiddleware, TenantMiddleware
+from .models import Medicine, Medicine_price, Register_pharmacy
+from .outbox_services import OutboxService
+from .pagination import KeysetPagination
+from .price_services import unit_price_at_sale
+from .replay_services import OfflineSaleService
+from .stock_services import LotTrackedQuantity, StockService
+from .rollup_services import SalesRollupService
+from .serializer import Register_pharmacy_serializer
+from .views import MedicineDetailView, MedicineForecastView, MedicineValuationView
+
+
+@override_settings(AUTH_EXEMPT_PATHS=('/admin/',))
+class BearerTokenMiddlewareTests(SimpleTestCase):
+    """Bearer tokens are checked against the tenant TenantMiddleware resolved"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = BearerTokenMiddleware(lambda request: HttpResponse('ok'))
+        patcher = mock.patch('pharmacies.auth_client.token_client.introspect')
+        self.introspect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, schema_name='pharmacy1', token='abc'):
+        request = self.factory.get('/api/medicines/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        request.tenant = SimpleNamespace(schema_name=schema_name) if schema_name else None
+        return request
+
+    def test_runs_after_tenant_middleware(self):
+        middleware = list(settings.MIDDLEWARE)
+        self.assertLess(
+            middleware.index('pharmacies.middleware.TenantMiddleware'),
+            middleware.index('pharmacies.middleware.BearerTokenMiddleware')
+        )
+
+    def test_accepts_a_token_of_the_request_tenant(self):
+        self.introspect.return_value = {'user_id': 1, 'username': 'ana', 'tenant': 'pharmacy1'}
+        request = self.request()
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.auth_claims['user_id'], 1)
+        self.introspect.assert_called_once_with('abc', 'pharmacy1')
+
+    def test_rejects_a_token_of_another_tenant(self):
+        self.introspect.return_value = {'user_id': 1, 'tenant': 'pharmacy2'}
+        self.assertEqual(self.middleware(self.request()).status_code, 403)
+
+    def test_rejects_a_tenant_token_on_an_unknown_host(self):
+        self.introspect.return_value = {'user_id': 1, 'tenant': 'pharmacy1'}
+        self.assertEqual(self.middleware(self.request(schema_name=None)).status_code, 403)
+        self.introspect.assert_not_called()
+
+    def test_rejects_an_invalid_token(self):
+        self.introspect.return_value = None
+        self.assertEqual(self.middleware(self.request()).status_code, 401)
+
+    def test_requires_a_bearer_token(self):
+        request = self.factory.get('/api/medicines/')
+        self.assertEqual(self.middleware(request).status_code, 401)
+        self.introspect.assert_not_called()
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class TenantMiddlewareTests(SimpleTestCase):
+    """The connection follows the request host, falling back to public for unknown hosts"""
+
+    def resolve(self, found):
+        Tenant = mock.Mock(DoesNotExist=type('DoesNotExist', (Exception,), {}))
+        if found is None:
+            Tenant.objects.get.side_effect = Tenant.DoesNotExist
+        else:
+            Tenant.objects.get.return_value = found
+        request = RequestFactory().get('/admin/', HTTP_HOST='pharmacy1.example.com:8000')
+        with mock.patch('pharmacies.middleware.get_tenant_model', return_value=Tenant), \
+                mock.patch('pharmacies.middleware.connection') as connection:
+            TenantMiddleware(lambda request: HttpResponse('ok')).process_request(request)
+        Tenant.objects.get.assert_called_once_with(domain_url='pharmacy1.example.com')
+        return request, connection
+
+    def test_binds_the_connection_to_the_tenant(self):
+        tenant = SimpleNamespace(schema_name='pharmacy1')
+        request, connection = self.resolve(tenant)
+        self.assertIs(request.tenant, tenant)
+        connection.set_tenant.assert_called_once_with(tenant)
+
+    def test_unknown_host_resets_to_the_public_schema(self):
+        request, connection = self.resolve(None)
+        self.assertIsNone(request.tenant)
+        connection.set_schema_to_public.assert_called_once_with()
+        connection.set_tenant.assert_not_called()
+
+
+FORECAST_RESULT = {'items': [{'name': 'Aspirin', 'needs_reorder': True}]}
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DemandForecastCacheTests(SimpleTestCase):
+    """The nightly warm-up and the forecast endpoint share cache entries"""
+
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch('pharmacies.forecast_services.get_tenant_schema', return_value='pharmacy1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_int_and_float_parameters_share_a_key(self):
+        self.assertEqual(
+            DemandForecastService.cache_key({'lead_time': 7, 'review_period': 7, 'window': 28}),
+            DemandForecastService.cache_key({'lead_time': 7.0, 'review_period': 7.0, 'window': 28})
+        )
+
+    def test_view_is_served_from_the_warmed_entry(self):
+        from django.core.management import call_command
+
+        with mock.patch.object(DemandForecastService, 'forecast', return_value=FORECAST_RESULT) as forecast, \
+                mock.patch('pharmacies.management.commands.forecast_reorder.get_tenant_schemas', return_value=['pharmacy1']), \
+                mock.patch('pharmacies.management.commands.forecast_reorder.schema_context'):
+            call_command('forecast_reorder', stdout=mock.Mock())
+            self.assertEqual(forecast.call_count, 1)
+
+            response = MedicineForecastView.as_view()(APIRequestFactory().get('/api/medicines/forecast/'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(forecast.call_count, 1)
+
+
+class MedicineForecastViewTests(SimpleTestCase):
+    """Out-of-range forecast parameters are rejected before anything is computed"""
+
+    def get(self, **params):
+        return MedicineForecastView.as_view()(APIRequestFactory().get('/api/medicines/forecast/', params))
+
+    def test_rejects_out_of_range_parameters(self):
+        invalid = [
+            {'window': '0'},
+            {'window': '-3'},
+            {'lead_time': '-1'},
+            {'review_period': '-1'},
+            {'lead_time': 'nan'},
+            {'service_level': '0'},
+            {'service_level': '1'},
+            {'alpha': '0'},
+            {'alpha': '1.5'},
+            {'limit': '-1'},
+            {'method': 'arima'},
+            {'window': 'abc'},
+        ]
+        with mock.patch.object(DemandForecastService, 'get_cached_or_compute') as compute:
+            for params in invalid:
+                with self.subTest(params=params):
+                    self.assertEqual(self.get(**params).status_code, 400)
+            compute.assert_not_called()
+
+    def test_accepts_valid_parameters(self):
+        with mock.patch.object(DemandForecastService, 'get_cached_or_compute', return_value=FORECAST_RESULT):
+            response = self.get(window='14', lead_time='3.5', service_level='0.9', alpha='1', limit='5')
+        self.assertEqual(response.status_code, 200)
+
+
+class MedicineValuationViewTests(SimpleTestCase):
+    """The top-value report only accepts a positive limit"""
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/medicines/valuation/top/', params)
+        return MedicineValuationView.as_view()(request, report='top')
+
+    def test_rejects_a_non_positive_or_garbage_limit(self):
+        with mock.patch('pharmacies.views.InventoryValuationService.top_value') as top_value:
+            for limit in ('-5', '0', 'ten'):
+                with self.subTest(limit=limit):
+                    self.assertEqual(self.get(limit=limit).status_code, 400)
+            top_value.assert_not_called()
+
+    def test_clamps_a_large_limit(self):
+        with mock.patch('pharmacies.views.InventoryValuationService.top_value', return_value=[]) as top_value:
+            self.assertEqual(self.get(limit='5000').status_code, 200)
+        top_value.assert_called_once_with(1000)
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """IdempotencyStore kept in a set instead of Redis"""
+
+    def __init__(self):
+        super().__init__('test')
+        self.handled = set()
+
+    def seen(self, msg_ids):
+        return [msg_id in self.handled for msg_id in msg_ids]
+
+    def mark(self, msg_ids):
+        self.handled.update(msg_ids)
+
+
+@override_settings(EVENT_TOPIC_MODE='shared')
+class DirectoryEventReplayTests(SimpleTestCase):
+    """A replayed directory event is handled once"""
+
+    EVENT = {
+        'event': 'profile.updated',
+        'tenant': 'pharmacy1',
+        'entity': 'user',
+        'id': 7,
+        'occurred_at': '2026-10-01T08:00:00+00:00',
+        'data': {'id': 7, 'username': 'ana', 'email': 'ana@example.com', 'is_active': True},
+    }
+
+    def record(self, offset, value=None):
+        return SimpleNamespace(
+            topic='auth.users', partition=0, offset=offset, key=b'pharmacy1:user:7',
+            value=value or encode(self.EVENT), headers=[('tenant', b'pharmacy1')]
+        )
+
+    def setUp(self):
+        patcher = mock.patch('pharmacies.consumer.schema_context')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.handler = mock.Mock()
+        self.worker = ConsumerWorker(handlers={'profile.updated': self.handler}, store=MemoryIdempotencyStore())
+
+    def test_replay_of_the_same_event_is_a_no_op(self):
+        self.assertEqual(self.worker._process_partition('p0', [self.record(10)]), (10, None))
+        # Redelivered by the relay after a lost ack, at a later offset
+        self.assertEqual(self.worker._process_partition('p0', [self.record(11)]), (11, None))
+        self.handler.assert_called_once()
+        self.assertEqual(self.worker.metrics()['handled'], 1)
+        self.assertEqual(self.worker.metrics()['duplicates'], 1)
+
+    def test_a_changed_event_is_handled(self):
+        changed = encode({**self.EVENT, 'data': {**self.EVENT['data'], 'email': 'new@example.com'}})
+        self.worker._process_partition('p0', [self.record(10), self.record(11, changed)])
+        self.assertEqual(self.handler.call_count, 2)
+
+    def test_a_tenant_created_a_moment_ago_is_known_at_once(self):
+        with mock.patch.object(DirectoryService, '_tenants', set()), \
+                mock.patch('pharmacies.directory_services.get_tenant_model') as get_tenant_model:
+            exists = get_tenant_model.return_value.objects.filter.return_value.exists
+            exists.return_value = False
+            self.assertFalse(DirectoryService.known_tenant('pharmacy9'))
+            exists.return_value = True
+            self.assertTrue(DirectoryService.known_tenant('pharmacy9'))
+            self.assertTrue(DirectoryService.known_tenant('pharmacy9'))
+        self.assertEqual(exists.call_count, 2)
+        get_tenant_model.return_value.objects.filter.assert_called_with(schema_name='pharmacy9')
+
+    def test_upsert_leaves_identical_rows_untouched(self):
+        cursor = mock.MagicMock()
+        with mock.patch('pharmacies.directory_services.connection') as connection:
+            connection.cursor.return_value.__enter__.return_value = cursor
+            DirectoryService.apply([self.EVENT, self.EVENT])
+        sql, params = cursor.execute.call_args.args
+        self.assertIn('source_updated_at <= EXCLUDED.source_updated_at', sql)
+        self.assertIn('IS DISTINCT FROM', sql)
+        # Both copies collapse into one row
+        self.assertEqual(params[0], 7)
+        self.assertEqual(params.count(7), 1)
+
+
+class SalesRollupLockTests(SimpleTestCase):
+    """Rollup rebuilds and inline upserts exclude each other per day, not per table"""
+
+    def locked(self, days, shared):
+        cursor = mock.MagicMock()
+        with mock.patch('pharmacies.rollup_services.connection') as connection, \
+                mock.patch('pharmacies.rollup_services.get_tenant_schema', return_value='pharmacy1'):
+            connection.cursor.return_value.__enter__.return_value = cursor
+            SalesRollupService.lock_days(days, shared=shared)
+        return [call.args for call in cursor.execute.call_args_list]
+
+    def test_rebuild_locks_each_day_exclusively_in_date_order(self):
+        calls = self.locked([date(2026, 10, 2), date(2026, 10, 1), date(2026, 10, 2)], shared=False)
+        self.assertEqual(
+            calls,
+            [
+                ('SELECT pg_advisory_xact_lock(hashtext(%s), %s)', ['pharmacies_daily_sales:pharmacy1', date(2026, 10, 1).toordinal()]),
+                ('SELECT pg_advisory_xact_lock(hashtext(%s), %s)', ['pharmacies_daily_sales:pharmacy1', date(2026, 10, 2).toordinal()]),
+            ]
+        )
+        self.assertFalse(any('LOCK TABLE' in sql for sql, _ in calls))
+
+    def test_inline_upserts_take_shared_day_locks(self):
+        calls = self.locked([date(2026, 10, 1)], shared=True)
+        self.assertEqual(calls[0][0], 'SELECT pg_advisory_xact_lock_shared(hashtext(%s), %s)')
+
+
+class MedicinePriceMigrationTests(SimpleTestCase):
+    """The price backfill parses legacy text and resumes from rows still missing a decimal"""
+
+    expand = import_module('pharmacies.migrations.0007_medicine_price_decimal')
+    contract = import_module('pharmacies.management.commands.drop_legacy_price')
+
+    def test_parse_price_formats(self):
+        parse = self.expand.parse_price
+        self.assertEqual(parse('$1,234.50'), Decimal('1234.50'))
+        self.assertEqual(parse('1.234,5'), Decimal('1234.50'))
+        self.assertEqual(parse('12,99'), Decimal('12.99'))
+        self.assertEqual(parse('1,000'), Decimal('1000.00'))
+        self.assertEqual(parse('0.005'), Decimal('0.01'))
+        self.assertIsNone(parse('n/a'))
+        self.assertIsNone(parse('-3'))
+        self.assertIsNone(parse(None))
+
+    def test_expand_backfills_in_batches_of_rows_without_a_decimal(self):
+        batches = [
+            [SimpleNamespace(id=1, price='10,50'), SimpleNamespace(id=2, price='oops')],
+            [SimpleNamespace(id=5, price='3')],
+            [],
+        ]
+        Medicine = mock.MagicMock()
+        queryset = Medicine.objects.using.return_value.select_for_update.return_value
+        queryset.filter.return_value.order_by.return_value.only.return_value.__getitem__.side_effect = batches
+        apps = mock.Mock(get_model=mock.Mock(return_value=Medicine))
+        schema_editor = mock.Mock(connection=mock.Mock(alias='default'))
+
+        with mock.patch.object(self.expand.transaction, 'atomic'):
+            self.expand.backfill_price_amount(apps, schema_editor)
+
+        self.assertEqual(
+            [call.kwargs for call in queryset.filter.call_args_list],
+            [
+                {'id__gt': 0, 'price_amount__isnull': True},
+                {'id__gt': 2, 'price_amount__isnull': True},
+                {'id__gt': 5, 'price_amount__isnull': True},
+            ]
+        )
+        updated = [item for call in Medicine.objects.using.return_value.bulk_update.call_args_list for item in call.args[0]]
+        self.assertEqual([item.price_amount for item in updated], [Decimal('10.50'), None, Decimal('3.00')])
+
+    def test_expand_keeps_the_legacy_column_in_step(self):
+        self.assertIn('NEW.price := NEW.price_amount::text', self.expand.CREATE_DUAL_WRITE)
+        self.assertIn('NEW.price_amount := round(btrim(NEW.price)::numeric, 2)', self.expand.CREATE_DUAL_WRITE)
+        migration_sql = [getattr(operation, 'sql', '') for operation in self.expand.Migration.operations]
+        self.assertIn(self.expand.CREATE_DUAL_WRITE, migration_sql)
+
+    def test_no_migration_drops_the_legacy_column(self):
+        from django.db.migrations.loader import MigrationLoader
+
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        for key, migration in loader.disk_migrations.items():
+            if key[0] != 'pharmacies':
+                continue
+            for operation in migration.operations:
+                self.assertNotIn('DROP COLUMN IF EXISTS price', str(getattr(operation, 'sql', '')), key)
+
+    def test_contract_catches_up_on_legacy_writes(self):
+        cursor = mock.MagicMock()
+        cursor.fetchall.side_effect = [[(4, '7,25'), (9, 'bad')], []]
+        with mock.patch.object(self.contract, 'connection') as connection, \
+                mock.patch.object(self.contract.transaction, 'atomic'):
+            connection.cursor.return_value.__enter__.return_value = cursor
+            self.assertEqual(self.contract.backfill_rollout_prices(batch_size=2), 1)
+
+        sql, params = cursor.execute.call_args_list[1].args
+        self.assertIn('m.price_amount IS NULL', sql)
+        self.assertEqual(params, [4, Decimal('7.25')])
+        self.assertEqual(cursor.execute.call_args_list[2].args[1], [9, 2])
+
+    def test_contract_command_skips_contracted_schemas(self):
+        from django.core.management import call_command
+
+        with mock.patch.object(self.contract, 'schema_context'), \
+                mock.patch.object(self.contract, 'get_tenant_schemas', return_value=['pharmacy1', 'pharmacy2']), \
+                mock.patch.object(self.contract, 'has_legacy_column', side_effect=[True, False]), \
+                mock.patch.object(self.contract, 'backfill_rollout_prices', return_value=3) as backfill, \
+                mock.patch.object(self.contract, 'drop_legacy_column') as drop:
+            call_command('drop_legacy_price', stdout=io.StringIO())
+        backfill.assert_called_once_with(2000)
+        drop.assert_called_once_with()
+
+
+class FefoHeapCacheTests(SimpleTestCase):
+    """Cached heaps never serve a lot past its expiry date, however long they were cached"""
+
+    today = date(2026, 10, 19)
+    heap = [
+        (date(2026, 10, 18), 1, 'A', 5),
+        (date(2026, 10, 19), 2, 'B', 5),
+        (date(2026, 11, 1), 3, 'C', 5),
+        (date(2026, 12, 1), 4, 'D', 5),
+    ]
+
+    def test_read_drops_lots_expired_since_the_heap_was_loaded(self):
+        cache = FefoHeapCache()
+        cache.put('k', list(self.heap))
+        self.assertEqual([lot_id for _, lot_id, _, _ in cache.get('k', self.today)], [3, 4])
+        self.assertEqual(len(cache.get('k', date(2026, 10, 1))), 2)
+
+    def test_allocations_match_after_expired_lots_are_skipped(self):
+        cache = FefoHeapCache()
+        cache.put('k', list(self.heap))
+        cache.apply_allocations('k', [(3, 'C', date(2026, 11, 1), 2)], self.today)
+        self.assertEqual(cache.get('k', self.today), [(date(2026, 11, 1), 3, 'C', 3), (date(2026, 12, 1), 4, 'D', 5)])
+
+    def test_fefo_queue_and_allocate_share_the_expiry_cutoff(self):
+        cache = FefoHeapCache()
+        cache.put(('pharmacy1', 7), list(self.heap))
+        with mock.patch('pharmacies.lot_services.fefo_heaps', cache), \
+                mock.patch('pharmacies.lot_services.get_tenant_schema', return_value='pharmacy1'), \
+                mock.patch('pharmacies.lot_services.timezone.localdate', return_value=self.today):
+            queue = LotService.fefo_queue(7)
+        self.assertEqual([lot_id for _, lot_id, _, _ in queue], [3, 4])
+        self.assertEqual(LotService.sellable(self.today), Q(quantity__gt=0, expiry_date__gt=self.today))
+
+
+class UnitPriceAtSaleTests(SimpleTestCase):
+    """Sales are priced by the register row's medicine id, not by its name"""
+
+    def test_subquery_correlates_on_medicine_id_without_a_join(self):
+        query = unit_price_at_sale().query
+        lookup = query.where.children[0]
+        self.assertEqual(lookup.lhs.target.attname, 'medicine_id')
+        self.assertEqual(lookup.rhs.name, 'medicine_id')
+        self.assertEqual(list(query.alias_map), ['pharmacies_medicine_price'])
+
+    def test_history_protects_the_medicine(self):
+        for model in (Medicine_price, Register_pharmacy):
+            with self.subTest(model=model.__name__):
+                self.assertIs(model._meta.get_field('medicine').remote_field.on_delete, PROTECT)
+
+    def test_deleting_a_medicine_with_history_is_a_conflict(self):
+        view = MedicineDetailView.as_view()
+        with mock.patch.object(MedicineDetailView, 'get_object'), \
+                mock.patch.object(MedicineDetailView, 'perform_destroy', side_effect=ProtectedError('history', set())):
+            response = view(APIRequestFactory().delete('/api/medicines/1/'), id=1)
+        self.assertEqual(response.status_code, 409)
+
+    def test_register_writes_resolve_the_medicine(self):
+        with mock.patch('pharmacies.serializer.Medicine') as Medicine:
+            Medicine.objects.filter.return_value.values_list.return_value.first.return_value = 12
+            serializer = Register_pharmacy_serializer(data={'name_medicine': 'Aspirin', 'quantity': 2})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        Medicine.objects.filter.assert_called_once_with(name='Aspirin')
+        self.assertEqual(serializer.validated_data['medicine_id'], 12)
+
+
+class MedicineImportTests(SimpleTestCase):
+    """Chunks are validated row by row, then COPYed and merged with one upsert"""
+
+    def test_invalid_rows_are_reported_and_the_rest_loaded(self):
+        stream = io.StringIO('name,quantity,price\nAspirin,10,"1,50"\nIbuprofen,-1,2\nAspirin,12,1.75\nParacetamol,3,abc\n')
+        with mock.patch.object(MedicineImportService, '_load_chunk', return_value=(1, 0, [])) as load:
+            report = MedicineImportService.import_stream(stream, 'csv', chunk_size=10)
+        rows = load.call_args.args[0]
+        # Last occurrence of a duplicate name wins
+        self.assertEqual([(line, data['quantity'], data['price']) for line, data in rows], [(4, 12, Decimal('1.75'))])
+        self.assertEqual([error['line'] for error in report['errors']], [3, 5])
+        self.assertEqual((report['processed'], report['inserted'], report['failed']), (4, 1, 2))
+
+    def test_chunk_is_copied_and_upserted_in_one_statement(self):
+        cursor = mock.MagicMock()
+        cursor.fetchall.return_value = [
+            (2, True, True, 1, 'Aspirin', 10, Decimal('1.50'), 0, 41, None, None, None, None, None, None),
+            (3, False, False, 2, 'Ibuprofen', 4, Decimal('2.00'), 0, 42, 2, 'Ibuprofen', 9, Decimal('2.00'), 0, 17),
+            # Lot-tracked: the CASE kept its quantity
+            (4, False, True, 3, 'Insulin', 6, Decimal('9.00'), 0, 43, 3, 'Insulin', 6, Decimal('8.00'), 0, 18),
+        ]
+        with mock.patch('pharmacies.import_services.connection') as connection, \
+                mock.patch('pharmacies.import_services.transaction'), \
+                mock.patch('pharmacies.import_services.PriceHistoryService') as prices, \
+                mock.patch('pharmacies.import_services.StockService') as stock, \
+                mock.patch('pharmacies.import_services.invalidate_rows') as invalidate_rows:
+            connection.cursor.return_value.__enter__.return_value = cursor
+            inserted, updated, kept = MedicineImportService._load_chunk([
+                (2, {'name': 'Aspirin', 'quantity': 10, 'price': Decimal('1.50')}),
+                (3, {'name': 'Ibuprofen', 'quantity': 4, 'price': Decimal('2.00')}),
+                (4, {'name': 'Insulin', 'quantity': 50, 'price': Decimal('9.00')}),
+            ])
+
+        self.assertEqual((inserted, updated, kept), (1, 2, [4]))
+        copy_sql, buffer = cursor.copy_expert.call_args.args
+        self.assertIn('FROM STDIN', copy_sql)
+        self.assertEqual(buffer.getvalue().splitlines(), ['2,Aspirin,10,1.50', '3,Ibuprofen,4,2.00', '4,Insulin,50,9.00'])
+        upsert_sql = cursor.execute.call_args_list[-1].args[0]
+        self.assertIn('ON CONFLICT (name) DO UPDATE', upsert_sql)
+        self.assertIn('price_amount = EXCLUDED.price_amount', upsert_sql)
+        self.assertIn('WHEN EXISTS (SELECT 1 FROM pharmacies_medicine_lot l', upsert_sql)
+        # Only the rows whose price changed get a history entry
+        self.assertEqual(list(prices.record.call_args.args[0]), [(1, Decimal('1.50')), (3, Decimal('9.00'))])
+        stock.stock_changed.assert_called_once_with([1, 2, 3])
+        # Cached queries are dropped for the new rows and the replaced ones only
+        model, rows = invalidate_rows.call_args.args
+        self.assertIs(model, Medicine)
+        self.assertEqual(
+            [(row['id'], row['quantity'], row['change_seq']) for row in rows],
+            [(1, 10, 41), (2, 4, 42), (3, 6, 43), (2, 9, 17), (3, 6, 18)]
+        )
+
+
+class OutboxRelayTests(SimpleTestCase):
+    """Relays claim rows with SKIP LOCKED and only mark the delivered prefix"""
+
+    def future(self, failed=False):
+        return mock.Mock(is_done=True, failed=mock.Mock(return_value=failed))
+
+    def test_marks_events_up_to_the_first_failure(self):
+        events = [
+            SimpleNamespace(id=pk, topic='pharmacy.medicine', key=f'medicine:{pk}', event_type='medicine.updated', payload={'tenant': 'pharmacy1'})
+            for pk in (1, 2, 3)
+        ]
+        with mock.patch('pharmacies.outbox_services.Outbox_event') as Outbox_event, \
+                mock.patch('pharmacies.outbox_services.publisher') as publisher, \
+                mock.patch('pharmacies.outbox_services.transaction'), \
+                mock.patch('pharmacies.outbox_services.codec'), \
+                mock.patch('pharmacies.outbox_services.event_headers'):
+            claimed = Outbox_event.objects.select_for_update.return_value.filter.return_value.order_by.return_value
+            claimed.__getitem__.return_value = events
+            publisher.send.side_effect = [self.future(), self.future(failed=True), self.future()]
+            stats = OutboxService.relay_batch(batch_size=3)
+
+        Outbox_event.objects.select_for_update.assert_called_once_with(skip_locked=True)
+        claimed.__getitem__.assert_called_once_with(slice(None, 3))
+        self.assertEqual(Outbox_event.objects.filter.call_args.kwargs, {'id__in': [1]})
+        self.assertEqual(stats, {'published': 1, 'failed': 2})
+
+    def test_relay_stops_on_an_empty_outbox(self):
+        with mock.patch.object(OutboxService, 'relay_batch', side_effect=[
+            {'published': 2, 'failed': 0}, {'published': 0, 'failed': 0},
+        ]) as relay_batch:
+            self.assertEqual(OutboxService.relay(batch_size=2), {'published': 2, 'failed': 0, 'batches': 1})
+        self.assertEqual(relay_batch.call_count, 2)
+
+
+class CatalogEtagTests(SimpleTestCase):
+    """Medicine reads revalidate against the tenant catalog version"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = condition(etag_func=catalog_etag)(lambda request, **kwargs: HttpResponse('catalog'))
+        for target, value in (('CatalogVersionService.current', 42), ('get_tenant_schema', 'pharmacy1')):
+            patcher = mock.patch(f'pharmacies.inventory_services.{target}', return_value=value)
+            setattr(self, target.split('.')[-1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_unchanged_catalog_answers_not_modified(self):
+        response = self.view(self.factory.get('/api/medicines/', {'ordering': 'price'}))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        again = self.view(self.factory.get('/api/medicines/', {'ordering': 'price'}, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(again.status_code, 304)
+
+    def test_version_query_and_target_change_the_etag(self):
+        request = self.factory.get('/api/medicines/', {'ordering': 'price'})
+        etag = catalog_etag(request, id=1)
+        self.assertTrue(etag.startswith('pharmacy1-42-'))
+        self.assertNotEqual(etag, catalog_etag(request, id=2))
+        self.assertNotEqual(etag, catalog_etag(self.factory.get('/api/medicines/'), id=1))
+        self.current.return_value = 43
+        self.assertNotEqual(etag, catalog_etag(request, id=1))
+
+    def test_no_etag_without_a_version(self):
+        self.current.return_value = None
+        response = self.view(self.factory.get('/api/medicines/', HTTP_IF_NONE_MATCH='"anything"'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    """Pages continue strictly after the last (field, id) pair through an opaque cursor"""
+
+    pagination = KeysetPagination(field='date')
+
+    def test_cursor_round_trip(self):
+        at = datetime(2026, 10, 19, 8, 30, tzinfo=timezone.utc)
+        self.assertEqual(self.pagination.decode_cursor(self.pagination.encode_cursor(at, 7)), (at, 7))
+        for garbage in ('not-a-cursor', self.pagination.encode_cursor('yesterday', 1)):
+            with self.assertRaises(ValueError):
+                self.pagination.decode_cursor(garbage)
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(self.pagination.get_limit(None), KeysetPagination.default_limit)
+        self.assertEqual(self.pagination.get_limit('5000'), KeysetPagination.max_limit)
+        for bad in ('0', 'ten'):
+            with self.assertRaises(ValueError):
+                self.pagination.get_limit(bad)
+
+    def test_page_seeks_past_the_cursor(self):
+        start = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        rows = [SimpleNamespace(pk=pk, date=start + timedelta(minutes=pk)) for pk in (4, 5, 6)]
+        queryset = mock.MagicMock()
+        seek = queryset.filter.return_value.filter.return_value
+        seek.order_by.return_value.__getitem__.return_value = rows
+
+        page, next_cursor = self.pagination.paginate(queryset, self.pagination.encode_cursor(start, 3), 2)
+
+        self.assertEqual(queryset.filter.call_args.kwargs, {'date__gte': start})
+        seek.order_by.assert_called_once_with('date', 'id')
+        seek.order_by.return_value.__getitem__.assert_called_once_with(slice(None, 3))
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(self.pagination.decode_cursor(next_cursor), (rows[1].date, 5))
+
+    def test_last_page_has_no_cursor(self):
+        queryset = mock.MagicMock()
+        queryset.order_by.return_value.__getitem__.return_value = [SimpleNamespace(pk=1, date=None)]
+        self.assertEqual(self.pagination.paginate(queryset, None, 2)[1], None)
+
+
+class TokenIntrospectionClientTests(SimpleTestCase):
+    """Warm tokens are answered from memory; concurrent misses of a tenant share one call"""
+
+    def setUp(self):
+        self.token_client = TokenIntrospectionClient()
+        self.expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        patcher = mock.patch.object(self.token_client, '_call', side_effect=self.call)
+        self.call_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, tenant, tokens):
+        return {
+            token: {'user_id': 1, 'tenant': tenant, 'expires_at': self.expires_at} if token.startswith('good') else None
+            for token in tokens
+        }
+
+    def test_repeat_lookups_are_served_from_the_cache(self):
+        self.assertEqual(self.token_client.introspect('good', 'pharmacy1')['tenant'], 'pharmacy1')
+        self.assertIsNone(self.token_client.introspect('bad', 'pharmacy1'))
+        self.assertEqual(self.token_client.introspect('good', 'pharmacy1')['user_id'], 1)
+        self.assertIsNone(self.token_client.introspect('bad', 'pharmacy1'))
+        self.assertEqual(self.call_mock.call_count, 2)
+        self.assertEqual(self.token_client.stats()['hits'], 2)
+
+    def test_invalidate_forces_a_new_lookup(self):
+        self.token_client.introspect('good', 'pharmacy1')
+        self.token_client.invalidate('good', 'pharmacy1')
+        self.token_client.introspect('good', 'pharmacy1')
+        self.assertEqual(self.call_mock.call_count, 2)
+
+    def test_concurrent_misses_share_one_call(self):
+        self.token_client.BATCH_WINDOW = 0.2
+        tokens = [f'good-{n}' for n in range(5)]
+        barrier = threading.Barrier(len(tokens))
+        results = {}
+
+        def lookup(token):
+            barrier.wait()
+            results[token] = self.token_client.introspect(token, 'pharmacy1')
+
+        threads = [threading.Thread(target=lookup, args=(token,)) for token in tokens]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.call_mock.assert_called_once()
+        self.assertEqual(self.call_mock.call_args.args[0], 'pharmacy1')
+        self.assertCountEqual(self.call_mock.call_args.args[1], tokens)
+        self.assertTrue(all(claims['user_id'] == 1 for claims in results.values()))
+
+    def test_failed_calls_are_not_cached(self):
+        self.call_mock.side_effect = ConnectionError('auth is down')
+        with self.assertRaises(AuthServiceUnavailable):
+            self.token_client.introspect('good', 'pharmacy1')
+        self.call_mock.side_effect = self.call
+        self.assertEqual(self.token_client.introspect('good', 'pharmacy1')['user_id'], 1)
+        self.assertEqual(self.call_mock.call_count, 2)
+
+    def test_tenants_are_cached_and_batched_apart(self):
+        self.token_client.BATCH_WINDOW = 0.2
+        lookups = [('good', 'pharmacy1'), ('good', 'pharmacy2'), ('good-2', 'pharmacy2')]
+        barrier = threading.Barrier(len(lookups))
+        results = {}
+
+        def lookup(token, tenant):
+            barrier.wait()
+            results[token, tenant] = self.token_client.introspect(token, tenant)
+
+        threads = [threading.Thread(target=lookup, args=args) for args in lookups]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        calls = sorted((call.args[0], sorted(call.args[1])) for call in self.call_mock.call_args_list)
+        self.assertEqual(calls, [('pharmacy1', ['good']), ('pharmacy2', ['good', 'good-2'])])
+        self.assertEqual(results['good', 'pharmacy2']['tenant'], 'pharmacy2')
+        # The same token is cached once per tenant
+        self.assertEqual(self.token_client.introspect('good', 'pharmacy1')['tenant'], 'pharmacy1')
+        self.assertEqual(self.call_mock.call_count, 2)
+
+    @override_settings(AUTH_INTROSPECTION_URL='http://auth:8000/auth/token/introspect/', AUTH_TENANT_HOST='{tenant}.auth.local')
+    def test_batches_are_sent_to_the_tenant_host(self):
+        client = TokenIntrospectionClient()
+        response = mock.Mock()
+        response.json.return_value = {'results': {'good': {'active': True, 'user_id': 1}, 'bad': {'active': False}}}
+        with mock.patch('pharmacies.auth_client.requests.Session') as Session:
+            Session.return_value.post.return_value = response
+            self.assertEqual(client._call('pharmacy2', ['good', 'bad']), {'good': {'active': True, 'user_id': 1}, 'bad': None})
+        _, kwargs = Session.return_value.post.call_args
+        self.assertEqual(kwargs['headers'], {'Host': 'pharmacy2.auth.local'})
+
+
+class QueryCacheInvalidationTests(SimpleTestCase):
+    """Raw writes drop only the cached queries of the rows they touched"""
+
+    def test_invalidates_each_row_after_commit(self):
+        rows = [{'id': 1, 'name': 'Aspirin', 'quantity': 4}, {'id': 1, 'name': 'Aspirin', 'quantity': 3}]
+        with mock.patch('pharmacies.cache_services.transaction.on_commit') as on_commit, \
+                mock.patch('pharmacies.cache_services.invalidate_dict') as invalidate_dict:
+            invalidate_rows(Medicine, rows)
+            invalidate_dict.assert_not_called()
+            on_commit.call_args.args[0]()
+            invalidate_rows(Medicine, [])
+        self.assertEqual(on_commit.call_count, 1)
+        self.assertEqual(invalidate_dict.call_args_list, [mock.call(Medicine, row) for row in rows])
+
+    def test_replay_decrement_returns_the_rows_it_updated(self):
+        cursor = mock.MagicMock()
+        cursor.fetchall.return_value = [(7, 'Aspirin', 3, Decimal('1.50'), 0, 99)]
+        with mock.patch('pharmacies.replay_services.connection') as connection:
+            connection.cursor.return_value.__enter__.return_value = cursor
+            rows = OfflineSaleService._decrement({7: -2})
+        sql = cursor.execute.call_args.args[0]
+        self.assertIn('RETURNING m.id, m.name, m.quantity, m.price_amount', sql)
+        self.assertEqual(rows, [{
+            'id': 7, 'name': 'Aspirin', 'quantity': 3, 'price': Decimal('1.50'), 'reorder_level': 0, 'change_seq': 99,
+        }])
+
+
+class LotTrackedQuantityTests(SimpleTestCase):
+    """A lot-tracked medicine's quantity only moves with its lots"""
+
+    def test_increase_must_be_received_into_a_lot(self):
+        with mock.patch('pharmacies.stock_services.LotService') as lots:
+            lots.has_lots.return_value = True
+            with self.assertRaises(LotTrackedQuantity):
+                StockService.adjust(7, 5)
+            lots.has_lots.return_value = False
+            StockService.adjust(7, 5)
+        lots.allocate.assert_not_called()
+
+    def test_decrease_is_written_off_the_first_expiring_lots(self):
+        with mock.patch('pharmacies.stock_services.LotService') as lots:
+            lots.allocate.return_value = ([(3, 'C', date(2026, 10, 1), 4)], 0)
+            StockService.adjust(7, -4)
+            lots.allocate.assert_called_once_with(7, 4, include_expired=True)
+            lots.allocate.return_value = ([(3, 'C', date(2026, 10, 1), 4)], 2)
+            with self.assertRaises(LotTrackedQuantity):
+                StockService.adjust(7, -6)
+
+    def test_untracked_decrease_passes(self):
+        with mock.patch('pharmacies.stock_services.LotService') as lots:
+            lots.allocate.return_value = ([], 4)
+            lots.has_lots.return_value = False
+            StockService.adjust(7, -4)
+
+    def test_detail_update_rejects_a_quantity_the_lots_cannot_book(self):
+        view = MedicineDetailView.as_view()
+        with mock.patch.object(MedicineDetailView, 'get_object', return_value=Medicine(id=7, name='Insulin', quantity=10)), \
+                mock.patch.object(MedicineDetailView, 'perform_update', side_effect=LotTrackedQuantity('no lot')):
+            response = view(APIRequestFactory().patch('/api/medicines/7/', {'quantity': 20}, format='json'), id=7)
+        self.assertEqual((response.status_code, response.data), (400, {'error': 'no lot'}))
+
+    def test_replay_cannot_sell_beyond_the_lots(self):
+        rows = [
+            {'id': 1, 'name': 'Aspirin', 'quantity': 10},
+            {'id': 2, 'name': 'Insulin', 'quantity': 10},
+        ]
+        sales = [
+            {'key': 'a', 'name': 'Aspirin', 'quantity': 8, 'sold_at': datetime(2026, 10, 1, tzinfo=timezone.utc)},
+            {'key': 'b', 'name': 'Insulin', 'quantity': 3, 'sold_at': datetime(2026, 10, 1, tzinfo=timezone.utc)},
+            {'key': 'c', 'name': 'Insulin', 'quantity': 2, 'sold_at': datetime(2026, 10, 2, tzinfo=timezone.utc)},
+        ]
+        report = {'applied': 0, 'duplicates': [], 'conflicts': []}
+        module = 'pharmacies.replay_services'
+        with mock.patch(f'{module}.transaction'), \
+                mock.patch.object(OfflineSaleService, '_claim', return_value={'a', 'b', 'c'}), \
+                mock.patch(f'{module}.Medicine') as medicine, \
+                mock.patch(f'{module}.LotService') as lots, \
+                mock.patch.object(OfflineSaleService, '_decrement', return_value=[]) as decrement, \
+                mock.patch(f'{module}.Register_pharmacy') as registers, \
+                mock.patch(f'{module}.SalesRollupService'), mock.patch(f'{module}.OutboxService'), \
+                mock.patch(f'{module}.StockService'), mock.patch(f'{module}.invalidate_rows'), \
+                mock.patch(f'{module}.model_row'), \
+                mock.patch.object(OfflineSaleService, '_record_outcomes') as outcomes:
+            medicine._meta.concrete_fields = []
+            medicine.objects.nocache.return_value.select_for_update.return_value.filter.return_value \
+                .order_by.return_value.values.return_value = rows
+            # Insulin holds 10 in the aggregate but only 4 in its lots
+            lots.totals.return_value = {2: 4}
+            registers.objects.bulk_create.side_effect = lambda objs: [
+                SimpleNamespace(id=i, date=None, name_medicine='', quantity=0) for i, _ in enumerate(objs)
+            ]
+            OfflineSaleService._apply_chunk(sales, 'pos-1', report)
+
+        decrement.assert_called_once_with({1: -8, 2: -3})
+        lots.allocate.assert_called_once_with(2, 3, include_expired=True)
+        self.assertEqual(report['conflicts'], [{**OfflineSaleService._describe(sales[2]), 'reason': 'insufficient_stock', 'available': 1}])
+        self.assertEqual(outcomes.call_args.args[0]['c'], ('conflict', 'insufficient_stock', None))
@@ -7,6 +7,15 @@ urlpatterns = [
     path('api/medicines/<int:id>/', views.MedicineDetailView.as_view(), name='medicine-detail'),
     path('api/medicines/search/<str:name>/', views.MedicineSearchView.as_view(), name='medicine-search'),
     path('api/medicines/sale/<str:name>/', views.MedicineSaleView.as_view(), name='medicine-sale'),
+    path('api/medicines/import/', views.MedicineBulkImportView.as_view(), name='medicine-import'),
+    path('api/medicines/forecast/', views.MedicineForecastView.as_view(), name='medicine-forecast'),
+    path('api/medicines/changes/', views.MedicineChangesView.as_view(), name='medicine-changes'),
+    path('api/medicines/low-stock/', views.MedicineLowStockView.as_view(), name='medicine-low-stock'),
+    path('api/medicines/<int:id>/lots/', views.MedicineLotListView.as_view(), name='medicine-lots'),
+    path('api/lots/expiring/', views.LotExpiringView.as_view(), name='lots-expiring'),
+    path('api/medicines/valuation/', views.MedicineValuationView.as_view(), name='medicine-valuation'),
+    path('api/medicines/valuation/<str:report>/', views.MedicineValuationView.as_view(), name='medicine-valuation-report'),
+    path('api/medicines/<int:id>/prices/', views.MedicinePriceHistoryView.as_view(), name='medicine-prices'),
     
     # Class-based views for Register_Financial
     path('api/financial/', views.RegisterFinancialListCreateView.as_view(), name='financial-list-create'),
@@ -17,6 +26,16 @@ urlpatterns = [
     path('api/pharmacy/<int:id>/', views.RegisterPharmacyDetailView.as_view(), name='pharmacy-detail'),
     path('api/pharmacy/ordered/', views.RegisterPharmacyOrderedView.as_view(), name='pharmacy-ordered'),
     path('api/pharmacy/add/<str:name_medicine>/<int:quantity>/', views.RegisterPharmacyAddView.as_view(), name='pharmacy-add'),
+    path('api/pharmacy/offline-sales/', views.OfflineSalesSyncView.as_view(), name='pharmacy-offline-sales'),
+    path('api/pharmacy/rollups/<str:period>/', views.SalesRollupView.as_view(), name='pharmacy-rollups'),
+    path('api/pharmacy/revaluation/', views.SalesRevaluationView.as_view(), name='pharmacy-revaluation'),
+    path('api/pharmacy/revenue/', views.SalesRevaluationView.as_view(), {'report': 'revenue'}, name='pharmacy-revenue'),
+
+    path('api/cache/stats/', views.QueryCacheStatsView.as_view(), name='query-cache-stats'),
+    path('api/events/metrics/', views.EventPublisherMetricsView.as_view(), name='event-publisher-metrics'),
+    path('api/auth/stats/', views.TokenCacheStatsView.as_view(), name='token-cache-stats'),
+    path('api/directory/users/', views.DirectoryUserListView.as_view(), name='directory-user-list'),
+    path('api/directory/users/<int:user_id>/', views.DirectoryUserDetailView.as_view(), name='directory-user-detail'),
     
     # Legacy function-based views (keeping for backward compatibility)
     path('search/<str:pk>', views.search_mdicine, name='search'),
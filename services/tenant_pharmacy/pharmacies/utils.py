@@ -0,0 +1,120 @@
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django_tenants.utils import get_public_schema_name, get_tenant_model
+
+
+def get_tenant_schema() -> str:
+    """Schema of the tenant the current connection is bound to"""
+    return getattr(connection, 'schema_name', None) or get_public_schema_name()
+
+
+def cacheops_prefix(query) -> str:
+    """
+    CACHEOPS_PREFIX hook: scope query cache and invalidation keys to the tenant
+
+    Tenants share table names across schemas, so without the schema in
+    the key one pharmacy could read rows cached for another.
+    """
+    return f'{get_tenant_schema()}:'
+
+
+def get_tenant_schemas() -> List[str]:
+    """Schema names of every tenant, excluding the public schema"""
+    return list(
+        get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        .order_by('schema_name')
+        .values_list('schema_name', flat=True)
+    )
+
+
+def parse_datetime_param(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    Parse a query-string date or datetime into a datetime bound
+
+    Args:
+        value: ISO 8601 date (YYYY-MM-DD) or datetime string
+        end: When True a bare date is treated as an exclusive upper bound,
+             i.e. the start of the following day
+
+    Returns:
+        Datetime (timezone-aware when USE_TZ is on) or None if value is empty
+
+    Raises:
+        ValueError: If the value is not a valid date or datetime
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date or datetime: {value}')
+        if end:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_date_param(value: Optional[str]) -> Optional[date]:
+    """
+    Parse a query-string date
+
+    Raises:
+        ValueError: If the value is not a valid YYYY-MM-DD date
+    """
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'Invalid date: {value}')
+    return parsed
+
+
+PRICE_QUANTUM = Decimal('0.01')
+PRICE_MAX = Decimal('9999999999.99')
+
+
+def parse_price(raw: Any) -> Optional[Decimal]:
+    """
+    Parse a free-form price string ('$12.50', '12,50', '1.234,56 SYP') into a Decimal
+
+    The last of ',' or '.' is treated as the decimal separator when both
+    appear; a lone ',' followed by one or two digits is a decimal comma.
+
+    Returns:
+        Price rounded to cents, or None if the value is empty, negative
+        or not a number
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, Decimal):
+        text = str(raw)
+    else:
+        text = re.sub(r'[^0-9,.\-]', '', str(raw).strip())
+        if ',' in text and '.' in text:
+            thousands = ',' if text.rfind('.') > text.rfind(',') else '.'
+            text = text.replace(thousands, '').replace(',', '.')
+        elif ',' in text:
+            head, _, tail = text.rpartition(',')
+            if text.count(',') == 1 and len(tail) in (1, 2):
+                text = f'{head}.{tail}'
+            else:
+                text = text.replace(',', '')
+    try:
+        value = Decimal(text).quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+    if value.is_nan() or value < 0 or value > PRICE_MAX:
+        return None
+    return value
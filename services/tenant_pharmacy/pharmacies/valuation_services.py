@@ -0,0 +1,78 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+
+from .models import Medicine
+
+DEFAULT_PRICE_BANDS = (Decimal('1'), Decimal('5'), Decimal('10'), Decimal('50'), Decimal('100'))
+
+
+def stock_value_expression():
+    """quantity * price, matching the medicine_stock_value_idx expression"""
+    return ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=22, decimal_places=2))
+
+
+class InventoryValuationService:
+    """Inventory valuation computed entirely in Postgres"""
+
+    @staticmethod
+    def summary() -> Dict[str, Any]:
+        """
+        Total stock value and coverage of priced SKUs in one aggregate query
+
+        Returns:
+            Dict with sku_count, priced_count, unpriced_count, units and stock_value
+        """
+        totals = Medicine.objects.aggregate(
+            sku_count=Count('id'),
+            priced_count=Count('id', filter=Q(price__isnull=False)),
+            units=Sum('quantity'),
+            stock_value=Sum(stock_value_expression()),
+        )
+        totals['unpriced_count'] = totals['sku_count'] - totals['priced_count']
+        totals['units'] = totals['units'] or 0
+        totals['stock_value'] = totals['stock_value'] or Decimal('0.00')
+        return totals
+
+    @staticmethod
+    def price_bands(edges: Sequence[Decimal] = DEFAULT_PRICE_BANDS) -> List[Dict[str, Any]]:
+        """
+        SKU counts, units and stock value per price band
+
+        Args:
+            edges: Ascending band boundaries; band i covers [edges[i-1], edges[i])
+
+        Returns:
+            One dict per non-empty band, ordered by price
+        """
+        edges = sorted(set(edges))
+        whens = [When(price__lt=edge, then=Value(i)) for i, edge in enumerate(edges)]
+        rows = (
+            Medicine.objects.filter(price__isnull=False)
+            .annotate(band=Case(*whens, default=Value(len(edges)), output_field=IntegerField()))
+            .values('band')
+            .annotate(sku_count=Count('id'), units=Sum('quantity'), stock_value=Sum(stock_value_expression()))
+            .order_by('band')
+        )
+        bands = []
+        for row in rows:
+            band = row['band']
+            bands.append({
+                'min_price': edges[band - 1] if band > 0 else Decimal('0.00'),
+                'max_price': edges[band] if band < len(edges) else None,
+                'sku_count': row['sku_count'],
+                'units': row['units'],
+                'stock_value': row['stock_value'],
+            })
+        return bands
+
+    @staticmethod
+    def top_value(limit: int = 20) -> List[Dict[str, Any]]:
+        """Highest stock-value SKUs, read in order from the stock value index"""
+        return list(
+            Medicine.objects.filter(price__isnull=False)
+            .annotate(stock_value=stock_value_expression())
+            .order_by(F('stock_value').desc())
+            .values('id', 'name', 'quantity', 'price', 'stock_value')[:limit]
+        )
@@ -6,39 +6,124 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from .models import *
 from .serializer import*
+from .import_services import MedicineImportService
+from .pagination import KeysetPagination
+from .publisher import publisher
+from .rollup_services import SalesRollupService, PERIOD_TRUNCATIONS
+from .forecast_services import DemandForecastService
+from .stock_services import InsufficientStock, LotTrackedQuantity, StockService
+from .alert_services import StockAlertService
+from .auth_client import token_client
+from .cache_services import query_cache_metrics
+from .directory_services import DirectoryService
+from .inventory_services import InventoryCacheService, catalog_etag
+from .lot_services import LotService
+from .outbox_services import OutboxService
+from .price_services import PriceHistoryService
+from .replay_services import OfflineSaleService
+from .sync_services import SyncService
+from .utils import parse_date_param, parse_datetime_param, parse_price
+from .valuation_services import DEFAULT_PRICE_BANDS, InventoryValuationService
+import io
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
 
 # Medicine Views
+@method_decorator(condition(etag_func=catalog_etag), name='get')
 class MedicineListCreateView(ListCreateAPIView):
     """
-    GET: List all medicines
+    GET: List all medicines (optional ordering=price|-price|name|-name)
+         ETag from the tenant catalog version; If-None-Match answers 304 without a query
     POST: Create a new medicine
     """
     queryset = Medicine.objects.all()
     serializer_class = Medicine_serializer
+    ordering_fields = ('price', '-price', 'name', '-name')
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        ordering = self.request.query_params.get('ordering')
+        if ordering in self.ordering_fields:
+            queryset = queryset.order_by(ordering, 'id')
+        return queryset
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        item = serializer.save()
+        PriceHistoryService.record([(item.id, item.price)])
+        StockService.stock_changed([item.id])
+
+@method_decorator(condition(etag_func=catalog_etag), name='get')
 class MedicineDetailView(RetrieveUpdateDestroyAPIView):
     """
-    GET: Retrieve a specific medicine by ID
-    PUT/PATCH: Update a specific medicine
-    DELETE: Delete a specific medicine
+    GET: Retrieve a specific medicine by ID (read through the inventory cache)
+    PUT/PATCH: Update a specific medicine; a lot-tracked medicine's quantity
+               can only decrease, written off its first-expiring lots
+    DELETE: Delete a specific medicine (409 once it has price or sales history)
     """
     queryset = Medicine.objects.all()
     serializer_class = Medicine_serializer
     lookup_field = 'id'
 
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'Medicine has price or sales history and cannot be deleted.'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except LotTrackedQuantity as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = InventoryCacheService.get(kwargs['id'])
+        if data is None:
+            return Response({'error': 'Medicine not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_price = serializer.instance.price
+        previous_name = serializer.instance.name
+        previous_quantity = serializer.instance.quantity
+        item = serializer.save()
+        if item.quantity != previous_quantity:
+            StockService.adjust(item.id, item.quantity - previous_quantity)
+        if item.price != previous_price:
+            PriceHistoryService.record([(item.id, item.price)])
+        if item.name != previous_name:
+            InventoryCacheService.evict([], names=[previous_name])
+        StockService.stock_changed([item.id])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        medicine_id = instance.id
+        name = instance.name
+        instance.delete()
+        InventoryCacheService.evict([], names=[name])
+        StockService.stock_changed([medicine_id])
+
 class MedicineSearchView(APIView):
     """
-    GET: Search medicine by name
+    GET: Search medicine by name (read through the inventory cache)
     """
     def get(self, request, name):
-        try:
-            item = Medicine.objects.get(name=name)
-            serializer = Medicine_serializer(item)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Medicine.DoesNotExist:
+        data = InventoryCacheService.get_by_name(name)
+        if data is None:
             return Response({'error': 'Medicine not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
 
 class MedicineSaleView(APIView):
     """
@@ -46,34 +131,224 @@ class MedicineSaleView(APIView):
     """
     def put(self, request, name):
         try:
-            item = Medicine.objects.get(name=name)
-            quantity_old = item.quantity
-            quantity_new = quantity_old - 1
-            if quantity_new < 0:
-                return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
-            item.quantity = quantity_new
-            item.save()
+            item = StockService.sell(name)
             serializer = Medicine_serializer(item)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            allocations = [
+                {'lot_id': lot_id, 'lot_number': lot_number, 'expiry_date': expiry_date, 'quantity': taken}
+                for lot_id, lot_number, expiry_date, taken in item.allocations
+            ]
+            return Response({**serializer.data, 'allocations': allocations}, status=status.HTTP_200_OK)
+        except InsufficientStock:
+            return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+        except Medicine.DoesNotExist:
+            return Response({'error': 'Medicine not found'}, status=status.HTTP_404_NOT_FOUND)
+
+class MedicineChangesView(APIView):
+    """
+    GET: Catalog delta sync: medicines changed or deleted since a cursor
+         Query params: since (0 for a full sync), after, limit (default 500);
+         send back next_since/next_after, and repeat while has_more
+    """
+    def get(self, request):
+        params = request.query_params
+        try:
+            since = int(params.get('since', 0))
+            after = int(params.get('after', 0))
+            limit = int(params.get('limit', SyncService.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': 'since, after and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or after < 0 or limit < 1:
+            return Response({'error': 'since and after must be >= 0 and limit >= 1.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(SyncService.changes(since, after, min(limit, SyncService.MAX_LIMIT)), status=status.HTTP_200_OK)
+
+class MedicineLowStockView(APIView):
+    """
+    GET: Medicines currently at or below their reorder level
+    """
+    def get(self, request):
+        ids = StockAlertService.low_stock_ids()
+        items = Medicine.objects.filter(id__in=ids).order_by('quantity', 'name')
+        serializer = Medicine_serializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class MedicineBulkImportView(APIView):
+    """
+    POST: Bulk import medicines from an uploaded CSV or NDJSON file (upsert on name)
+    """
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file upload named "file" is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = MedicineImportService.detect_format(upload.name, request.query_params.get('file_format'))
+        if file_format is None:
+            return Response({'error': 'Unable to determine file format, pass file_format=csv or file_format=ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', MedicineImportService.DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            return Response({'error': 'chunk_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if chunk_size < 1:
+            return Response({'error': 'chunk_size must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = MedicineImportService.import_stream(stream, file_format, chunk_size=chunk_size)
+        if not result['success']:
+            return Response({'error': result['error']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+class MedicineForecastView(APIView):
+    """
+    GET: Demand forecast, safety stock and reorder points for every medicine
+         Query params: method (sma|ewma), window, lead_time, review_period,
+         service_level, alpha, all (include SKUs that need no reorder),
+         limit, refresh (recompute instead of serving the nightly result)
+    """
+    def get(self, request):
+        params = request.query_params
+        try:
+            parameters = DemandForecastService.normalize_parameters(
+                method=params.get('method', DemandForecastService.DEFAULT_METHOD),
+                window=int(params.get('window', DemandForecastService.DEFAULT_WINDOW)),
+                lead_time=float(params.get('lead_time', DemandForecastService.DEFAULT_LEAD_TIME)),
+                review_period=float(params.get('review_period', DemandForecastService.DEFAULT_REVIEW_PERIOD)),
+                service_level=float(params.get('service_level', DemandForecastService.DEFAULT_SERVICE_LEVEL)),
+                alpha=float(params.get('alpha', DemandForecastService.DEFAULT_ALPHA))
+            )
+            limit = int(params['limit']) if params.get('limit') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None and limit < 1:
+            return Response({'error': 'limit must be >= 1.'}, status=status.HTTP_400_BAD_REQUEST)
+        result = DemandForecastService.get_cached_or_compute(
+            refresh=params.get('refresh') in ('1', 'true'),
+            **parameters
+        )
+
+        items = result['items']
+        if params.get('all') not in ('1', 'true'):
+            items = [item for item in items if item['needs_reorder']]
+        if limit is not None:
+            items = items[:limit]
+        return Response({**result, 'items': items}, status=status.HTTP_200_OK)
+
+class MedicineLotListView(APIView):
+    """
+    GET: Sellable lots of a medicine in first-expiry-first-out order
+    POST: Receive stock into a lot (lot_number, expiry_date, quantity)
+    """
+    def get(self, request, id):
+        get_object_or_404(Medicine, id=id)
+        lots = [
+            {'id': lot_id, 'lot_number': lot_number, 'expiry_date': expiry_date, 'quantity': quantity}
+            for expiry_date, lot_id, lot_number, quantity in LotService.fefo_queue(id)
+        ]
+        return Response(lots, status=status.HTTP_200_OK)
+
+    def post(self, request, id):
+        serializer = Medicine_lot_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            lot = StockService.receive(id, **serializer.validated_data)
         except Medicine.DoesNotExist:
             return Response({'error': 'Medicine not found'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(Medicine_lot_serializer(lot).data, status=status.HTTP_201_CREATED)
+
+class LotExpiringView(APIView):
+    """
+    GET: Stocked lots expiring within `days` days (default 30)
+         Query params: days, include_expired
+    """
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        lots = LotService.expiring(days, include_expired=request.query_params.get('include_expired') in ('1', 'true'))
+        data = [
+            {**Medicine_lot_serializer(lot).data, 'medicine_name': lot.medicine.name}
+            for lot in lots
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+class MedicineValuationView(APIView):
+    """
+    GET: Inventory valuation computed in the database
+         /valuation/        totals (SUM(quantity * price))
+         /valuation/bands/  per price band, edges=1,5,10,50,100
+         /valuation/top/    top stock-value SKUs, limit=20
+    """
+    def get(self, request, report='summary'):
+        params = request.query_params
+        if report == 'summary':
+            return Response(InventoryValuationService.summary(), status=status.HTTP_200_OK)
+
+        if report == 'bands':
+            edges = DEFAULT_PRICE_BANDS
+            if params.get('edges'):
+                edges = [parse_price(edge) for edge in params['edges'].split(',')]
+                if any(edge is None for edge in edges):
+                    return Response({'error': 'edges must be a comma-separated list of prices.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(InventoryValuationService.price_bands(edges), status=status.HTTP_200_OK)
+
+        if report == 'top':
+            try:
+                limit = int(params.get('limit', 20))
+            except ValueError:
+                return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            if limit < 1:
+                return Response({'error': 'limit must be >= 1.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(InventoryValuationService.top_value(min(limit, 1000)), status=status.HTTP_200_OK)
+
+        return Response({'error': 'Unknown valuation report'}, status=status.HTTP_404_NOT_FOUND)
+
+class MedicinePriceHistoryView(APIView):
+    """
+    GET: Price history of a medicine, newest first
+         Query params: at (date or datetime) returns only the price in force then
+    """
+    def get(self, request, id):
+        get_object_or_404(Medicine, id=id)
+        try:
+            at = parse_datetime_param(request.query_params.get('at'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if at is None:
+            serializer = Medicine_price_serializer(PriceHistoryService.history(id), many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        entry = PriceHistoryService.price_at(id, at)
+        if entry is None:
+            return Response({'error': 'No price in force at that time'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(Medicine_price_serializer(entry).data, status=status.HTTP_200_OK)
 
 # Register_Financial Views
 class RegisterFinancialListCreateView(ListCreateAPIView):
     """
-    GET: List all financial registers
-    POST: Create a new financial register
+    GET: List all financial registers (optional account filter, newest first)
+    POST: Create an invoice with its lines; the invoice number is allocated server-side
     """
-    queryset = Register_Financial.objects.all()
+    queryset = Register_Financial.objects.prefetch_related('lines')
     serializer_class = Register_serializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        account = self.request.query_params.get('account')
+        if account is not None:
+            if not account.isdigit():
+                raise serializers.ValidationError({'account': 'account must be an integer.'})
+            queryset = queryset.filter(account=int(account)).order_by('-invoice')
+        return queryset
+
 class RegisterFinancialDetailView(RetrieveUpdateDestroyAPIView):
     """
     GET: Retrieve a specific financial register by invoice
     PUT/PATCH: Update a specific financial register
     DELETE: Delete a specific financial register
     """
-    queryset = Register_Financial.objects.all()
+    queryset = Register_Financial.objects.prefetch_related('lines')
     serializer_class = Register_serializer
     lookup_field = 'invoice'
 
@@ -86,6 +361,12 @@ class RegisterPharmacyListCreateView(ListCreateAPIView):
     queryset = Register_pharmacy.objects.all()
     serializer_class = Register_pharmacy_serializer
 
+    @transaction.atomic
+    def perform_create(self, serializer):
+        register = serializer.save()
+        SalesRollupService.record_register(register)
+        OutboxService.sales_recorded([register])
+
 class RegisterPharmacyDetailView(RetrieveUpdateDestroyAPIView):
     """
     GET: Retrieve a specific pharmacy register by ID
@@ -96,14 +377,55 @@ class RegisterPharmacyDetailView(RetrieveUpdateDestroyAPIView):
     serializer_class = Register_pharmacy_serializer
     lookup_field = 'id'
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_day = SalesRollupService.sale_day(serializer.instance.date)
+        old_name = serializer.instance.name_medicine
+        register = serializer.save()
+        SalesRollupService.recompute_days(
+            {old_day, SalesRollupService.sale_day(register.date)},
+            names={old_name, register.name_medicine}
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        day = SalesRollupService.sale_day(instance.date)
+        name_medicine = instance.name_medicine
+        instance.delete()
+        SalesRollupService.recompute_days({day}, names={name_medicine})
+
 class RegisterPharmacyOrderedView(APIView):
     """
-    GET: List all pharmacy registers ordered by date
+    GET: List pharmacy registers ordered by date, one keyset page at a time
+         Query params: from, to (date or datetime, to is exclusive),
+         medicine, limit, cursor (next_cursor of the previous page)
     """
+    pagination = KeysetPagination(field='date')
+
     def get(self, request):
-        items = Register_pharmacy.objects.order_by('date')
-        serializer = Register_pharmacy_serializer(items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        params = request.query_params
+        try:
+            date_from = parse_datetime_param(params.get('from'))
+            date_to = parse_datetime_param(params.get('to'), end=True)
+            limit = self.pagination.get_limit(params.get('limit'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = Register_pharmacy.objects.all()
+        if date_from:
+            items = items.filter(date__gte=date_from)
+        if date_to:
+            items = items.filter(date__lt=date_to)
+        if params.get('medicine'):
+            items = items.filter(name_medicine=params['medicine'])
+
+        try:
+            page, next_cursor = self.pagination.paginate(items, params.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = Register_pharmacy_serializer(page, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
 
 class RegisterPharmacyAddView(APIView):
     """
@@ -117,7 +439,137 @@ class RegisterPharmacyAddView(APIView):
         serializer = Register_pharmacy_serializer(data=data)
         
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                register = serializer.save()
+                SalesRollupService.record_register(register)
+                OutboxService.sales_recorded([register])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OfflineSalesSyncView(APIView):
+    """
+    POST: Replay an offline POS sales log in one request
+          Body: {"device_id": "...", "sales": [{"key", "name", "quantity", "sold_at"}, ...]}
+          Lines whose key was already replayed are reported as duplicates, lines
+          that would take stock below zero or beyond a medicine's lots as conflicts
+    """
+    def post(self, request):
+        serializer = Offline_sales_batch_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        report = OfflineSaleService.replay(
+            serializer.validated_data['sales'],
+            device_id=serializer.validated_data['device_id']
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+class SalesRollupView(APIView):
+    """
+    GET: Sales totals per day, week or month served from the rollup table
+         Query params: from, to (inclusive dates), medicine, by_medicine (default 1)
+    """
+    def get(self, request, period):
+        if period not in PERIOD_TRUNCATIONS:
+            return Response({'error': f'period must be one of: {", ".join(PERIOD_TRUNCATIONS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        params = request.query_params
+        try:
+            day_from = parse_date_param(params.get('from'))
+            day_to = parse_date_param(params.get('to'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = SalesRollupService.totals(
+            period,
+            day_from=day_from,
+            day_to=day_to,
+            name_medicine=params.get('medicine'),
+            by_medicine=params.get('by_medicine', '1') not in ('0', 'false')
+        )
+        return Response(rows, status=status.HTTP_200_OK)
+
+
+class SalesRevaluationView(APIView):
+    """
+    GET: Register entries valued at the price in force at each sale
+         /revaluation/  lines and total, from/to (to inclusive; defaults to one day from `from`, today)
+         /revenue/      totals only, from and to required
+    """
+    def get(self, request, report='lines'):
+        params = request.query_params
+        try:
+            date_from = parse_datetime_param(params.get('from'))
+            date_to = parse_datetime_param(params.get('to'), end=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if report == 'revenue':
+            if date_from is None or date_to is None:
+                return Response({'error': 'from and to are required.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(PriceHistoryService.revenue(date_from, date_to), status=status.HTTP_200_OK)
+
+        if date_from is None:
+            date_from, _ = SalesRollupService.day_bounds(timezone.localdate())
+        if date_to is None:
+            date_to = date_from + timedelta(days=1)
+        lines = PriceHistoryService.revalued_lines(date_from, date_to)
+        return Response({
+            'lines': lines,
+            'total': sum((line['line_total'] for line in lines if line['line_total'] is not None), Decimal('0.00')),
+        }, status=status.HTTP_200_OK)
+
+class QueryCacheStatsView(APIView):
+    """
+    GET: Query cache hit rate per model for the current tenant
+    DELETE: Reset the counters
+    """
+    def get(self, request):
+        return Response(query_cache_metrics.stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        query_cache_metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class EventPublisherMetricsView(APIView):
+    """
+    GET: Delivery counters of this worker's event publisher
+    """
+    def get(self, request):
+        return Response(publisher.metrics(), status=status.HTTP_200_OK)
+
+class TokenCacheStatsView(APIView):
+    """
+    GET: Hit rate and call counts of this worker's token introspection client
+    """
+    def get(self, request):
+        return Response(token_client.stats(), status=status.HTTP_200_OK)
+
+class DirectoryUserListView(APIView):
+    """
+    GET: Look up users in the local directory by an exact, indexed field
+         Query params: username, email, account_id or account_number
+    """
+    lookup_fields = ('username', 'email', 'account_id', 'account_number')
+    max_results = 100
+
+    def get(self, request):
+        filters = {field: request.query_params[field] for field in self.lookup_fields if request.query_params.get(field)}
+        if not filters:
+            return Response(
+                {'error': f"Filter by one of: {', '.join(self.lookup_fields)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if 'account_id' in filters and not filters['account_id'].isdigit():
+            return Response({'error': 'account_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        users = Directory_user.objects.filter(**filters).order_by('user_id')[:self.max_results]
+        return Response(Directory_user_serializer(users, many=True).data, status=status.HTTP_200_OK)
+
+class DirectoryUserDetailView(APIView):
+    """
+    GET: Directory entry of an auth-service user
+    """
+    def get(self, request, user_id):
+        user = DirectoryService.get(user_id)
+        if user is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(Directory_user_serializer(user).data, status=status.HTTP_200_OK)
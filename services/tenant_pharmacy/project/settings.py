@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'cacheops',
     'pharmacies',
 ]
 
@@ -48,7 +49,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'pharmaacies.TenantMiddleware',  
+    'pharmacies.middleware.TenantMiddleware',
+    # Needs request.tenant, so it must come after TenantMiddleware
+    'pharmacies.middleware.BearerTokenMiddleware',
 ]
 ROOT_URLCONF = 'project.urls'
 
@@ -82,9 +85,21 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD', '******'),
         'HOST': os.getenv('DATABASE_HOST', 'db'),
         'PORT': os.getenv('DATABASE_PORT', '5432'),
+    },
+    # Read-only access to the auth service's database for ledger reconciliation
+    'ledger': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('LEDGER_DATABASE_NAME', os.getenv('DATABASE_NAME', 'mult_tenant')),
+        'USER': os.getenv('LEDGER_DATABASE_USERNAME', os.getenv('DATABASE_USERNAME', 'postgres')),
+        'PASSWORD': os.getenv('LEDGER_DATABASE_PASSWORD', os.getenv('DATABASE_PASSWORD', '******')),
+        'HOST': os.getenv('LEDGER_DATABASE_HOST', os.getenv('DATABASE_HOST', 'db')),
+        'PORT': os.getenv('LEDGER_DATABASE_PORT', os.getenv('DATABASE_PORT', '5432')),
     }
 }
 
+# Account table of the auth service, optionally schema-qualified (e.g. tenant1.auth_account)
+LEDGER_ACCOUNT_TABLE = os.getenv('LEDGER_ACCOUNT_TABLE', 'auth_account')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -196,10 +211,52 @@ CACHEOPS_DEFAULTS = {
     'timeout': 60 * 15,  # 15 minutes
 }
 
+# Every cache and invalidation key is prefixed with the active tenant schema
+CACHEOPS_PREFIX = 'pharmacies.utils.cacheops_prefix'
+
 # Cache specific models
 CACHEOPS = {
-    'pharmacies.Pharmacy': {'ops': 'all', 'timeout': 60 * 30},      # 30 minutes
-    'pharmacies.Medication': {'ops': 'all', 'timeout': 60 * 15},    # 15 minutes
-    'pharmacies.Inventory': {'ops': 'all', 'timeout': 60 * 10},     # 10 minutes
+    'pharmacies.Medicine': {'ops': 'all', 'timeout': 60 * 15},             # 15 minutes
+    'pharmacies.Register_Financial': {'ops': 'all', 'timeout': 60 * 30},   # 30 minutes
+    'pharmacies.Register_pharmacy': {'ops': 'all', 'timeout': 60 * 10},    # 10 minutes
     'auth.User': {'ops': 'all', 'timeout': 60 * 30},               # 30 minutes
 }
+
+# Cacheops hit/miss counters are flushed to Redis at most this often (seconds)
+CACHEOPS_STATS_FLUSH_INTERVAL = 5
+
+# Event publishing (pharmacies.publisher)
+# 'kafka' for a real broker, 'memory' for the in-process stand-in used in tests
+EVENT_PUBLISHER_BACKEND = os.getenv('EVENT_PUBLISHER_BACKEND', 'kafka')
+# msgpack with a version byte (pharmacies.codec); 'json' for debugging
+EVENT_CODEC = os.getenv('EVENT_CODEC', 'msgpack')
+KAFKA_PRODUCER_CONFIG = {
+    'bootstrap_servers': os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092').split(','),
+    'linger_ms': int(os.getenv('KAFKA_LINGER_MS', '20')),
+    'batch_size': int(os.getenv('KAFKA_BATCH_SIZE', str(64 * 1024))),
+    'compression_type': os.getenv('KAFKA_COMPRESSION_TYPE', 'gzip'),
+}
+# Events go to a fixed set of shared topics keyed by tenant (pharmacies.routing).
+# 'dual' also writes the legacy per-tenant topics while consumers move over;
+# switch to 'shared' once they are drained, then drop them with event_topics.
+EVENT_TOPIC_MODE = os.getenv('EVENT_TOPIC_MODE', 'dual')
+EVENT_TOPIC_PARTITIONS = int(os.getenv('EVENT_TOPIC_PARTITIONS', '24'))
+KAFKA_CONSUMER_CONFIG = {
+    'bootstrap_servers': os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092').split(','),
+    'fetch_max_wait_ms': int(os.getenv('KAFKA_FETCH_MAX_WAIT_MS', '500')),
+}
+
+# Bearer tokens are validated against the auth service (pharmacies.auth_client)
+AUTH_INTROSPECTION_URL = os.getenv('AUTH_INTROSPECTION_URL', 'http://auth:8000/auth/token/introspect/')
+AUTH_SERVICE_KEY = os.getenv('AUTH_SERVICE_KEY', '')
+# Host the auth service resolves to a tenant's schema; {tenant} is the pharmacy schema name
+AUTH_TENANT_HOST = os.getenv('AUTH_TENANT_HOST', '{tenant}.auth')
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '30'))
+AUTH_TOKEN_NEGATIVE_TTL = int(os.getenv('AUTH_TOKEN_NEGATIVE_TTL', '5'))
+AUTH_EXEMPT_PATHS = ('/admin/',)
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'pharmacies.authentication.BearerTokenAuthentication',
+    ],
+}